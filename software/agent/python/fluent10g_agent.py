@@ -38,16 +38,109 @@
 # function. Monitoring data can be stored via the store_monitor_data() function
 # (the measurement application can then fetch the stored data, the data transfer
 # to the measurement application is not initiated).
-
+#
+# For low-jitter operation on a DuT that is saturated by FlueNT10G traffic,
+# the agent's I/O thread and sampler threads can be pinned to dedicated CPUs
+# and the I/O thread may request real-time (SCHED_FIFO) scheduling. Memory can
+# be locked and pre-faulted to avoid page faults while events are dispatched.
+# The time spent dispatching each event is recorded and can be fetched by the
+# measurement application via the built-in "get_dispatch_stats" event.
+#
+# Additionally, the agent can sample the network interface statistics of the
+# DuT kernel (/sys/class/net/<if>/statistics) in the background. The derived
+# packet and data rate time series of all sampled interfaces can be fetched via
+# the built-in "get_nic_stats" event.
+#
+# Optionally, the agent can serve the latest value and aggregates of all
+# monitor data identifiers via HTTP in the OpenMetrics text format, so that
+# monitoring systems can scrape the DuT state during long measurements.
+#
+# Monitor data replies can be compressed on request. Numeric series are first
+# transformed (delta-of-delta encoding for integers, XOR encoding of
+# consecutive values for floating-point numbers) and then compressed with zlib
+# or lz4. The transformation and compression settings, as well as the achieved
+# compression ratio and encode time, are reported in the reply header.
+#
+# Besides ZeroMQ (pyzmq), the agent only requires the Python standard library.
+# The NIC statistics sampler and the transformation of numeric series require
+# NumPy, lz4 compression requires the lz4 package. Without NumPy, monitor data
+# is JSON encoded before it is compressed; without lz4, zlib is used.
+
+import base64
+import collections
+import ctypes
+import ctypes.util
+import http.server
 import inspect
-import logging
 import json
+import logging
+import math
+import numbers
+import os
+import statistics
+import threading
+import time
+import zlib
 import zmq
 
+# numpy is optional. it is required for sampling NIC statistics and for
+# transforming numeric monitor data series before compressing them
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# lz4 compression is optional
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
 # dictionary storing monitor data. key: data identifier, value: list of data
 # values
 MONITOR_DATA = {}
 
+# number of most recent event dispatch durations that are kept for calculating
+# dispatch jitter statistics
+DISPATCH_STATS_LEN = 65536
+
+# number of bytes of heap memory that are pre-faulted when memory locking is
+# enabled
+PREFAULT_SIZE = 64 * 1024 * 1024
+
+# constants for mlockall() and mallopt() (see sys/mman.h and malloc.h)
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+M_TRIM_THRESHOLD = -1
+M_MMAP_MAX = -4
+
+# names of the interface statistics counters that are sampled from
+# /sys/class/net/<if>/statistics
+NIC_STATS_COUNTERS = ['rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes']
+
+# initial number of samples for which NIC statistics memory is allocated. the
+# memory is doubled whenever it is exhausted
+NIC_STATS_INITIAL_LEN = 4096
+
+# prefix of the OpenMetrics metric family names
+METRICS_PREFIX = "fluent10g_monitor"
+
+# content type of the OpenMetrics text exposition format
+METRICS_CONTENT_TYPE = \
+    "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# monitor data compression codecs supported by the agent
+COMPRESSION_CODECS = ['none', 'zlib'] + (['lz4'] if lz4 is not None else [])
+
+# encoded monitor data smaller than this size (in bytes) is not compressed when
+# the codec is chosen automatically
+COMPRESSION_MIN_SIZE = 1024
+
+# encoded monitor data larger than this size (in bytes) is compressed with the
+# fast lz4 codec (if supported) when the codec is chosen automatically. smaller
+# data is compressed with zlib, which achieves higher compression ratios
+COMPRESSION_LZ4_MIN_SIZE = 1024 * 1024
+
 
 class AgentMsg(object):
     """Message received/to be sent from/to the measurement application."""
@@ -63,22 +156,38 @@ class AgentMsg(object):
         else:
             self.args = {}
 
+        # optional message id. measurement applications that pipeline
+        # requests use it to correlate replies with requests
+        self.msg_id = json_data.get('id')
+
     def json(self):
         """Convert message to JSON data."""
-        return json.dumps({'evt_name': self.evt_name, 'args': self.args})
+        json_data = {'evt_name': self.evt_name, 'args': self.args}
+        if self.msg_id is not None:
+            json_data['id'] = self.msg_id
+        return json.dumps(json_data)
 
 
 class AgentMsgAck(AgentMsg):
     """ACK message to be sent to the measurement application."""
 
-    def __init__(self, return_data):
+    def __init__(self, return_data, msg_id=None):
         """Initialize message."""
-        # set event name
+        # set event name and id of the message that is acknowledged
         self.evt_name = "ack"
+        self.msg_id = msg_id
 
-        # optionally add return data
+        # event handlers may return a reply with a header
+        header = None
+        if isinstance(return_data, AgentReply):
+            header = return_data.header
+            return_data = return_data.return_data
+
+        # optionally add return data and header
         if return_data is not None:
             self.args = {'return_data': return_data}
+            if header is not None:
+                self.args['header'] = header
         else:
             self.args = None
 
@@ -86,11 +195,13 @@ class AgentMsgAck(AgentMsg):
 class AgentMsgNack(AgentMsg):
     """NACK message to be sent to the measurement application."""
 
-    def __init__(self, reason):
+    def __init__(self, reason, msg_id=None):
         """Initialize message."""
-        # set event name and nack reason
+        # set event name, nack reason and id of the message that is not
+        # acknowledged
         self.evt_name = "nack"
         self.args = {'reason': reason}
+        self.msg_id = msg_id
 
 
 class AgentException(Exception):
@@ -100,6 +211,15 @@ class AgentException(Exception):
     pass
 
 
+class AgentReply(object):
+    """Return data of an event handler accompanied by a reply header."""
+
+    def __init__(self, return_data, header):
+        """Initialize reply."""
+        self.return_data = return_data
+        self.header = header
+
+
 class AgentEventArgs(object):
     """Event arguments passed to the DuT by the measurement application."""
 
@@ -107,22 +227,433 @@ class AgentEventArgs(object):
         """Initialize event argument."""
         self._args = args
 
-    def get(self, arg):
-        """Return the argument value for a given key."""
-        if self._args is None:
-            raise AgentException(("argument '%s' does not exist (no " +
-                                  "arguments have been passed)") % arg)
-        try:
-            return self._args[arg]
-        except KeyError:
+    def get(self, arg, default=AgentException):
+        """Return the argument value for a given key.
+
+        If the argument does not exist and a default value is provided, the
+        default value is returned instead of raising an exception.
+        """
+        if self._args is None or arg not in self._args:
+            if default is not AgentException:
+                return default
+            if self._args is None:
+                raise AgentException(("argument '%s' does not exist (no " +
+                                      "arguments have been passed)") % arg)
             raise AgentException("argument '%s' does not exist" % arg)
+        return self._args[arg]
+
+
+class NicStatsSampler(object):
+    """Network interface statistics sampler.
+
+    Periodically reads the rx/tx packet and byte counters of a set of network
+    interfaces from /sys/class/net/<if>/statistics. Raw counter values are
+    stored in a compact NumPy array, packet and data rates are derived from
+    them on request.
+    """
+
+    def __init__(self, ifaces, interval):
+        """Open the statistics files of the network interfaces."""
+        if np is None:
+            raise AgentException("sampling nic statistics requires numpy")
+        self.ifaces = list(ifaces)
+        self.interval = interval
+
+        # open all counter files once. they are re-read via pread() at offset
+        # zero, which makes the kernel regenerate their content
+        self._fds = []
+        for iface in self.ifaces:
+            for counter in NIC_STATS_COUNTERS:
+                path = "/sys/class/net/%s/statistics/%s" % (iface, counter)
+                try:
+                    self._fds.append(os.open(path, os.O_RDONLY))
+                except OSError:
+                    raise AgentException("cannot read statistics of " +
+                                         "interface '%s'" % iface)
+
+        # sample timestamps (seconds) and raw counter values. the counter
+        # array has the shape (samples, interfaces, counters)
+        self._ts = np.zeros(NIC_STATS_INITIAL_LEN, dtype=np.float64)
+        self._counters = np.zeros((NIC_STATS_INITIAL_LEN, len(self.ifaces),
+                                   len(NIC_STATS_COUNTERS)), dtype=np.uint64)
+        self._n = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, setup_thread_func=None):
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._run,
+                                        args=(setup_thread_func,),
+                                        name="nic_stats_sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and close the statistics files."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+    def sample(self):
+        """Read all counters once and store the values."""
+        ts = time.monotonic()
+        values = [int(os.pread(fd, 32, 0)) for fd in self._fds]
+
+        with self._lock:
+            # double the memory if it is exhausted
+            if self._n == len(self._ts):
+                self._ts = np.concatenate((self._ts, np.zeros_like(self._ts)))
+                self._counters = np.concatenate(
+                    (self._counters, np.zeros_like(self._counters)))
+
+            self._ts[self._n] = ts
+            self._counters[self._n] = np.array(values, dtype=np.uint64) \
+                .reshape(len(self.ifaces), len(NIC_STATS_COUNTERS))
+            self._n += 1
+
+    def rates(self):
+        """Return the rx/tx pps and bps series of all sampled interfaces.
+
+        Rates are calculated from the counter deltas of consecutive samples.
+        Counter wrap-arounds of both 32 and 64 bit wide counters are handled.
+        The returned dictionary is keyed by interface name. For each interface
+        the sample times (relative to the first sample) and the rx/tx packet
+        and bit rates (at layer 2, i.e. without Ethernet preamble and FCS) are
+        provided.
+        """
+        with self._lock:
+            ts = self._ts[:self._n].copy()
+            counters = self._counters[:self._n].copy()
+
+        if len(ts) < 2:
+            return {iface: {'t': [], 'rx_pps': [], 'tx_pps': [],
+                            'rx_bps': [], 'tx_bps': []}
+                    for iface in self.ifaces}
+
+        # uint64 subtraction wraps around modulo 2**64, which already handles
+        # 64 bit counter overflows. counters that are only 32 bit wide (their
+        # previous value fits into 32 bits) and decreased wrapped around modulo
+        # 2**32
+        prev, cur = counters[:-1], counters[1:]
+        deltas = cur - prev
+        wrap32 = (cur < prev) & (prev <= np.uint64(0xFFFFFFFF))
+        deltas[wrap32] &= np.uint64(0xFFFFFFFF)
+
+        rates = deltas.astype(np.float64) / np.diff(ts)[:, None, None]
+        t = ts[1:] - ts[0]
+
+        result = {}
+        for i, iface in enumerate(self.ifaces):
+            result[iface] = {
+                't': t.tolist(),
+                'rx_pps': rates[:, i, 0].tolist(),
+                'tx_pps': rates[:, i, 1].tolist(),
+                'rx_bps': (8 * rates[:, i, 2]).tolist(),
+                'tx_bps': (8 * rates[:, i, 3]).tolist(),
+            }
+        return result
+
+    def _run(self, setup_thread_func):
+        """Sampling loop executed by the background thread."""
+        if setup_thread_func is not None:
+            setup_thread_func()
+
+        # sample at absolute points in time, so that sampling times do not
+        # drift due to the time spent for reading the counters
+        t_next = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            t_next += self.interval
+            self._stop.wait(max(t_next - time.monotonic(), 0.0))
+
+
+class DispatchStats(object):
+    """Event dispatch duration statistics.
+
+    Keeps the durations (in nanoseconds) of the most recent event dispatches,
+    i.e. the time from the reception of a message until the reply has been sent
+    back to the measurement application.
+    """
+
+    def __init__(self, maxlen=DISPATCH_STATS_LEN):
+        """Initialize empty statistics."""
+        self._durations = collections.deque(maxlen=maxlen)
+        self._n_total = 0
+
+    def record(self, duration_ns):
+        """Record the duration of a single event dispatch."""
+        self._durations.append(duration_ns)
+        self._n_total += 1
+
+    def summary(self):
+        """Return a dictionary summarizing the recorded dispatch durations."""
+        if len(self._durations) == 0:
+            return {'n_total': self._n_total, 'n': 0}
+
+        durations = sorted(self._durations)
+        n = len(durations)
+
+        return {
+            'n_total': self._n_total,
+            'n': n,
+            'min_ns': durations[0],
+            'max_ns': durations[-1],
+            'mean_ns': statistics.mean(durations),
+            'stdev_ns': statistics.pstdev(durations),
+            'p50_ns': durations[int(0.5 * (n - 1))],
+            'p99_ns': durations[int(0.99 * (n - 1))],
+            'p999_ns': durations[int(0.999 * (n - 1))],
+            'jitter_ns': durations[-1] - durations[0],
+        }
+
+
+def encode_monitor_data(data, codec="auto", codecs=None):
+    """Encode and compress a monitor data series.
+
+    Integer series are delta-of-delta encoded, floating-point series are XOR
+    encoded (each value's bit pattern is XORed with the one of its
+    predecessor). Monotone counters and repeated values thus turn into long
+    runs of zero bytes. Unsigned 64 bit series are delta-of-delta encoded
+    modulo 2**64 (dtype 'uint64'), all other integer series as int64. All
+    other data (and all data, if numpy is not installed) is JSON encoded. The
+    encoded data is then compressed with 'codec' ('none', 'zlib' or 'lz4'). If
+    'codec' is 'auto', the codec is chosen from the list of acceptable 'codecs'
+    based on the data size. Returns the base64-encoded data and a header
+    describing the encoding.
+    """
+    t_start = time.perf_counter()
+
+    # transform data
+    arr = None
+    if np is not None:
+        try:
+            arr = np.asarray(data)
+            # numpy converts lists of integers to float64 if they do not fit
+            # into int64. keep them as unsigned integers, if possible
+            if arr.dtype.kind == 'f' and all(
+                    isinstance(x, numbers.Integral) for x in data):
+                arr = np.asarray(data, dtype=np.uint64)
+        except (ValueError, OverflowError):
+            arr = None
+    if arr is not None and arr.ndim == 1 and arr.dtype.kind in 'iu' and \
+            arr.dtype.itemsize <= 8:
+        # delta-of-delta encoding. decoded by applying cumsum() twice. uint64
+        # values may not fit into int64, their differences wrap around modulo
+        # 2**64 (and so does the decoding)
+        dtype = "uint64" if arr.dtype == np.uint64 else "int64"
+        arr = arr.astype(dtype)
+        dod = np.diff(np.diff(arr, prepend=arr.dtype.type(0)),
+                      prepend=arr.dtype.type(0))
+        raw = dod.astype('<' + arr.dtype.str[1:]).tobytes()
+        encoding = "dod"
+    elif arr is not None and arr.ndim == 1 and arr.dtype.kind == 'f':
+        # xor encoding. decoded by bitwise_xor.accumulate()
+        bits = arr.astype('<f8').view('<u8')
+        xor = np.bitwise_xor(bits, np.concatenate(
+            (np.zeros(1, dtype='<u8'), bits[:-1])))
+        encoding, dtype, raw = "xor", "float64", xor.tobytes()
+    else:
+        encoding, dtype, raw = "json", None, json.dumps(data).encode()
+
+    # choose codec
+    codec_auto = codec == "auto"
+    if codecs is None:
+        codecs = COMPRESSION_CODECS
+    if codec == "auto":
+        if len(raw) < COMPRESSION_MIN_SIZE:
+            codec = "none"
+        elif len(raw) >= COMPRESSION_LZ4_MIN_SIZE and "lz4" in codecs and \
+                lz4 is not None:
+            codec = "lz4"
+        elif "zlib" in codecs:
+            codec = "zlib"
+        else:
+            codec = "none"
+    elif codec not in COMPRESSION_CODECS:
+        raise AgentException("unsupported compression codec '%s'" % codec)
+
+    # compress
+    if codec == "zlib":
+        compressed = zlib.compress(raw, 6)
+    elif codec == "lz4":
+        compressed = lz4.frame.compress(raw)
+    else:
+        compressed = raw
+
+    # do not send compressed data if compression did not pay off
+    if codec_auto and len(compressed) >= len(raw):
+        codec, compressed = "none", raw
+
+    header = {
+        'encoding': encoding,
+        'dtype': dtype,
+        'codec': codec,
+        'n': len(data),
+        'size_raw': len(raw),
+        'size_compressed': len(compressed),
+        'ratio': len(raw) / max(len(compressed), 1),
+        'encode_time': time.perf_counter() - t_start,
+    }
+
+    return base64.b64encode(compressed).decode(), header
+
+
+class MonitorMetrics(object):
+    """OpenMetrics exposition of monitor data.
+
+    Aggregates (latest value, count, sum, minimum and maximum) are updated
+    incrementally whenever monitor data is stored. The rendered OpenMetrics
+    text is cached: the metric lines of an identifier are only re-rendered if
+    new data has been stored for it, the whole text only if any identifier
+    changed. Thus, scrapes are cheap and do not hold up the agent's control
+    loop.
+    """
+
+    # metric families: (name suffix, type, help text)
+    FAMILIES = [
+        ('', 'summary', 'Number and sum of stored monitor data values.'),
+        ('_last', 'gauge', 'Most recently stored monitor data value.'),
+        ('_min', 'gauge', 'Minimum stored monitor data value.'),
+        ('_max', 'gauge', 'Maximum stored monitor data value.'),
+    ]
+
+    def __init__(self):
+        """Initialize empty aggregates."""
+        # key: identifier, value: [version, count, sum, last, min, max]
+        self._aggregates = {}
+        # key: identifier, value: (version, list of lines per metric family)
+        self._lines = {}
+        self._version = 0
+        self._text = None
+        self._text_version = -1
+        # protects the aggregates. the rendering cache is protected by a
+        # separate lock, so that concurrent scrapes do not hold up storing
+        # monitor data
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+
+    def update(self, ident, data):
+        """Update the aggregates of an identifier with a new value."""
+        # only numeric data can be exposed
+        if isinstance(data, bool) or not isinstance(data, numbers.Real):
+            return
+
+        with self._lock:
+            self._version += 1
+            agg = self._aggregates.get(ident)
+            if agg is None:
+                self._aggregates[ident] = [self._version, 1, data, data, data,
+                                           data]
+            else:
+                agg[0] = self._version
+                agg[1] += 1
+                agg[2] += data
+                agg[3] = data
+                agg[4] = min(agg[4], data)
+                agg[5] = max(agg[5], data)
+
+    def render(self):
+        """Return the OpenMetrics text of all identifiers."""
+        with self._render_lock:
+            with self._lock:
+                if self._text_version == self._version:
+                    return self._text
+                version = self._version
+                aggregates = [(ident, list(agg)) for ident, agg in
+                              self._aggregates.items()]
+
+            # re-render metric lines of identifiers that have changed
+            for ident, agg in aggregates:
+                cached = self._lines.get(ident)
+                if cached is None or cached[0] != agg[0]:
+                    self._lines[ident] = (agg[0],
+                                          self._render_ident(ident, agg))
+
+            # assemble metric families
+            out = []
+            for i, (suffix, metric_type, help_text) in \
+                    enumerate(self.FAMILIES):
+                name = METRICS_PREFIX + suffix
+                out.append("# TYPE %s %s\n# HELP %s %s\n" %
+                           (name, metric_type, name, help_text))
+                for ident, _ in aggregates:
+                    out.append(self._lines[ident][1][i])
+            out.append("# EOF\n")
+            self._text = "".join(out)
+            self._text_version = version
+            return self._text
+
+    def _render_ident(self, ident, agg):
+        """Render the metric lines (one entry per family) of an identifier."""
+        label = '{ident="%s"}' % str(ident).replace('\\', '\\\\') \
+            .replace('"', '\\"').replace('\n', '\\n')
+        _, count, total, last, minimum, maximum = agg
+        return [
+            "%s_count%s %d\n%s_sum%s %s\n" %
+            (METRICS_PREFIX, label, count, METRICS_PREFIX, label,
+             self._format_value(total)),
+            "%s_last%s %s\n" % (METRICS_PREFIX, label,
+                                self._format_value(last)),
+            "%s_min%s %s\n" % (METRICS_PREFIX, label,
+                               self._format_value(minimum)),
+            "%s_max%s %s\n" % (METRICS_PREFIX, label,
+                               self._format_value(maximum)),
+        ]
+
+    @staticmethod
+    def _format_value(value):
+        """Format a number according to the OpenMetrics specification."""
+        if isinstance(value, numbers.Integral):
+            return str(int(value))
+        value = float(value)
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP request handler serving monitor data in OpenMetrics format."""
+
+    def do_GET(self):
+        """Handle HTTP GET request."""
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Suppress logging of each request."""
+        pass
 
 
 class Fluent10GAgent(object):
     """Fluent10G agent class."""
 
-    def __init__(self, listenIPAddr, listenPort):
-        """Initialize and start ZeroMQ socket."""
+    def __init__(self, listenIPAddr, listenPort, cpus_io=None,
+                 cpus_sampler=None, rt_priority=None, lock_memory=False):
+        """Initialize and start ZeroMQ socket.
+
+        The optional arguments configure the low-jitter mode of the agent.
+        'cpus_io' and 'cpus_sampler' are sets of CPU numbers the agent's I/O
+        thread (i.e. the thread calling start()) and sampler threads are pinned
+        to. If 'rt_priority' is set, the I/O thread requests SCHED_FIFO
+        scheduling with the given priority (sampler threads are scheduled with
+        one priority level less). If 'lock_memory' is True, all current and
+        future memory of the agent process is locked and heap memory is
+        pre-faulted.
+        """
         # set up logging
         log_handler = logging.StreamHandler()
         log_formatter = logging.Formatter(
@@ -147,6 +678,38 @@ class Fluent10GAgent(object):
         # requested
         self._evt_handlers["get_monitor_data"] = self._get_monitor_data
 
+        # set up an event handler with the identifier "get_dispatch_stats",
+        # which provides the event dispatch jitter statistics back to the
+        # measurement application
+        self._evt_handlers["get_dispatch_stats"] = self._get_dispatch_stats
+
+        # set up an event handler with the identifier "get_nic_stats", which
+        # provides the sampled network interface statistics back to the
+        # measurement application
+        self._evt_handlers["get_nic_stats"] = self._get_nic_stats
+
+        # network interface statistics sampler (see start_nic_sampler())
+        self._nic_sampler = None
+
+        # incrementally updated monitor data aggregates and the (optional)
+        # HTTP server exposing them (see start_metrics_server())
+        self._metrics = MonitorMetrics()
+        self._metrics_server = None
+
+        # low-jitter mode configuration
+        self._cpus_io = cpus_io
+        self._cpus_sampler = cpus_sampler
+        self._rt_priority = rt_priority
+
+        # event dispatch duration statistics
+        self._dispatch_stats = DispatchStats()
+
+        # lock and pre-fault memory, if requested. this is done right away
+        # (and not in start()) so that buffers allocated by sampler threads
+        # started before the agent are locked as well
+        if lock_memory:
+            self._lock_memory()
+
     def register_evt_handler(self, evt_name, cb_func):
         """Register an event handler callback function."""
         # check if callback for this event name is registered already and print
@@ -176,6 +739,55 @@ class Fluent10GAgent(object):
         # append monitor data to list for the specified identifier
         MONITOR_DATA[ident].append(data)
 
+        # update aggregates exposed via OpenMetrics
+        self._metrics.update(ident, data)
+
+    def start_nic_sampler(self, ifaces, interval):
+        """Start sampling the statistics of network interfaces.
+
+        The rx/tx packet and byte counters of the network interfaces 'ifaces'
+        are sampled every 'interval' seconds in a background sampler thread.
+        The derived rate time series can be fetched by the measurement
+        application via the "get_nic_stats" event.
+        """
+        if self._nic_sampler is not None:
+            self._nic_sampler.stop()
+
+        self._nic_sampler = NicStatsSampler(ifaces, interval)
+        self._nic_sampler.start(self.pin_sampler_thread)
+        self._logger.log(logging.INFO,
+                         "sampling statistics of %s every %g seconds",
+                         ", ".join(ifaces), interval)
+
+    def start_metrics_server(self, listenIPAddr, listenPort):
+        """Start an HTTP server exposing monitor data in OpenMetrics format.
+
+        The latest value and aggregates of all numeric monitor data
+        identifiers are served at 'http://<listenIPAddr>:<listenPort>/metrics'.
+        The server runs in background threads with normal (non real-time)
+        scheduling, so that scrapes cannot preempt event dispatching.
+        """
+        if self._metrics_server is not None:
+            raise AgentException("metrics server already started")
+
+        self._metrics_server = http.server.ThreadingHTTPServer(
+            (listenIPAddr, listenPort), MetricsRequestHandler)
+        self._metrics_server.daemon_threads = True
+        self._metrics_server.metrics = self._metrics
+
+        def serve():
+            # threads inherit the scheduling policy of the thread that creates
+            # them. drop real-time scheduling, in case the agent's I/O thread
+            # starts the server
+            if os.sched_getscheduler(0) != os.SCHED_OTHER:
+                os.sched_setscheduler(0, os.SCHED_OTHER, os.sched_param(0))
+            self._metrics_server.serve_forever()
+
+        threading.Thread(target=serve, name="metrics_server",
+                         daemon=True).start()
+        self._logger.log(logging.INFO, "serving metrics on %s:%d",
+                         listenIPAddr, listenPort)
+
     def start(self):
         """Start the agent.
 
@@ -183,10 +795,14 @@ class Fluent10GAgent(object):
         server socket and then are processed. For each received message, an
         ACK/NACK is sent back to the measurement application.
         """
+        # configure cpu affinity and scheduling policy of the I/O thread
+        self._setup_thread(self._cpus_io, self._rt_priority)
+
         while True:
             # wait for next message
             try:
                 msg = self._recv()
+                t_dispatch_start = time.perf_counter_ns()
             except json.decoder.JSONDecodeError:
                 # not a JSON message. print warning and send nack
                 self._logger.log(logging.WARN, "non-JSON message")
@@ -199,33 +815,101 @@ class Fluent10GAgent(object):
             try:
                 msg = AgentMsg(msg)
             except Exception:
-                # unexpected message format. print warning and send nack
+                # unexpected message format. print warning and send nack. the
+                # message id is echoed back, if the message has one
                 self._logger.log(logging.WARN, "invalid JSON message")
-                self._send(AgentMsgNack("invalid JSON message"))
+                msg_id = msg.get('id') if isinstance(msg, dict) else None
+                self._send(AgentMsgNack("invalid JSON message", msg_id))
                 continue
 
             # handle the message
             try:
                 return_data = self._handle_msg(msg)
                 # everything worked. send ack
-                self._send(AgentMsgAck(return_data))
+                self._send(AgentMsgAck(return_data, msg.msg_id))
+                # record event dispatch duration
+                self._dispatch_stats.record(time.perf_counter_ns() -
+                                            t_dispatch_start)
             except AgentException as exc:
                 # print out a warning
                 self._logger.log(logging.WARN, exc.args[0])
                 # something went wrong, report error message to measurement
                 # application
-                self._send(AgentMsgNack(exc.args[0]))
+                self._send(AgentMsgNack(exc.args[0], msg.msg_id))
             except KeyboardInterrupt:
                 # application aborted, report to measurement application
-                self._send(AgentMsgNack("agent quit"))
+                self._send(AgentMsgNack("agent quit", msg.msg_id))
                 exit(0)
             except Exception as exc:
                 # something went wrong, but no error message is defined. report
                 # to the measurement application
-                self._send(AgentMsgNack("undefined error"))
+                self._send(AgentMsgNack("undefined error", msg.msg_id))
                 # raise error -> agent will exit
                 raise exc
 
+    def pin_sampler_thread(self):
+        """Configure the calling thread as a sampler thread.
+
+        Sampler threads (i.e. threads collecting monitoring data in the
+        background) should call this function once after they have been
+        started. The thread is pinned to the configured sampler CPUs and, if
+        real-time scheduling is enabled, scheduled with SCHED_FIFO at one
+        priority level below the I/O thread.
+        """
+        if self._rt_priority is not None:
+            rt_priority = max(self._rt_priority - 1, 1)
+        else:
+            rt_priority = None
+        self._setup_thread(self._cpus_sampler, rt_priority)
+
+    def _setup_thread(self, cpus, rt_priority):
+        """Set cpu affinity and scheduling policy of the calling thread."""
+        # on linux, pid 0 refers to the calling thread (not the whole process)
+        if cpus is not None:
+            os.sched_setaffinity(0, cpus)
+            self._logger.log(logging.INFO, "thread '%s' pinned to cpus %s",
+                             threading.current_thread().name,
+                             sorted(os.sched_getaffinity(0)))
+
+        if rt_priority is not None:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO,
+                                      os.sched_param(rt_priority))
+                self._logger.log(logging.INFO,
+                                 "thread '%s' scheduled with SCHED_FIFO " +
+                                 "(priority %d)",
+                                 threading.current_thread().name, rt_priority)
+            except PermissionError:
+                # do not abort, the agent works without real-time scheduling as
+                # well (just with more jitter)
+                self._logger.log(logging.WARN,
+                                 "insufficient permissions for SCHED_FIFO " +
+                                 "scheduling")
+
+    def _lock_memory(self):
+        """Lock all current and future memory pages and pre-fault the heap."""
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        # lock all current and future memory pages into RAM
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            self._logger.log(logging.WARN, "could not lock memory: %s",
+                             os.strerror(ctypes.get_errno()))
+            return
+
+        # never give heap memory back to the operating system and do not
+        # serve allocations via mmap(). this way heap memory that has been
+        # touched once stays resident
+        libc.mallopt(M_TRIM_THRESHOLD, -1)
+        libc.mallopt(M_MMAP_MAX, 0)
+
+        # pre-fault heap memory by allocating (and thereby touching) a large
+        # buffer. when it is freed, the memory stays with the process
+        prefault = bytearray(PREFAULT_SIZE)
+        del prefault
+
+        self._logger.log(logging.INFO, "memory locked, %d MB heap pre-faulted",
+                         PREFAULT_SIZE // 1024 // 1024)
+
     def _recv(self):
         """Receive a message from the ZeroMQ socket."""
         return self._zmqsock.recv_json()
@@ -251,7 +935,13 @@ class Fluent10GAgent(object):
         return self._evt_handlers[msg.evt_name](AgentEventArgs(msg.args))
 
     def _get_monitor_data(self, args):
-        """Callback function returning monitor data back to measurement app."""
+        """Callback function returning monitor data back to measurement app.
+
+        If the optional argument 'compression' is provided ('auto', 'none',
+        'zlib' or 'lz4'), the data is returned encoded and compressed (see
+        encode_monitor_data()). For 'auto', the measurement application may
+        list the codecs it supports in the optional argument 'codecs'.
+        """
         # get identifier of the data set that is requested
         ident = args.get("ident")
 
@@ -259,5 +949,36 @@ class Fluent10GAgent(object):
         if ident not in MONITOR_DATA:
             raise AgentException("no data '%s' found" % ident)
 
-        # return the data
-        return MONITOR_DATA[ident]
+        # return the data uncompressed, if compression is not requested
+        codec = args.get("compression", None)
+        if codec is None:
+            return MONITOR_DATA[ident]
+
+        # return the data compressed
+        data, header = encode_monitor_data(MONITOR_DATA[ident], codec,
+                                           args.get("codecs", None))
+        return AgentReply(data, header)
+
+    def _get_dispatch_stats(self, args):
+        """Callback function returning the event dispatch statistics."""
+        return self._dispatch_stats.summary()
+
+    def _get_nic_stats(self, args):
+        """Callback function returning NIC statistics back to measurement app.
+
+        Returns the rate series of all sampled interfaces or, if the optional
+        argument 'ifaces' is provided, only of the listed interfaces.
+        """
+        if self._nic_sampler is None:
+            raise AgentException("nic statistics sampler not started")
+
+        rates = self._nic_sampler.rates()
+
+        ifaces = args.get("ifaces", None)
+        if ifaces is None:
+            return rates
+
+        for iface in ifaces:
+            if iface not in rates:
+                raise AgentException("interface '%s' not sampled" % iface)
+        return {iface: rates[iface] for iface in ifaces}
@@ -0,0 +1,362 @@
+"""FlueNT10G Device-under-Test Agent Client."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# This library implements the measurement application side of the FlueNT10G
+# agent control channel in Python (the Go counterpart is part of the
+# gofluent10g library). The client communicates with a FlueNT10G agent running
+# on the device-under-test via a ZeroMQ DEALER socket. Multiple requests may be
+# outstanding at the same time (pipelining). Each request carries a message id,
+# which the agent echoes back in its reply, so that replies can be correlated
+# with their requests. If a reply does not arrive in time, only the request
+# waited for fails, other outstanding requests are not affected. If the
+# connection to the agent breaks, it is re-established and all outstanding
+# requests fail. Since ZeroMQ hides most connection errors (e.g. a half-open
+# connection to an agent whose host has been restarted), the connection is
+# also re-established after several consecutive requests have timed out.
+# Monitor data fetched from the agent is decoded into NumPy arrays.
+# Optionally, the agent compresses monitor data before transferring it (see
+# encode_monitor_data() in fluent10g_agent.py).
+#
+# Example:
+#
+#   client = Fluent10GAgentClient("192.168.1.2", 5555)
+#   reqs = [client.submit("set_config", {"cfg": i}) for i in range(10)]
+#   for req in reqs:
+#       req.result()
+#   cpu_load = client.get_monitor_data("cpu_load")
+
+import base64
+import itertools
+import json
+import time
+import zlib
+import numpy as np
+import zmq
+
+# lz4 compression is optional
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# default time (in seconds) to wait for a reply from the agent
+DEFAULT_TIMEOUT = 5.0
+
+# default number of consecutive timeouts after which the connection to the
+# agent is re-established
+RECONNECT_TIMEOUTS = 3
+
+# monitor data compression codecs supported by the client
+COMPRESSION_CODECS = ['none', 'zlib'] + (['lz4'] if lz4 is not None else [])
+
+
+class AgentClientException(Exception):
+    """Custom Exception class."""
+
+    # it's all about the exception type, nothing to do here!
+    pass
+
+
+class AgentNackException(AgentClientException):
+    """Exception raised when the agent does not acknowledge a request."""
+
+    pass
+
+
+class AgentTimeoutException(AgentClientException):
+    """Exception raised when the agent does not reply in time."""
+
+    pass
+
+
+class AgentConnectionException(AgentClientException):
+    """Exception raised when the connection to the agent breaks."""
+
+    pass
+
+
+def decode_monitor_data(data, header, dtype=None):
+    """Decompress and decode monitor data returned by the agent."""
+    raw = base64.b64decode(data)
+
+    # decompress
+    if header['codec'] == "zlib":
+        raw = zlib.decompress(raw)
+    elif header['codec'] == "lz4":
+        if lz4 is None:
+            raise AgentClientException("lz4 library not installed")
+        raw = lz4.frame.decompress(raw)
+    elif header['codec'] != "none":
+        raise AgentClientException("unsupported compression codec '%s'" %
+                                   header['codec'])
+
+    # reverse transformation
+    if header['encoding'] == "dod":
+        dod = np.frombuffer(raw, dtype='<u8' if header['dtype'] == "uint64"
+                            else '<i8')
+        arr = np.cumsum(np.cumsum(dod, dtype=dod.dtype), dtype=dod.dtype)
+    elif header['encoding'] == "xor":
+        arr = np.bitwise_xor.accumulate(np.frombuffer(raw, dtype='<u8')) \
+            .view('<f8')
+    elif header['encoding'] == "json":
+        arr = np.asarray(json.loads(raw.decode()))
+    else:
+        raise AgentClientException("unsupported encoding '%s'" %
+                                   header['encoding'])
+
+    return np.asarray(arr, dtype=dtype)
+
+
+class AgentRequest(object):
+    """Request that has been sent to the agent."""
+
+    def __init__(self, client, msg_id, evt_name):
+        """Initialize pending request."""
+        self.msg_id = msg_id
+        self.evt_name = evt_name
+        self._client = client
+        self._done = False
+        self._return_data = None
+        self._exc = None
+
+        # reply header (only provided by some event handlers)
+        self.header = None
+
+    def done(self):
+        """Return whether the agent's reply has been received."""
+        if not self._done:
+            # process replies that may have arrived in the meantime
+            self._client._process_replies(0)
+        return self._done
+
+    def result(self, timeout=None):
+        """Wait for the agent's reply and return the returned data.
+
+        Raises AgentNackException if the agent did not acknowledge the request
+        and AgentTimeoutException if no reply arrived within 'timeout' seconds
+        (defaults to the client's timeout).
+        """
+        if not self._done:
+            self._client._wait(self, timeout)
+        if self._exc is not None:
+            raise self._exc
+        return self._return_data
+
+    def _set_reply(self, reply):
+        """Complete the request with the agent's reply."""
+        if reply['evt_name'] == "ack":
+            args = reply.get('args')
+            if args is not None:
+                self._return_data = args.get('return_data')
+                self.header = args.get('header')
+        else:
+            self._exc = AgentNackException(
+                "agent did not acknowledge event '%s': %s" %
+                (self.evt_name, reply['args']['reason']))
+        self._done = True
+
+    def _set_exception(self, exc):
+        """Complete the request with an error."""
+        self._exc = exc
+        self._done = True
+
+
+class Fluent10GAgentClient(object):
+    """FlueNT10G agent client class."""
+
+    def __init__(self, addr, port, timeout=DEFAULT_TIMEOUT,
+                 reconnect_timeouts=RECONNECT_TIMEOUTS):
+        """Connect to the agent listening at the given address and port.
+
+        The connection is re-established after 'reconnect_timeouts'
+        consecutive timeouts.
+        """
+        self._endpoint = "tcp://%s:%d" % (addr, port)
+        self._timeout = timeout
+        self._reconnect_timeouts = reconnect_timeouts
+        self._n_timeouts = 0
+        self._zmqctx = zmq.Context.instance()
+        self._zmqsock = None
+
+        # message ids are unique for the lifetime of the client
+        self._msg_ids = itertools.count()
+
+        # requests for which no reply has been received yet. key: message id,
+        # value: request
+        self._pending = {}
+
+        # header of the most recent compressed monitor data reply
+        self.last_header = None
+
+        self._connect()
+
+    def __enter__(self):
+        """Enter context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context manager and close the connection."""
+        self.close()
+
+    def close(self):
+        """Close the connection to the agent."""
+        if self._zmqsock is not None:
+            self._zmqsock.close(linger=0)
+            self._zmqsock = None
+
+    def submit(self, evt_name, args=None):
+        """Send an event trigger request without waiting for the reply.
+
+        Returns an AgentRequest object, whose result() function waits for and
+        returns the data returned by the agent's event handler.
+        """
+        msg_id = next(self._msg_ids)
+        msg = {'evt_name': evt_name, 'id': msg_id}
+        if args is not None:
+            msg['args'] = args
+
+        req = AgentRequest(self, msg_id, evt_name)
+        self._pending[msg_id] = req
+
+        # the agent uses a REP socket, which expects an empty delimiter frame
+        # in front of the message
+        try:
+            self._zmqsock.send_multipart([b"", json.dumps(msg).encode()])
+        except zmq.ZMQError as exc:
+            self._reconnect(exc)
+
+        return req
+
+    def request(self, evt_name, args=None, timeout=None):
+        """Trigger an event and return the data returned by the agent."""
+        return self.submit(evt_name, args).result(timeout)
+
+    def get_monitor_data(self, ident, dtype=None, compression=None,
+                         timeout=None):
+        """Fetch monitor data stored by the agent as a NumPy array.
+
+        If 'compression' is set ('auto', 'none', 'zlib' or 'lz4'), the agent
+        encodes and compresses the data before transferring it. For 'auto', the
+        agent selects one of the codecs supported by the client. The reply
+        header (including compression ratio and encode time) is available in
+        the attribute 'last_header' afterwards.
+        """
+        args = {'ident': ident}
+        if compression is not None:
+            args['compression'] = compression
+            args['codecs'] = COMPRESSION_CODECS
+
+        req = self.submit("get_monitor_data", args)
+        data = req.result(timeout)
+        self.last_header = req.header
+
+        if req.header is None:
+            return np.asarray(data, dtype=dtype)
+        return decode_monitor_data(data, req.header, dtype)
+
+    def get_nic_stats(self, ifaces=None, timeout=None):
+        """Fetch the NIC statistics rate series sampled by the agent.
+
+        Returns a dictionary keyed by interface name. For each interface a
+        dictionary with the NumPy arrays 't', 'rx_pps', 'tx_pps', 'rx_bps' and
+        'tx_bps' is provided.
+        """
+        args = {'ifaces': ifaces} if ifaces is not None else None
+        stats = self.request("get_nic_stats", args, timeout)
+        return {iface: {key: np.asarray(values, dtype=np.float64)
+                        for key, values in series.items()}
+                for iface, series in stats.items()}
+
+    def get_dispatch_stats(self, timeout=None):
+        """Fetch the agent's event dispatch jitter statistics."""
+        return self.request("get_dispatch_stats", None, timeout)
+
+    def _connect(self):
+        """Create DEALER socket and connect to the agent."""
+        self._zmqsock = self._zmqctx.socket(zmq.DEALER)
+        self._zmqsock.setsockopt(zmq.LINGER, 0)
+        self._zmqsock.connect(self._endpoint)
+
+    def _reconnect(self, exc):
+        """Re-establish a broken connection to the agent.
+
+        All pending requests fail, since replies to them cannot be received on
+        the new connection.
+        """
+        self.close()
+        self._connect()
+        self._n_timeouts = 0
+
+        pending = self._pending
+        self._pending = {}
+        for req in pending.values():
+            req._set_exception(AgentConnectionException(
+                ("connection to agent lost before reply to event '%s' " +
+                 "arrived: %s") % (req.evt_name, exc)))
+
+    def _process_replies(self, timeout_ms):
+        """Receive replies until none is available within the timeout."""
+        try:
+            while self._zmqsock.poll(timeout_ms, zmq.POLLIN):
+                frames = self._zmqsock.recv_multipart()
+                reply = json.loads(frames[-1])
+
+                # replies to requests that have timed out before are dropped
+                req = self._pending.pop(reply.get('id'), None)
+                if req is not None:
+                    req._set_reply(reply)
+                self._n_timeouts = 0
+
+                # only wait for the first reply
+                timeout_ms = 0
+        except zmq.ZMQError as exc:
+            self._reconnect(exc)
+
+    def _wait(self, req, timeout):
+        """Wait until a reply to the given request has been received.
+
+        If no reply arrives in time, only the given request fails. A late reply
+        to it is dropped. After too many consecutive timeouts, the connection
+        is re-established (and all other pending requests fail).
+        """
+        if timeout is None:
+            timeout = self._timeout
+        t_deadline = time.monotonic() + timeout
+
+        while not req._done:
+            t_remaining = t_deadline - time.monotonic()
+            if t_remaining <= 0:
+                self._pending.pop(req.msg_id, None)
+                req._set_exception(AgentTimeoutException(
+                    "no reply from agent for event '%s'" % req.evt_name))
+                self._n_timeouts += 1
+                if self._n_timeouts >= self._reconnect_timeouts:
+                    self._reconnect("%d consecutive timeouts" %
+                                    self._n_timeouts)
+                break
+            self._process_replies(int(1000 * t_remaining) + 1)
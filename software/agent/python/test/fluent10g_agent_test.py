@@ -0,0 +1,198 @@
+"""Tests for the FlueNT10G agent and its client library."""
+# The MIT License
+#
+# Copyright (c) 2017-2018 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Runs agents in background threads and sends requests to them with the
+# client library.
+
+import os
+import socket
+import threading
+import time
+import pytest
+import fluent10g_agent
+import fluent10g_agent_client
+
+
+def free_port():
+    """Return a currently unused TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_agent(name="agent", **kwargs):
+    """Start an agent in a background thread. Returns its port."""
+    port = free_port()
+    agent = fluent10g_agent.Fluent10GAgent("127.0.0.1", port, **kwargs)
+    agent.register_evt_handler("name", lambda args: name)
+    agent.register_evt_handler(
+        "affinity", lambda args: sorted(os.sched_getaffinity(0)))
+    agent.register_evt_handler(
+        "sleep", lambda args: time.sleep(args.get('t')) or "done")
+    agent.register_evt_handler(
+        "store", lambda args: agent.store_monitor_data(args.get('ident'),
+                                                       args.get('value')))
+    threading.Thread(target=agent.start, daemon=True).start()
+    return port
+
+
+class Proxy(object):
+    """TCP proxy, whose connections can be frozen (they stay open, but no
+    longer forward any data, like a half-open connection)."""
+
+    def __init__(self, port):
+        """Start forwarding connections to 'port'."""
+        self.port = port
+        self.conns = 0
+        self.frozen = set()
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.listen_port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def freeze(self, port):
+        """Freeze the current connections and forward new ones to 'port'."""
+        self.frozen.update(range(self.conns))
+        self.port = port
+
+    def _accept(self):
+        """Accept connections and start forwarding them."""
+        while True:
+            a, _ = self._sock.accept()
+            b = socket.create_connection(("127.0.0.1", self.port))
+            conn = self.conns
+            self.conns += 1
+            for src, dst in ((a, b), (b, a)):
+                threading.Thread(target=self._forward, args=(conn, src, dst),
+                                 daemon=True).start()
+
+    def _forward(self, conn, src, dst):
+        """Forward data of a connection in one direction."""
+        while True:
+            data = src.recv(65536)
+            if not data:
+                break
+            if conn not in self.frozen:
+                dst.sendall(data)
+
+
+@pytest.fixture
+def agent_port():
+    """Start an agent with its I/O thread pinned to a single CPU."""
+    return start_agent(cpus_io={min(os.sched_getaffinity(0))})
+
+
+def test_dispatch_stats_summary():
+    stats = fluent10g_agent.DispatchStats(maxlen=4)
+    assert stats.summary() == {'n_total': 0, 'n': 0}
+    for duration in (50, 10, 40, 20, 30):
+        stats.record(duration)
+
+    # only the most recent durations are kept
+    summary = stats.summary()
+    assert (summary['n_total'], summary['n']) == (5, 4)
+    assert (summary['min_ns'], summary['max_ns']) == (10, 40)
+    assert summary['mean_ns'] == 25
+    assert summary['jitter_ns'] == 30
+
+
+def test_dispatch_stats(agent_port):
+    with fluent10g_agent_client.Fluent10GAgentClient(
+            "127.0.0.1", agent_port) as client:
+        # the I/O thread has been pinned
+        assert client.request("affinity", timeout=5.0) == \
+            [min(os.sched_getaffinity(0))]
+        for _ in range(9):
+            client.request("sleep", {'t': 0.001}, timeout=5.0)
+
+        # the request fetching the statistics has not completed yet
+        stats = client.get_dispatch_stats(timeout=5.0)
+        assert stats['n_total'] == stats['n'] == 10
+        assert 1000000 <= stats['max_ns'] and \
+            stats['min_ns'] <= stats['p50_ns'] <= stats['max_ns']
+
+
+def test_timeout(agent_port):
+    with fluent10g_agent_client.Fluent10GAgentClient(
+            "127.0.0.1", agent_port) as client:
+        slow = client.submit("sleep", {'t': 0.5})
+        fast = client.submit("sleep", {'t': 0.0})
+
+        # only the request that timed out fails
+        with pytest.raises(fluent10g_agent_client.AgentTimeoutException):
+            slow.result(0.1)
+        assert fast.result(5.0) == "done"
+        with pytest.raises(fluent10g_agent_client.AgentNackException):
+            client.request("unknown", timeout=5.0)
+
+
+def test_reconnect():
+    proxy = Proxy(start_agent("old"))
+    with fluent10g_agent_client.Fluent10GAgentClient(
+            "127.0.0.1", proxy.listen_port, timeout=0.2,
+            reconnect_timeouts=2) as client:
+        assert client.request("name") == "old"
+
+        # the agent is restarted while the connection to it is half-open
+        proxy.freeze(start_agent("new"))
+        pending = client.submit("sleep", {'t': 0.0})
+        for _ in range(2):
+            with pytest.raises(
+                    fluent10g_agent_client.AgentTimeoutException):
+                client.request("name")
+
+        # the client has reconnected, pending requests have failed
+        with pytest.raises(fluent10g_agent_client.AgentConnectionException):
+            pending.result()
+        assert client.request("name") == "new"
+
+
+@pytest.mark.parametrize("data", [
+    list(range(0, 1000, 7)), [5, 3, 1, -100, 2 ** 62],
+    [0, 2 ** 63 + 1, 2 ** 64 - 1], [0.5, 1.25, -3.0, 1e300], []])
+@pytest.mark.parametrize("codec", fluent10g_agent_client.COMPRESSION_CODECS)
+def test_monitor_data_round_trip(data, codec):
+    encoded, header = fluent10g_agent.encode_monitor_data(data, codec)
+    decoded = fluent10g_agent_client.decode_monitor_data(encoded, header)
+    assert decoded.tolist() == data
+
+
+def test_get_monitor_data():
+    port = start_agent()
+    with fluent10g_agent_client.Fluent10GAgentClient(
+            "127.0.0.1", port) as client:
+        values = [3, 1 << 40, -7, 12]
+        for value in values:
+            client.request("store", {'ident': "test", 'value': value})
+        assert client.get_monitor_data("test").tolist() == values
+        for codec in ["auto"] + fluent10g_agent_client.COMPRESSION_CODECS:
+            data = client.get_monitor_data("test", compression=codec)
+            assert data.tolist() == values
+            assert client.last_header['codec'] in \
+                fluent10g_agent_client.COMPRESSION_CODECS
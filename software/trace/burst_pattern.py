@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Generate microburst and incast traces for multiple ports."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates bursts of packets transmitted with a fixed interpacket gap (down to
+# the 12 byte minimum, i.e. back-to-back at 10 Gbps), separated by idle
+# periods. Bursts start periodically: burst j of a port starts at
+#
+#   phase + j * period + jitter_j,   period = burst duration + idle gap
+#
+# where the jitter is drawn uniformly from [0, jitter) for each burst. Since
+# the jitter does not accumulate, the traces of all ports have the same length
+# (a whole number of periods) and keep their relative phase when they are
+# replayed repeatedly. Multiple ports sending bursts to the same device under
+# test port at once (incast) are generated with equal or staggered phases.
+#
+# All times are exact multiples of the transmission time of a byte at 10 Gbps
+# (1/8 clock cycle) and are converted to delta_t values from absolute times
+# (see quantize.py), so back-to-back packets alternate between delta_t values
+# that average to their exact transmission time (e.g. 10 and 11 clock cycles
+# for 60 byte packets).
+#
+# The generators of all ports start transmitting their first packet at the
+# same time. A port with a non-zero phase therefore starts with a minimum size
+# lead-in packet (addressed to LEAD_IN_DST, so that it can be filtered out by
+# the receiver's destination MAC address filter), which delays its first burst
+# by the phase offset.
+
+import argparse
+import ipaddress
+import math
+import os
+import numpy as np
+import trace_writer
+from pkt_template import PacketTemplate, Ether, IPv4, UDP
+from quantize import Quantizer
+from traffic_models import PKT_SIZE_MIN
+
+# minimum Ethernet interpacket gap in bytes
+ETH_IPG_MIN = 12
+
+# clock cycles per byte transmitted at 10 Gbps
+CYCLES_PER_BYTE = 8 / trace_writer.MAX_DATARATE * trace_writer.CLK_FREQ
+
+# number of ports (network interfaces of the NetFPGA-SUME)
+N_PORTS = 4
+
+# destination MAC address of lead-in packets
+LEAD_IN_DST = "53:00:00:00:00:ff"
+
+# number of packets generated at once
+BATCH_SIZE = 1 << 16
+
+
+def lead_in_template():
+    """Return the template of lead-in packets."""
+    return PacketTemplate(Ether(dst=LEAD_IN_DST))
+
+
+class BurstPattern(object):
+    """Periodic bursts of packets."""
+
+    def __init__(self, burst_size, pkt_len=PKT_SIZE_MIN, ipg=ETH_IPG_MIN,
+                 idle=10e-6, jitter=0.0):
+        """Initialize pattern.
+
+        'ipg' is the interpacket gap within bursts in bytes, 'idle' the time
+        (seconds) between the end of a burst and the start of the next one
+        and 'jitter' the maximum random delay (seconds) of the burst starts,
+        which must not exceed 'idle'.
+        """
+        if burst_size < 1:
+            raise ValueError("burst size must be positive")
+        if ipg < ETH_IPG_MIN:
+            raise ValueError("interpacket gap must be at least %d bytes" %
+                             ETH_IPG_MIN)
+        if idle < 0 or not 0 <= jitter <= idle:
+            raise ValueError("jitter must not exceed the idle time")
+        self.burst_size = burst_size
+        self.pkt_len = pkt_len
+        self.ipg = ipg
+
+        # times in clock cycles. the idle time is rounded to byte times
+        self.spacing = (pkt_len + trace_writer.ETH_OVERHEAD - ETH_IPG_MIN +
+                        ipg) * CYCLES_PER_BYTE
+        self.idle = round(idle * trace_writer.CLK_FREQ / CYCLES_PER_BYTE) * \
+            CYCLES_PER_BYTE
+        self.jitter = jitter * trace_writer.CLK_FREQ
+        self.period = burst_size * self.spacing + self.idle
+
+    def times(self, first, n_bursts, phase=0.0, rng=None):
+        """Return the transmission times (clock cycles) of the packets of
+        bursts 'first' to 'first + n_bursts - 1' of a port with a given phase
+        (clock cycles)."""
+        j = np.arange(first, first + n_bursts)
+        start = phase + j * self.period
+        if self.jitter > 0:
+            # the first burst is not delayed, the trace starts with it
+            start += np.where(j > 0, np.floor(
+                rng.random(n_bursts) * self.jitter / CYCLES_PER_BYTE) *
+                CYCLES_PER_BYTE, 0.0)
+        k = np.arange(self.burst_size) * self.spacing
+        return (start[:, None] + k).reshape(-1)
+
+
+class PortTrace(object):
+    """Bursts of a single port."""
+
+    def __init__(self, pattern, tmpl, phase=0.0, fields=None,
+                 lead_in=None):
+        """Initialize port.
+
+        'phase' is the delay (seconds) of the port's first burst, which is
+        reduced modulo the burst period. 'fields' are constant header fields
+        of the port's packets (see PacketTemplate.build()). 'lead_in' is the
+        template of the lead-in packet.
+        """
+        self.pattern = pattern
+        self.tmpl = tmpl
+        self.fields = fields or {}
+        self.phase = round(phase * trace_writer.CLK_FREQ / CYCLES_PER_BYTE) * \
+            CYCLES_PER_BYTE % pattern.period
+
+        # the last packet of a burst must be transmitted before the next
+        # period starts
+        t_end = self.phase + pattern.jitter + \
+            (pattern.burst_size - 1) * pattern.spacing + \
+            (pattern.pkt_len + trace_writer.ETH_OVERHEAD) * CYCLES_PER_BYTE
+        if t_end > pattern.period:
+            raise ValueError("phase offset and jitter exceed the idle time")
+
+        self.lead_in = None
+        if self.phase > 0:
+            if lead_in is None:
+                lead_in = lead_in_template()
+            t_lead_in = (lead_in.pkt_len + trace_writer.ETH_OVERHEAD) * \
+                CYCLES_PER_BYTE
+            if self.phase < t_lead_in:
+                raise ValueError("phase offset is shorter than the lead-in " +
+                                 "packet")
+            self.lead_in = lead_in
+
+    def write(self, filename, n_bursts, rng, batch_size=BATCH_SIZE):
+        """Write 'n_bursts' bursts to a trace file. Returns the number of
+        packets."""
+        # the first packet is transmitted at time zero. the delta_t of each
+        # packet follows from the time of the next one
+        q = Quantizer()
+        q.cycles(0.0)
+        bursts_per_batch = max(batch_size // self.pattern.burst_size, 1)
+        with trace_writer.TraceWriter(filename) as wr:
+            for first in range(0, n_bursts, bursts_per_batch):
+                n = min(bursts_per_batch, n_bursts - first)
+                t = self.pattern.times(first, n, self.phase, rng)
+                if first == 0 and self.lead_in is None:
+                    t = t[1:]
+                delta_t = q.cycles(t)
+                if first == 0 and self.lead_in is not None:
+                    data, len_wire = self.lead_in.build(1)
+                    wr.write(delta_t[:1], len_wire, data)
+                    delta_t = delta_t[1:]
+                self._write(wr, delta_t)
+
+            # the trace ends after the last period
+            self._write(wr, q.cycles(n_bursts * self.pattern.period))
+            return wr.n_pkts
+
+    def _write(self, wr, delta_t):
+        """Write burst packets with given delta_t values."""
+        if len(delta_t) > 0:
+            data, len_wire = self.tmpl.build(len(delta_t), self.fields)
+            wr.write(delta_t, len_wire, data)
+
+
+def port_filename(filename, port):
+    """Return the trace file name of a port."""
+    if "{port}" in filename:
+        return filename.format(port=port)
+    base, ext = os.path.splitext(filename)
+    return "%s_%d%s" % (base, port, ext)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate microburst/incast traces (one per port).")
+    parser.add_argument("output", help="output trace file name, '{port}' " +
+                        "is replaced by the port number (default: port " +
+                        "number appended)")
+    parser.add_argument("--ports", type=int, default=1,
+                        help="number of ports (default: 1)")
+    parser.add_argument("--burst", type=int, default=32,
+                        help="number of packets per burst (default: 32)")
+    parser.add_argument("--pktlen", type=int, default=PKT_SIZE_MIN,
+                        help="packet length in bytes, excluding FCS " +
+                        "(default: 60)")
+    parser.add_argument("--ipg", type=int, default=ETH_IPG_MIN,
+                        help="interpacket gap within bursts in bytes " +
+                        "(default: 12)")
+    parser.add_argument("--idle", type=float, default=10e-6,
+                        help="idle time between bursts in seconds " +
+                        "(default: 10e-6)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="maximum random delay of burst starts in " +
+                        "seconds (default: 0)")
+    parser.add_argument("--phase", type=float, nargs="+", default=[],
+                        help="phase offset of each port in seconds " +
+                        "(default: 0)")
+    parser.add_argument("--duration", type=float, default=100e-3,
+                        help="trace duration in seconds, rounded up to " +
+                        "whole burst periods (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    if not 1 <= args.ports <= N_PORTS:
+        parser.error("number of ports must be between 1 and %d" % N_PORTS)
+    if len(args.phase) > args.ports:
+        parser.error("more phase offsets than ports given")
+    if not 60 <= args.pktlen <= trace_writer.PKT_SIZE_MAX:
+        parser.error("packet length must be between 60 and %d bytes" %
+                     trace_writer.PKT_SIZE_MAX)
+    phases = args.phase + [0.0] * (args.ports - len(args.phase))
+
+    try:
+        pattern = BurstPattern(args.burst, args.pktlen, args.ipg, args.idle,
+                               args.jitter)
+        tmpl = PacketTemplate(Ether(), IPv4(), UDP(), pkt_len=args.pktlen)
+        src = int(ipaddress.IPv4Address(tmpl.layers[1].values['src']))
+        ports = [PortTrace(pattern, tmpl, phase,
+                           {'ipv4.src': src + (port << 8)})
+                 for port, phase in enumerate(phases)]
+    except ValueError as e:
+        parser.error(str(e))
+
+    n_bursts = int(math.ceil(args.duration * trace_writer.CLK_FREQ /
+                             pattern.period))
+    rng = np.random.default_rng(args.seed)
+    for port, trace in enumerate(ports):
+        filename = port_filename(args.output, port)
+        n_pkts = trace.write(filename, n_bursts, rng)
+        print("Successfully wrote %d packets (%d bursts) to trace file %s!" %
+              (n_pkts, n_bursts, filename))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""Flow-level workload generation."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates traffic consisting of many concurrent flows (e.g. to test flow
+# caches or load balancers of the device under test). The flow table holds a
+# fixed number of flow slots. Each slot is always occupied by exactly one
+# active flow: when a flow stops, the next flow of the slot (the slot's next
+# generation) starts. Flow start and stop times follow from a per-slot flow
+# duration and phase, so that the flow a packet belongs to is calculated in
+# closed form from the packet's slot and transmission time.
+#
+# For each packet, a slot is drawn from a popularity distribution (Zipf or
+# empirical). The 5-tuple of the flow is derived from the slot and the flow
+# generation, so is the IPv6 flow label, which stays constant for all packets
+# of a flow. Per-flow packet and byte counters are used as IPv4 id and TCP
+# sequence number. All flow state is kept in NumPy arrays (one entry per slot),
+# so millions of flows are supported without per-flow Python objects.
+#
+# Flow workloads produce timed packet batches, which can be passed on to the
+# streaming pipeline of trace_stream:
+#
+#   batches = FlowWorkload(tmpl, flows, ZipfPopularity(n)).batches(model, rng)
+#   trace_stream.write(trace_stream.chunker(trace_stream.encoder(
+#       trace_stream.limit(batches, duration))), "flows.trace")
+
+import argparse
+import ipaddress
+import numpy as np
+import trace_stream
+import trace_writer
+from pkt_template import PacketTemplate, Ether, IPv4, IPv6, UDP, TCP
+from traffic_models import TrafficModel, PoissonIAT, FixedSize, ImixSize, \
+    PKT_SIZE_MIN
+
+
+class ZipfPopularity(object):
+    """Zipf distributed flow popularity (flow 0 is the most popular one)."""
+
+    def __init__(self, n_flows, s=1.0):
+        """Initialize popularity distribution with exponent 's'."""
+        weights = 1.0 / np.arange(1, n_flows + 1, dtype=np.float64) ** s
+        self.cdf = np.cumsum(weights)
+        self.cdf /= self.cdf[-1]
+
+    def draw(self, n, rng):
+        """Draw the flow slots of 'n' packets."""
+        return np.searchsorted(self.cdf, rng.random(n), side='right')
+
+
+class EmpiricalPopularity(ZipfPopularity):
+    """Flow popularity given by (relative) per-flow packet counts."""
+
+    def __init__(self, weights):
+        """Initialize popularity distribution."""
+        self.cdf = np.cumsum(np.asarray(weights, dtype=np.float64))
+        self.cdf /= self.cdf[-1]
+
+
+class FlowTable(object):
+    """Flow table with one entry per flow slot.
+
+    Source and destination hosts are drawn from the 'n_src' and 'n_dst'
+    addresses following the 'src' and 'dst' base addresses, destination ports
+    from 'dports'. Flow durations are exponentially distributed with mean
+    'duration_mean' seconds (flows never stop if it is None).
+    """
+
+    def __init__(self, n_flows, rng, src="10.0.0.0", dst="10.128.0.0",
+                 n_src=1 << 16, n_dst=1 << 16, dports=(80,),
+                 duration_mean=None):
+        """Initialize flow table."""
+        self.n_flows = n_flows
+        self.src = ipaddress.ip_address(src)
+        self.dst = ipaddress.ip_address(dst)
+
+        self.src_host = rng.integers(0, n_src, n_flows, dtype=np.uint32)
+        self.dst_host = rng.integers(0, n_dst, n_flows, dtype=np.uint32)
+        self.dport = rng.choice(np.asarray(dports, dtype=np.uint16), n_flows)
+        self.sport_seed = rng.integers(0, 1 << 32, n_flows, dtype=np.uint64)
+
+        # flow generation g of a slot is active from phase + g * duration until
+        # phase + (g + 1) * duration (clock cycles). a duration of zero means
+        # that the slot's first flow never stops
+        if duration_mean is None:
+            self.duration = np.zeros(n_flows, dtype=np.int64)
+            self.phase = np.zeros(n_flows, dtype=np.int64)
+        else:
+            self.duration = np.maximum(rng.exponential(
+                duration_mean * trace_writer.CLK_FREQ, n_flows), 1) \
+                .astype(np.int64)
+            self.phase = -(rng.random(n_flows) * self.duration) \
+                .astype(np.int64)
+
+        # generation of the slot's current flow and its packet/byte counters
+        self.generation = np.full(n_flows, -1, dtype=np.int64)
+        self.n_pkts = np.zeros(n_flows, dtype=np.uint64)
+        self.n_bytes = np.zeros(n_flows, dtype=np.uint64)
+
+    def generations(self, slot, t):
+        """Return the generations of the flows active in slots at times t."""
+        duration = self.duration[slot]
+        return np.where(duration > 0, (t - self.phase[slot]) //
+                        np.maximum(duration, 1), 0)
+
+    def sports(self, slot, gen):
+        """Return the source ports of flows (unique per flow generation)."""
+        return 1024 + (self._hash(slot, gen) %
+                       np.uint64(65536 - 1024)).astype(np.int64)
+
+    def flow_labels(self, slot, gen):
+        """Return the IPv6 flow labels of flows (see RFC 6437)."""
+        # splitmix64 finalizer, the source port hash does not mix its upper
+        # bits
+        h = self._hash(slot, gen)
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+        return h & np.uint64(0xFFFFF)
+
+    def _hash(self, slot, gen):
+        """Return a pseudo-random 64 bit value per flow generation."""
+        h = (self.sport_seed[slot] +
+             np.asarray(gen, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+        h ^= h >> np.uint64(29)
+        return h
+
+    def count(self, slot, gen, n_bytes):
+        """Update the per-flow counters for a batch of packets.
+
+        Packets must be ordered by transmission time. Returns the number of
+        packets and bytes each packet's flow has sent before the packet.
+        """
+        n = len(slot)
+        n_bytes = np.asarray(n_bytes, dtype=np.uint64)
+
+        # stable sort by flow: packets of a flow keep their order
+        order = np.lexsort((gen, slot))
+        s, g, b = slot[order], gen[order], n_bytes[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = (s[1:] != s[:-1]) | (g[1:] != g[:-1])
+        group_start = np.flatnonzero(first)
+        group = np.cumsum(first) - 1
+
+        # counters continue if the slot's current flow is still active,
+        # otherwise a new flow starts with zero counters
+        cont = g == self.generation[s]
+        rank = (np.arange(n) - group_start[group]).astype(np.uint64)
+        cum = np.cumsum(b) - b
+        cum -= cum[group_start][group]
+        pkts = np.where(cont, self.n_pkts[s], 0) + rank
+        bytes_ = np.where(cont, self.n_bytes[s], 0) + cum
+
+        # the last packet of each slot determines the slot's new state
+        last = np.ones(n, dtype=bool)
+        last[:-1] = s[1:] != s[:-1]
+        self.generation[s[last]] = g[last]
+        self.n_pkts[s[last]] = pkts[last] + np.uint64(1)
+        self.n_bytes[s[last]] = bytes_[last] + b[last]
+
+        n_pkts = np.empty(n, dtype=np.uint64)
+        n_pkts[order] = pkts
+        n_bytes_prev = np.empty(n, dtype=np.uint64)
+        n_bytes_prev[order] = bytes_
+        return n_pkts, n_bytes_prev
+
+
+class FlowWorkload(object):
+    """Creates packets of flows from a flow table and a header template."""
+
+    def __init__(self, tmpl, flows, popularity):
+        """Initialize workload.
+
+        'tmpl' must contain an IPv4 or IPv6 and a UDP or TCP header.
+        """
+        self.tmpl = tmpl
+        self.flows = flows
+        self.popularity = popularity
+
+        self.l3 = 'ipv4' if 'ipv4.src' in tmpl.fields else 'ipv6'
+        self.l4 = 'tcp' if 'tcp.sport' in tmpl.fields else 'udp'
+        if "%s.src" % self.l3 not in tmpl.fields or \
+                "%s.sport" % self.l4 not in tmpl.fields:
+            raise ValueError("template must contain IP and UDP/TCP headers")
+
+    def build(self, t, len_wire, rng, width=None):
+        """Build packets transmitted at times 't' with given wire lengths.
+
+        'width' is the width of the packet data (see PacketTemplate.build()).
+        Returns a tuple (data, len_wire, slot, gen).
+        """
+        len_wire = np.asarray(len_wire, dtype=np.int64)
+        slot = self.popularity.draw(len(t), rng)
+        gen = self.flows.generations(slot, t)
+        n_pkts, n_bytes = self.flows.count(
+            slot, gen, len_wire - self.tmpl.hdr_len)
+
+        fields = {
+            "%s.src" % self.l3: self._addr(self.flows.src,
+                                           self.flows.src_host[slot]),
+            "%s.dst" % self.l3: self._addr(self.flows.dst,
+                                           self.flows.dst_host[slot]),
+            "%s.sport" % self.l4: self.flows.sports(slot, gen),
+            "%s.dport" % self.l4: self.flows.dport[slot],
+        }
+        if self.l3 == 'ipv4':
+            fields['ipv4.id'] = n_pkts & np.uint64(0xFFFF)
+        else:
+            fields['ipv6.flow'] = self.flows.flow_labels(slot, gen)
+        if self.l4 == 'tcp':
+            fields['tcp.seq'] = n_bytes & np.uint64(0xFFFFFFFF)
+
+        data, len_wire = self.tmpl.build(len(t), fields, len_wire, width)
+        return data, len_wire, slot, gen
+
+    def _addr(self, base, host):
+        """Return IP address field values of hosts following a base address."""
+        if base.version == 4:
+            return np.uint64(int(base)) + host.astype(np.uint64)
+
+        # IPv6: add host numbers to the lower 32 bits of the base address
+        addr = np.tile(np.frombuffer(base.packed, dtype=np.uint8),
+                       (len(host), 1))
+        low = np.uint64(int(base) & 0xFFFFFFFF) + host.astype(np.uint64)
+        addr[:, 12:] = low.astype('>u4').view(np.uint8).reshape(-1, 4)
+        return addr
+
+    def batches(self, model, rng, batch_size=trace_stream.BATCH_SIZE,
+                width=None):
+        """Endless source of timed packet batches.
+
+        'model' is a traffic_models.TrafficModel. Yields tuples (delta_t,
+        len_wire, data, len_snap) that can be passed on to
+        trace_stream.limit(). 'width' is passed on to build().
+        """
+        t = 0
+        while True:
+            delta_t, len_wire = model.draw(batch_size, rng)
+            t_pkts = t + np.cumsum(delta_t) - delta_t
+            t += int(np.sum(delta_t))
+            data, len_wire, _, _ = self.build(t_pkts, len_wire, rng, width)
+            yield delta_t, len_wire, data, None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a trace consisting of many concurrent flows.")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("--flows", type=int, default=1000000,
+                        help="number of concurrent flows (default: 1000000)")
+    parser.add_argument("--zipf", type=float, default=1.0,
+                        help="Zipf exponent of flow popularity (default: 1.0)")
+    parser.add_argument("--flow-duration", type=float, default=None,
+                        help="mean flow duration in seconds (default: " +
+                        "flows never stop)")
+    parser.add_argument("--proto", choices=["udp", "tcp"], default="udp",
+                        help="transport protocol (default: udp)")
+    parser.add_argument("--ipv6", action="store_true",
+                        help="generate IPv6 instead of IPv4 packets")
+    parser.add_argument("--pktlen", type=int, default=None,
+                        help="packet length in bytes, excluding FCS " +
+                        "(default: IMIX)")
+    parser.add_argument("--rate", type=float, default=5e6,
+                        help="mean packet rate in packets/second " +
+                        "(default: 5e6)")
+    parser.add_argument("--duration", type=float, default=100e-3,
+                        help="trace duration in seconds (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    l3 = IPv6() if args.ipv6 else IPv4()
+    l4 = TCP() if args.proto == "tcp" else UDP()
+    tmpl = PacketTemplate(Ether(), l3, l4, pkt_len=trace_writer.PKT_SIZE_MAX)
+    if args.ipv6:
+        flows = FlowTable(args.flows, rng, src="fd00::", dst="fd00:1::",
+                          duration_mean=args.flow_duration)
+    else:
+        flows = FlowTable(args.flows, rng, duration_mean=args.flow_duration)
+
+    size = ImixSize() if args.pktlen is None else FixedSize(args.pktlen)
+    model = TrafficModel(PoissonIAT(args.rate), size,
+                         size_min=max(tmpl.hdr_len, PKT_SIZE_MIN))
+    workload = FlowWorkload(tmpl, flows, ZipfPopularity(args.flows, args.zipf))
+
+    batches = trace_stream.limit(workload.batches(model, rng), args.duration)
+    n_pkts, _ = trace_stream.write(trace_stream.chunker(
+        trace_stream.encoder(batches)), args.output)
+    print("Successfully wrote %d packets of %d flows to trace file!" %
+          (n_pkts, args.flows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""Generate latency probe traces matching the hardware timestamp mode."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates latency probe packets, whose layout matches the timestamp mode the
+# generator is configured with (see examples/latency/latency.go). The hardware
+# inserts a timestamp into each transmitted packet right before it is sent
+# out, either at a fixed byte position (16 or 24 bits wide) or into the IPv4
+# header checksum / the lower 16 bits of the IPv6 flow label (header mode).
+# Packets that are too short or (in header mode) are no IPv4/IPv6 packets
+# silently remain without timestamp, and header fields located at the
+# timestamp position are overwritten. Probe templates therefore:
+#
+# - reserve the timestamp bytes: they must not overlap a header field (fixed
+#   mode) and fields containing them cannot be patched (e.g. the IPv6 flow
+#   label in header mode)
+# - require an Ethernet header directly followed by an IPv4/IPv6 header in
+#   header mode (the hardware does not parse VLAN tags). Probes without IP
+#   header must not claim one by their EtherType (raw probes use the local
+#   experimental EtherType 0x88B5 by default)
+# - guarantee the minimum packet length, so that the timestamp and the probe
+#   tag are always included
+#
+# Each probe carries a probe tag behind the headers (and behind the timestamp
+# in fixed mode): a magic number followed by a 32 bit sequence number (big
+# endian), which is covered by the UDP/TCP checksum. Note that the inserted
+# timestamp invalidates the checksum covering it.
+#
+# The sequence number, transmission time (clock cycles since the first packet)
+# and wire length of each probe are stored in a sidecar file next to the trace
+# ('<trace>.probes'), so that captured packets can be joined back to the sent
+# probes, even if the probe trace has been merged with other traffic (see
+# trace_merge.py).
+#
+# Sidecar file format:
+#
+# - bytes 0-7:   magic number "FLTPRB01"
+# - bytes 8-15:  length of the JSON header in bytes (uint64, little endian)
+# - JSON header: timestamp mode, position and width, reserved timestamp bytes,
+#                offset of the probe tag and number of probes. the header is
+#                padded with spaces, so that the arrays are 64 byte aligned
+# - seq:         n int64 values, sequence number of each probe
+# - times:       n int64 values, transmission time of each probe
+# - len_wire:    n int64 values, wire length of each probe
+
+import argparse
+import json
+import struct
+import numpy as np
+import trace_stream
+from pkt_template import PacketTemplate, Layer, Ether, IPv4, IPv6, UDP, TCP, \
+    ETH_TYPE_IPV4, ETH_TYPE_IPV6
+from traffic_models import TrafficModel, ConstantIAT, PoissonIAT, FixedSize, \
+    PKT_SIZE_MIN
+
+# EtherType of raw probes (IEEE 802 local experimental EtherType 1)
+ETH_TYPE_PROBE = 0x88B5
+
+# timestamp modes (see TimestampMode* of the Go library)
+MODE_FIXED = "fixed"
+MODE_HEADER = "header"
+
+# supported timestamp widths in bits (fixed position mode)
+TIMESTAMP_WIDTHS = (16, 24)
+
+# magic number identifying probe packets
+PROBE_MAGIC = 0x464C5052
+
+# magic number of probe sidecar files
+SIDECAR_MAGIC = b"FLTPRB01"
+
+
+class Probe(Layer):
+    """Probe tag (magic number and sequence number)."""
+
+    name = "probe"
+    length = 8
+    fields = {
+        'magic': (0, 4, None),
+        'seq': (4, 4, None),
+    }
+    defaults = {'magic': PROBE_MAGIC, 'seq': 0}
+
+
+class Reserved(Layer):
+    """Zero bytes reserved for the hardware timestamp."""
+
+    name = "reserved"
+
+    def __init__(self, length):
+        """Create layer with a length of 'length' bytes."""
+        super().__init__()
+        self.length = length
+
+
+class TimestampFormat(object):
+    """Timestamp mode of the generator (see latency.go)."""
+
+    def __init__(self, mode=MODE_FIXED, pos=14, width=16):
+        """Initialize format. 'pos' and 'width' apply to fixed mode only.
+
+        The hardware inserts the timestamp within an 8 byte data word, so it
+        must not cross a word boundary.
+        """
+        if mode not in (MODE_FIXED, MODE_HEADER):
+            raise ValueError("invalid timestamp mode '%s'" % mode)
+        if mode == MODE_FIXED:
+            if width not in TIMESTAMP_WIDTHS:
+                raise ValueError("timestamp width must be 16 or 24 bits")
+            if pos < 0 or pos % 8 > 8 - width // 8:
+                raise ValueError("timestamp at byte %d crosses a data word" %
+                                 pos)
+        self.mode = mode
+        self.pos = pos
+        self.width = width
+
+    def reserved(self, l3):
+        """Return the bit masks of the bytes the hardware writes.
+
+        'l3' is the name of the network layer of the packets (header mode).
+        Returns a dict mapping byte positions to bit masks.
+        """
+        if self.mode == MODE_FIXED:
+            return {i: 0xFF for i in range(self.pos,
+                                           self.pos + self.width // 8)}
+        if l3 == "ipv4":
+            # IPv4 header checksum
+            return {24: 0xFF, 25: 0xFF}
+        # lower 16 bits of the IPv6 flow label, upper four bits are zeroed
+        return {15: 0x0F, 16: 0xFF, 17: 0xFF}
+
+    def dict(self):
+        """Return the format as dict."""
+        if self.mode == MODE_HEADER:
+            return {'mode': self.mode}
+        return {'mode': self.mode, 'pos': self.pos, 'width': self.width}
+
+
+class ProbeWorkload(object):
+    """Creates probe packets from a header stack."""
+
+    def __init__(self, fmt, *layers, pkt_len=PKT_SIZE_MIN):
+        """Compile header stack.
+
+        The probe tag (and in fixed mode the reserved timestamp bytes) are
+        appended to 'layers'. The template's packet length is raised to the
+        minimum probe length.
+        """
+        self.fmt = fmt
+        layers = list(layers)
+        if not layers or not isinstance(layers[0], Ether):
+            raise ValueError("probes must start with an Ethernet header")
+        hdr_len = sum(layer.length for layer in layers)
+
+        if fmt.mode == MODE_HEADER:
+            l3 = layers[1] if len(layers) > 1 else None
+            if not isinstance(l3, (IPv4, IPv6)):
+                raise ValueError("header mode requires an IPv4/IPv6 header " +
+                                 "following the Ethernet header")
+            layers[0].bind(l3)
+            eth_type = ETH_TYPE_IPV4 if isinstance(l3, IPv4) else \
+                ETH_TYPE_IPV6
+            if layers[0].values['type'] != eth_type:
+                raise ValueError("EtherType 0x%04x does not match the %s " %
+                                 (layers[0].values['type'], l3.name) +
+                                 "header")
+            self.l3 = l3.name
+            layers.append(Probe())
+        else:
+            self.l3 = None
+            l3 = layers[1] if len(layers) > 1 else None
+            eth_type = layers[0].values['type']
+            if eth_type in (ETH_TYPE_IPV4, ETH_TYPE_IPV6) and \
+                    not isinstance(l3, (IPv4, IPv6)):
+                raise ValueError("EtherType 0x%04x requires an IP header " %
+                                 eth_type + "following the Ethernet header")
+            # checksums are calculated over 16 bit words, so the reserved
+            # bytes are padded to an even length
+            ts_end = fmt.pos + fmt.width // 8
+            ts_end += ts_end % 2
+            if fmt.pos < hdr_len:
+                offset = 0
+                for layer in layers:
+                    if fmt.pos < offset + layer.length:
+                        break
+                    offset += layer.length
+                raise ValueError("timestamp at byte %d overlaps the %s " %
+                                 (fmt.pos, layer.name) + "header")
+            if hdr_len + Probe.length <= fmt.pos:
+                # probe tag fits between headers and timestamp
+                layers.append(Probe())
+                if ts_end > hdr_len + Probe.length:
+                    layers.append(Reserved(ts_end - hdr_len - Probe.length))
+            else:
+                layers.append(Reserved(ts_end - hdr_len))
+                layers.append(Probe())
+
+        hdr_len = sum(layer.length for layer in layers)
+        self.len_min = max(hdr_len, PKT_SIZE_MIN)
+        self.tmpl = PacketTemplate(*layers, pkt_len=max(pkt_len,
+                                                        self.len_min))
+        self.tag_offset = self.tmpl.offsets['probe']
+        self.reserved = fmt.reserved(self.l3)
+
+    def build(self, seq, len_wire=None, fields=None):
+        """Build probes with sequence numbers 'seq'.
+
+        'fields' are additional per-packet header fields (see
+        PacketTemplate.build()); fields containing timestamp bytes are
+        rejected. Returns a tuple (data, len_wire).
+        """
+        fields = dict(fields or {})
+        for field in fields:
+            if field.startswith("probe.") or field not in self.tmpl.fields:
+                raise ValueError("unknown field '%s'" % field)
+            off, width, mask, _ = self.tmpl.fields[field]
+            for i in range(width):
+                bits = 0xFF if mask is None else \
+                    (mask >> 8 * (width - 1 - i)) & 0xFF
+                if bits & self.reserved.get(off + i, 0):
+                    raise ValueError("field '%s' contains timestamp bytes" %
+                                     field)
+        seq = np.asarray(seq, dtype=np.int64)
+        if len(seq) and (seq.min() < 0 or seq.max() > 0xFFFFFFFF):
+            raise ValueError("sequence numbers exceed 32 bits")
+        fields['probe.seq'] = seq
+        if len_wire is not None and np.any(np.asarray(len_wire) <
+                                           self.len_min):
+            raise ValueError("probes must be at least %d bytes long" %
+                             self.len_min)
+        return self.tmpl.build(len(seq), fields, len_wire)
+
+    def batches(self, model, rng, first_seq=0,
+                batch_size=trace_stream.BATCH_SIZE):
+        """Endless source of timed probe batches with consecutive sequence
+        numbers.
+
+        'model' is a traffic_models.TrafficModel. Yields tuples (delta_t,
+        len_wire, data, len_snap) that can be passed on to
+        trace_stream.limit().
+        """
+        seq = first_seq
+        while True:
+            delta_t, len_wire = model.draw(batch_size, rng)
+            data, len_wire = self.build(np.arange(seq, seq + batch_size),
+                                        len_wire)
+            seq += batch_size
+            yield delta_t, len_wire, data, None
+
+    def header(self):
+        """Return the probe layout stored in the sidecar file."""
+        hdr = self.fmt.dict()
+        hdr.update({'l3': self.l3, 'tag_offset': self.tag_offset,
+                    'magic': PROBE_MAGIC,
+                    'timestamp_bytes': sorted(self.reserved)})
+        return hdr
+
+
+def sidecar_filename(trace_filename):
+    """Return the file name of the probe sidecar of a trace."""
+    return trace_filename + ".probes"
+
+
+class ProbeTable(object):
+    """Sent probes, which captured packets are joined to."""
+
+    def __init__(self, header, seq, times, len_wire):
+        """Initialize table."""
+        self.header = header
+        self.seq = seq
+        self.times = times
+        self.len_wire = len_wire
+        self.tag_offset = header['tag_offset']
+
+    def match(self, data):
+        """Return the probe index of captured packets (-1 for no probe).
+
+        'data' is a 2D uint8 array of packet data (one row per packet), which
+        must include the probe tag.
+        """
+        data = np.asarray(data, dtype=np.uint8)
+        if data.ndim != 2 or data.shape[1] < self.tag_offset + Probe.length:
+            raise ValueError("packet data does not include the probe tag")
+        tag = np.ascontiguousarray(
+            data[:, self.tag_offset:self.tag_offset + Probe.length])
+        magic, seq = tag.view('>u4').astype(np.int64).T
+        if len(self.seq) == 0:
+            return np.full(len(data), -1, dtype=np.int64)
+
+        # sequence numbers are sorted
+        idx = np.minimum(np.searchsorted(self.seq, seq), len(self.seq) - 1)
+        found = (magic == self.header['magic']) & (self.seq[idx] == seq)
+        return np.where(found, idx, -1)
+
+
+def write_sidecar(filename, header, seq, times, len_wire):
+    """Store the sent probes in a sidecar file. Returns a ProbeTable."""
+    hdr = dict(header)
+    hdr['n_probes'] = len(seq)
+    raw = json.dumps(hdr).encode()
+    raw += b" " * (-(len(raw) + 16) % 64)
+    arrays = [np.asarray(a, dtype='<i8') for a in (seq, times, len_wire)]
+    with open(filename, "wb") as f:
+        f.write(SIDECAR_MAGIC + struct.pack("<Q", len(raw)) + raw)
+        for a in arrays:
+            a.tofile(f)
+    return ProbeTable(hdr, *arrays)
+
+
+def load(trace_filename, filename=None):
+    """Load the probe sidecar of a trace. Returns a ProbeTable."""
+    if filename is None:
+        filename = sidecar_filename(trace_filename)
+    with open(filename, "rb") as f:
+        if f.read(8) != SIDECAR_MAGIC:
+            raise ValueError("invalid probe sidecar file")
+        hdr_len, = struct.unpack("<Q", f.read(8))
+        hdr = json.loads(f.read(hdr_len))
+    n = hdr['n_probes']
+    arrays = [np.memmap(filename, dtype='<i8', mode='r',
+                        offset=16 + hdr_len + 8 * n * i, shape=(n,))
+              if n > 0 else np.zeros(0, dtype='<i8') for i in range(3)]
+    return ProbeTable(hdr, *arrays)
+
+
+def generate(filename, workload, model, rng, duration=None, n_pkts=None,
+             first_seq=0):
+    """Write a probe trace and its sidecar file. Returns a ProbeTable."""
+    delta_t = []
+    len_wire = []
+
+    def record(batches):
+        for batch in batches:
+            delta_t.append(batch[0])
+            len_wire.append(batch[1])
+            yield batch
+
+    batches = trace_stream.limit(workload.batches(model, rng, first_seq),
+                                 duration, n_pkts)
+    trace_stream.write(trace_stream.chunker(trace_stream.encoder(
+        record(batches))), filename)
+
+    delta_t = np.concatenate(delta_t) if delta_t else np.zeros(0, np.int64)
+    len_wire = np.concatenate(len_wire) if len_wire else \
+        np.zeros(0, np.int64)
+    times = np.cumsum(delta_t, dtype=np.int64) - delta_t
+    return write_sidecar(sidecar_filename(filename), workload.header(),
+                         first_seq + np.arange(len(delta_t)), times,
+                         len_wire)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a latency probe trace and its sidecar file.")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("--mode", choices=[MODE_FIXED, MODE_HEADER],
+                        default=MODE_FIXED,
+                        help="timestamp mode (default: fixed)")
+    parser.add_argument("--pos", type=int, default=14,
+                        help="timestamp byte position in fixed mode " +
+                        "(default: 14)")
+    parser.add_argument("--width", type=int, choices=TIMESTAMP_WIDTHS,
+                        default=16,
+                        help="timestamp width in bits in fixed mode " +
+                        "(default: 16)")
+    parser.add_argument("--proto", choices=["raw", "udp", "tcp"],
+                        default=None,
+                        help="probe headers: Ethernet only or IP and " +
+                        "UDP/TCP (default: raw in fixed, udp in header mode)")
+    parser.add_argument("--ipv6", action="store_true",
+                        help="generate IPv6 instead of IPv4 probes")
+    parser.add_argument("--pktlen", type=int, default=PKT_SIZE_MIN,
+                        help="packet length in bytes, excluding FCS " +
+                        "(default: minimum probe length)")
+    parser.add_argument("--rate", type=float, default=1e5,
+                        help="probe rate in packets/second (default: 1e5)")
+    parser.add_argument("--poisson", action="store_true",
+                        help="Poisson instead of periodic probes")
+    parser.add_argument("--duration", type=float, default=100e-3,
+                        help="trace duration in seconds (default: 0.1)")
+    parser.add_argument("--first-seq", type=int, default=0,
+                        help="sequence number of the first probe " +
+                        "(default: 0)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    proto = args.proto
+    if proto is None:
+        proto = "raw" if args.mode == MODE_FIXED else "udp"
+    if proto != "raw" or args.mode == MODE_HEADER:
+        layers = [Ether(), IPv6() if args.ipv6 else IPv4()]
+    else:
+        layers = [Ether(type=ETH_TYPE_PROBE)]
+    if proto != "raw":
+        layers.append(TCP() if proto == "tcp" else UDP())
+
+    try:
+        workload = ProbeWorkload(TimestampFormat(args.mode, args.pos,
+                                                 args.width), *layers,
+                                 pkt_len=args.pktlen)
+    except ValueError as e:
+        parser.error(str(e))
+
+    iat = PoissonIAT(args.rate) if args.poisson else ConstantIAT(args.rate)
+    model = TrafficModel(iat, FixedSize(workload.tmpl.pkt_len),
+                         size_min=workload.len_min)
+    probes = generate(args.output, workload, model,
+                      np.random.default_rng(args.seed), args.duration,
+                      first_seq=args.first_seq)
+    print("Successfully wrote %d probes (tag at byte %d, timestamp at " %
+          (len(probes.seq), probes.tag_offset) + "bytes %s) to trace file!" %
+          ", ".join(str(i) for i in probes.header['timestamp_bytes']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Generate coordinated traces for multiple ports on a shared timeline."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates one trace per port from a single traffic description: the packets
+# of a flow workload (see flow_workload.py) are drawn on one global timeline
+# and are assigned to ports either by a hash of their 5-tuple (all packets of
+# a flow leave through the same port) or by an explicit mapping of flow slots
+# to ports. Each port's delta_t values are derived from the absolute times of
+# its packets on the global timeline (see quantize.py), so rounding errors do
+# not accumulate and the phase between the ports is preserved when all
+# generators start at the same time.
+#
+# Since every generator transmits its first packet when the replay starts,
+# each trace starts with a lead-in packet (see burst_pattern.py) and the global
+# timeline starts once the lead-in packet has been transmitted. All traces end
+# at the same time, so that the ports stay in phase when the traces are
+# replayed repeatedly. The offered aggregate rate may exceed the rate of a
+# single port: packets that would overlap on their port are shifted back by
+# the remaining transmission time of the preceding packet (Lindley's
+# recursion, see trace_merge.py). Packets that are shifted so far that their
+# transmission would end after the end of the traces are dropped.
+
+import argparse
+import math
+import numpy as np
+import burst_pattern
+import trace_rescale
+import trace_validate
+import trace_writer
+from flow_workload import FlowTable, FlowWorkload, ZipfPopularity
+from pkt_template import PacketTemplate, Ether, IPv4, IPv6, UDP, TCP
+from quantize import Quantizer
+from traffic_models import TrafficModel, PoissonIAT, FixedSize, ImixSize, \
+    PKT_SIZE_MIN
+
+# number of packets drawn from the traffic model at once
+BATCH_SIZE = 1 << 16
+
+# FNV-1a hash parameters (64 bit)
+FNV_OFFSET = 0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+
+
+class HashAssignment(object):
+    """Assigns packets to ports by a hash of their 5-tuple."""
+
+    def __init__(self, tmpl, n_ports):
+        """Initialize assignment for packets built from template 'tmpl'."""
+        l3 = 'ipv4' if 'ipv4.src' in tmpl.fields else 'ipv6'
+        l4 = 'tcp' if 'tcp.sport' in tmpl.fields else 'udp'
+        proto = 'ipv4.proto' if l3 == 'ipv4' else 'ipv6.nh'
+        cols = []
+        for field in ("%s.src" % l3, "%s.dst" % l3, proto,
+                      "%s.sport" % l4, "%s.dport" % l4):
+            off, width, _, _ = tmpl.fields[field]
+            cols.extend(range(off, off + width))
+        self.cols = np.asarray(cols)
+        self.n_ports = n_ports
+
+    def __call__(self, data, slot):
+        """Return the ports of packets."""
+        h = np.full(len(data), FNV_OFFSET, dtype=np.uint64)
+        for col in self.cols:
+            h = (h ^ data[:, col].astype(np.uint64)) * np.uint64(FNV_PRIME)
+        return (h % np.uint64(self.n_ports)).astype(np.int64)
+
+
+class MappingAssignment(object):
+    """Assigns packets to ports by an explicit mapping of flow slots."""
+
+    def __init__(self, ports):
+        """Initialize assignment: flow slot i is mapped to port
+        'ports[i % len(ports)]'."""
+        self.ports = np.asarray(ports, dtype=np.int64)
+
+    def __call__(self, data, slot):
+        """Return the ports of packets."""
+        return self.ports[slot % len(self.ports)]
+
+
+class PortWriter(object):
+    """Writes the packets of a single port to a trace file."""
+
+    def __init__(self, filename, start, t_end, lead_in):
+        """Open trace file.
+
+        The trace starts with the lead-in packet, the port's packets follow
+        from time 'start' (clock cycles) on. The trace ends at 't_end'.
+        """
+        self.wr = trace_writer.TraceWriter(filename)
+        self.quantizer = Quantizer()
+        self.quantizer.cycles(0.0)
+        self.t_free = float(start)
+        self.t_end = t_end
+
+        # last packet, which is written when its delta_t is known
+        data, len_wire = lead_in.build(1)
+        self.pending = (data, len_wire)
+
+        self.n_shifted = 0
+        self.shift_max = 0.0
+        self.n_dropped = 0
+        self.duration = 0
+
+    def add(self, t, len_wire, data, tolerance):
+        """Add packets (ordered by time)."""
+        if len(t) == 0:
+            return
+        t_tx = trace_rescale.tx_time(len_wire)
+        c = np.cumsum(t_tx) - t_tx
+        a = c + np.maximum.accumulate(np.maximum(t - c, self.t_free))
+        self.t_free = float(a[-1] + t_tx[-1])
+
+        # packets are shifted at least as far as their predecessors, so once
+        # a packet does not fit before the end of the trace, neither do all
+        # following ones
+        n = int(np.count_nonzero(a + t_tx <= self.t_end))
+        self.n_dropped += len(t) - n
+        t, a, len_wire, data = t[:n], a[:n], len_wire[:n], data[:n]
+        if n == 0:
+            return
+        shift = a - t
+        self.n_shifted += int(np.count_nonzero(shift > tolerance))
+        self.shift_max = max(self.shift_max, float(shift.max()))
+
+        delta_t = self.quantizer.cycles(a)
+        self._write(delta_t[:1], *self.pending)
+        self._write(delta_t[1:], data[:-1], len_wire[:-1])
+        self.pending = (data[-1:], len_wire[-1:])
+
+    def close(self):
+        """Write the last packet and close the trace at its end time."""
+        delta_t = self.quantizer.cycles(self.t_end)
+        self._write(delta_t, *self.pending)
+        self.wr.close()
+        return self.wr.n_pkts
+
+    def _write(self, delta_t, data, len_wire):
+        """Write packets with given delta_t values."""
+        if len(delta_t) == 0:
+            return
+        if delta_t.max() > 0xFFFFFFFF:
+            raise ValueError("delta_t exceeds 32 bits")
+        self.wr.write(delta_t, len_wire, data)
+        self.duration += int(delta_t.sum())
+
+
+class Result(object):
+    """Result of a multi-port generation."""
+
+    def __init__(self, n_pkts, n_shifted, shift_max, n_dropped, durations):
+        """Initialize result. Times are given in clock cycles."""
+        self.n_pkts = n_pkts
+        self.n_shifted = n_shifted
+        self.shift_max = shift_max
+        self.n_dropped = n_dropped
+        self.durations = durations
+
+    def text(self):
+        """Return the result as human-readable text."""
+        us = 1e6 / trace_writer.CLK_FREQ
+        return "\n".join([
+            "packets: %d (%s, including lead-in packets)" % (
+                sum(self.n_pkts), ", ".join(str(n) for n in self.n_pkts)),
+            "duration: %s s" % ", ".join(
+                "%.6f" % (d / trace_writer.CLK_FREQ) for d in self.durations),
+            "shifted packets: %d (%s)" % (
+                sum(self.n_shifted), ", ".join(str(n)
+                                               for n in self.n_shifted)),
+            "maximum shift: %.3f us" % (max(self.shift_max) * us),
+            "dropped packets: %d (%s)" % (
+                sum(self.n_dropped), ", ".join(str(n)
+                                               for n in self.n_dropped)),
+        ])
+
+
+def generate(filenames, workload, model, assign, rng, duration,
+             tolerance=trace_validate.TOLERANCE, batch_size=BATCH_SIZE):
+    """Generate one trace per port ('filenames') from a flow workload.
+
+    'model' is a traffic_models.TrafficModel describing the aggregate traffic
+    of all ports, 'assign(data, slot)' returns the ports of packets. The
+    traces end after 'duration' seconds of traffic. Packets shifted by more
+    than 'tolerance' clock cycles are counted as shifted, packets whose
+    shifted transmission would end after the end of the traces are dropped.
+    Returns a Result.
+    """
+    lead_in = burst_pattern.lead_in_template()
+    start = math.ceil(trace_rescale.tx_time(lead_in.pkt_len))
+    t_end = start + duration * trace_writer.CLK_FREQ
+    ports = [PortWriter(filename, start, t_end, lead_in)
+             for filename in filenames]
+
+    t = 0
+    while True:
+        delta_t, len_wire = model.draw(batch_size, rng)
+        t_pkts = t + np.cumsum(delta_t) - delta_t
+        t += int(np.sum(delta_t))
+
+        # packets must be transmitted completely before the traces end
+        # (packets of different sizes may end in a different order than they
+        # start)
+        done = start + t >= t_end
+        keep = start + t_pkts + trace_rescale.tx_time(len_wire) <= t_end
+        t_pkts, len_wire = t_pkts[keep], len_wire[keep]
+        data, len_wire, slot, _ = workload.build(t_pkts, len_wire, rng)
+        port = assign(data, slot)
+        for i, p in enumerate(ports):
+            sel = port == i
+            p.add(start + t_pkts[sel].astype(np.float64), len_wire[sel],
+                  data[sel], tolerance)
+        if done:
+            break
+
+    n_pkts = [p.close() for p in ports]
+    return Result(n_pkts, [p.n_shifted for p in ports],
+                  [p.shift_max for p in ports], [p.n_dropped for p in ports],
+                  [p.duration for p in ports])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate traces for multiple ports from a single " +
+        "flow workload on a shared timeline.")
+    parser.add_argument("output", help="output trace file name, '{port}' " +
+                        "is replaced by the port number (default: port " +
+                        "number appended)")
+    parser.add_argument("--ports", type=int, default=burst_pattern.N_PORTS,
+                        help="number of ports (default: %d)" %
+                        burst_pattern.N_PORTS)
+    parser.add_argument("--map", type=int, nargs="+", default=None,
+                        help="ports of consecutive flow slots (repeated " +
+                        "for all slots, default: assignment by 5-tuple hash)")
+    parser.add_argument("--flows", type=int, default=100000,
+                        help="number of concurrent flows (default: 100000)")
+    parser.add_argument("--zipf", type=float, default=1.0,
+                        help="Zipf exponent of flow popularity (default: 1.0)")
+    parser.add_argument("--proto", choices=["udp", "tcp"], default="udp",
+                        help="transport protocol (default: udp)")
+    parser.add_argument("--ipv6", action="store_true",
+                        help="generate IPv6 instead of IPv4 packets")
+    parser.add_argument("--pktlen", type=int, default=None,
+                        help="packet length in bytes, excluding FCS " +
+                        "(default: IMIX)")
+    parser.add_argument("--rate", type=float, default=5e6,
+                        help="mean aggregate packet rate of all ports in " +
+                        "packets/second (default: 5e6)")
+    parser.add_argument("--duration", type=float, default=100e-3,
+                        help="trace duration in seconds (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    if not 1 <= args.ports <= burst_pattern.N_PORTS:
+        parser.error("number of ports must be between 1 and %d" %
+                     burst_pattern.N_PORTS)
+    if args.map is not None and not all(0 <= p < args.ports
+                                        for p in args.map):
+        parser.error("mapped ports must be between 0 and %d" %
+                     (args.ports - 1))
+
+    rng = np.random.default_rng(args.seed)
+    l3 = IPv6() if args.ipv6 else IPv4()
+    l4 = TCP() if args.proto == "tcp" else UDP()
+    tmpl = PacketTemplate(Ether(), l3, l4, pkt_len=trace_writer.PKT_SIZE_MAX)
+    if args.ipv6:
+        flows = FlowTable(args.flows, rng, src="fd00::", dst="fd00:1::")
+    else:
+        flows = FlowTable(args.flows, rng)
+    workload = FlowWorkload(tmpl, flows, ZipfPopularity(args.flows, args.zipf))
+
+    size = ImixSize() if args.pktlen is None else FixedSize(args.pktlen)
+    model = TrafficModel(PoissonIAT(args.rate), size,
+                         link_rate=args.ports * trace_writer.MAX_DATARATE,
+                         size_min=max(tmpl.hdr_len, PKT_SIZE_MIN))
+    if args.map is None:
+        assign = HashAssignment(tmpl, args.ports)
+    else:
+        assign = MappingAssignment(args.map)
+
+    filenames = [burst_pattern.port_filename(args.output, port)
+                 for port in range(args.ports)]
+    res = generate(filenames, workload, model, assign, rng, args.duration)
+    print(res.text())
+    for filename, n_pkts in zip(filenames, res.n_pkts):
+        print("Successfully wrote %d packets to trace file %s!" %
+              (n_pkts, filename))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Convert PCAP and pcapng files to trace files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Python replacement of software/pcap/pcap_import, which also accepts PCAP
+# files with microsecond timestamps and pcapng files (see pcap_reader.py) and
+# does not need to be compiled. The capture is mapped sequentially in windows
+# of bounded size (pcap_reader.read_windows()), so that memory consumption
+# does not depend on the size of the capture. Without per-packet Python code,
+# the records of a window are located by a vectorized search, the meta data
+# words of its packets are assembled with NumPy and the packet data is
+# gathered directly from the mapped window. Since the delta_t of a packet
+# follows from the timestamp of the next packet, the last packet of each
+# window is only written once the next window has been read.
+#
+# The timing of the resulting trace is identical to the one pcap_import
+# produces: timestamp differences are rounded up and down like pcap_import
+# does (see quantize.py, compatibility mode) and the last packet is followed by
+# the transmission time of a maximum sized packet (trace_writer.DELTA_T_LAST).
+# Unlike pcap_import, which fails at captured packets larger than 1518 bytes
+# but silently corrupts larger wire lengths, packets whose wire length exceeds
+# the maximum the hardware can transmit are rejected or skipped. Packets must
+# be ordered by their timestamps (pcapng files with multiple interfaces may be
+# sorted first, which requires mapping the entire capture into memory).
+
+import argparse
+import numpy as np
+import pcap_reader
+import pcap_writer
+import trace_merge
+import trace_reader
+import trace_writer
+from quantize import Quantizer
+
+
+class Result(object):
+    """Result of a conversion."""
+
+    def __init__(self):
+        """Initialize result."""
+        self.n_pkts = 0
+        self.n_skipped = 0
+        self.duration = 0
+        self.err_max = 0.0
+
+    def text(self):
+        """Return the result as human-readable text."""
+        return "\n".join([
+            "packets: %d (%d skipped)" % (self.n_pkts, self.n_skipped),
+            "duration: %.6f s" % (self.duration / trace_writer.CLK_FREQ),
+            "maximum timing error: %.3f clock cycles" % self.err_max,
+        ])
+
+
+class _Converter(object):
+    """Writes packets to the trace once their successors' times are known."""
+
+    def __init__(self, wr, filename_in):
+        """Initialize converter writing to TraceWriter 'wr'."""
+        self.wr = wr
+        self.filename_in = filename_in
+        self.q = Quantizer(compat=True)
+        self.duration = 0
+
+        # encoded last packet, whose delta_t is not known yet
+        self._pending = None
+
+    def write(self, data, data_offsets, ts_ns, len_snap, len_wire):
+        """Encode packets gathered from array 'data' and write them."""
+        rec_bytes = 8 * trace_reader.record_words(len_snap)
+        pos = np.cumsum(rec_bytes) - rec_bytes
+        out = np.zeros(int(rec_bytes.sum()), dtype=np.uint8)
+        meta = out.view('<u8')
+        meta[pos // 8] = trace_writer.meta(0, len_snap, len_wire)
+        trace_merge.copy_words(meta, pos // 8 + 1, data, data_offsets,
+                               len_snap)
+
+        # the delta_t of each packet follows from the next packet's timestamp
+        delta_t = self.q.ns(ts_ns)
+        self._check(delta_t)
+        if self._pending is not None:
+            self._flush(delta_t[0])
+            delta_t = delta_t[1:]
+        meta[pos[:-1] // 8] |= delta_t.astype(np.uint64)
+        self.duration += int(delta_t.sum())
+        self.wr.write_encoded(out[:pos[-1]], len(pos) - 1)
+        self._pending = out[pos[-1]:].copy()
+
+    def close(self):
+        """Write the last packet."""
+        if self._pending is not None:
+            self._flush(trace_writer.DELTA_T_LAST)
+
+    def _check(self, delta_t):
+        """Make sure that delta_t values fit into the meta data words."""
+        if len(delta_t) > 0 and delta_t.max() > 0xFFFFFFFF:
+            raise ValueError("%s: time between packets exceeds the " %
+                             self.filename_in + "maximum delta_t")
+
+    def _flush(self, delta_t):
+        """Write the pending packet with its delta_t."""
+        self._pending.view('<u8')[0] |= np.uint64(delta_t)
+        self.wr.write_encoded(self._pending, 1)
+        self.duration += int(delta_t)
+        self._pending = None
+
+
+def _sorted(filename):
+    """Read an entire capture and sort its packets by their timestamps."""
+    cap = pcap_reader.open_capture(filename)
+    ts_ns = cap.ts_ns
+    order = np.argsort(ts_ns, kind='stable')
+    return pcap_reader.Window(cap.data, cap.data_offsets[order], ts_ns[order],
+                              cap.caplen[order], cap.origlen[order],
+                              cap.linktypes[order])
+
+
+def convert(filename_in, filename_out, skip_oversize=False, sort=False,
+            batch_size=trace_writer.BATCH_SIZE,
+            window_size=pcap_reader.WINDOW_SIZE):
+    """Convert a PCAP or pcapng file to a trace file. Returns a Result.
+
+    Packets with wire lengths exceeding trace_writer.PKT_SIZE_MAX are skipped,
+    if 'skip_oversize' is True, otherwise a ValueError is raised. If 'sort' is
+    True, packets are sorted by their timestamps.
+    """
+    windows = [_sorted(filename_in)] if sort else \
+        pcap_reader.read_windows(filename_in, window_size)
+    res = Result()
+    n_read = 0
+    ts_last = None
+    with trace_writer.TraceWriter(filename_out) as wr:
+        conv = _Converter(wr, filename_in)
+        for win in windows:
+            if np.any(win.linktypes != pcap_writer.LINKTYPE_ETHERNET):
+                raise ValueError("%s: only Ethernet captures are supported" %
+                                 filename_in)
+            sel = np.arange(win.n_pkts)
+            oversize = win.origlen > trace_writer.PKT_SIZE_MAX
+            if np.any(oversize):
+                if not skip_oversize:
+                    raise ValueError("%s: packet %d exceeds %d bytes" % (
+                        filename_in, n_read + np.argmax(oversize),
+                        trace_writer.PKT_SIZE_MAX))
+                sel = sel[~oversize]
+            n_read += win.n_pkts
+            res.n_skipped += win.n_pkts - len(sel)
+            if len(sel) == 0:
+                continue
+
+            ts_ns = win.ts_ns[sel]
+            if np.any(np.diff(ts_ns) < 0) or \
+                    ts_last is not None and ts_ns[0] < ts_last:
+                raise ValueError("%s: packets are not ordered by their " %
+                                 filename_in + "timestamps")
+            ts_last = ts_ns[-1]
+
+            len_wire = win.origlen[sel]
+            len_snap = np.minimum(win.caplen[sel], len_wire)
+            for a in range(0, len(sel), batch_size):
+                b = a + batch_size
+                conv.write(win.data, win.data_offsets[sel[a:b]], ts_ns[a:b],
+                           len_snap[a:b], len_wire[a:b])
+        conv.close()
+        res.n_pkts = wr.n_pkts
+    res.duration = conv.duration
+    res.err_max = conv.q.err_max
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a PCAP or pcapng file to a trace file.")
+    parser.add_argument("input", help="input PCAP or pcapng file")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("--skip-oversize", action="store_true",
+                        help="skip packets longer than %d bytes " %
+                        trace_writer.PKT_SIZE_MAX + "instead of failing")
+    parser.add_argument("--sort", action="store_true",
+                        help="sort packets by their timestamps")
+    args = parser.parse_args()
+
+    res = convert(args.input, args.output, args.skip_oversize, args.sort)
+    print(res.text())
+    print("Successfully wrote %d packets to trace file!" % res.n_pkts)
+
+
+if __name__ == "__main__":
+    main()
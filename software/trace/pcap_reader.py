@@ -0,0 +1,604 @@
+"""Vectorized reader for PCAP files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Reads PCAP files (microsecond or nanosecond timestamp precision, either byte
+# order) and pcapng files via mmap. Packet records (pcapng: blocks) are
+# located with a vectorized chain search (see trace_reader.candidate_chain())
+# and their headers are decoded into NumPy arrays at once.
+#
+# The positions at which plausible records may start are found without
+# parsing the preceding records: PCAP record headers start with a timestamp
+# close to the first record's one (the most significant byte of its seconds
+# differs by at most one), pcapng blocks are 32 bit aligned and have plausible
+# lengths, which are repeated at their ends. All candidates are then checked
+# at once, and the chain of records is followed through the candidates.
+# Header fields are read through views of the (unaligned) 32 bit values
+# starting at every byte of the data.
+#
+# Alternatively, read_windows() maps a capture window by window, so that
+# arbitrarily large captures can be processed with constant memory. A window
+# ends before its last incomplete record, which is the first record of the
+# next window.
+#
+# pcapng files may contain multiple sections and interfaces with different
+# link types and timestamp resolutions. Packets are read from enhanced (and
+# obsolete) packet blocks, simple packet blocks are not supported since they
+# carry no timestamps. All sections must have the same byte order.
+
+import mmap
+import os
+import struct
+import numpy as np
+import trace_reader
+
+# PCAP magic numbers (as read in the byte order of the file)
+PCAP_MAGIC_US = 0xa1b2c3d4
+PCAP_MAGIC_NS = 0xa1b23c4d
+
+# length of the PCAP global header and of the record headers
+PCAP_HDR_LEN = 24
+PCAP_REC_HDR_LEN = 16
+
+# maximum snap length assumed if the file header does not specify one
+PCAP_SNAPLEN_MAX = 262144
+
+# records with timestamps further apart from the first record's timestamp
+# (seconds) are considered implausible when searching records
+PCAP_TS_RANGE = 1 << 24
+
+# number of bytes mapped at once when reading captures sequentially
+WINDOW_SIZE = 1 << 24
+
+# pcapng block types and byte order magic number
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_OPB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# pcapng interface description block options
+PCAPNG_OPT_ENDOFOPT = 0
+PCAPNG_OPT_IF_TSRESOL = 9
+PCAPNG_OPT_IF_TSOFFSET = 14
+
+# default pcapng timestamp resolution (microseconds)
+PCAPNG_TSRESOL_DEFAULT = 6
+
+# length of the header of (enhanced/obsolete) packet blocks
+PCAPNG_PKT_HDR_LEN = 28
+
+# blocks longer than this are considered implausible when searching blocks
+PCAPNG_BLOCK_MAX = PCAP_SNAPLEN_MAX + (1 << 16)
+
+
+def _gather(data, pos, dtype):
+    """Read values of a NumPy dtype at (unaligned) byte positions."""
+    pos = np.asarray(pos)
+    b = data[pos[..., None] + np.arange(dtype.itemsize)]
+    return np.ascontiguousarray(b).view(dtype)[..., 0]
+
+
+def _view(data, dtype):
+    """Return a view of the values of a NumPy dtype starting at every byte."""
+    dtype = np.dtype(dtype)
+    return np.ndarray((max(len(data) - dtype.itemsize + 1, 0),), dtype=dtype,
+                      buffer=data, strides=(1,))
+
+
+def _pcap_record_offsets(data, u32, ns, snaplen, ts_first):
+    """Locate the PCAP records in 'data'.
+
+    'u32' is the view of the data's 32 bit values (see _view()) and 'ts_first'
+    the timestamp (seconds) of the first record of the file. The last record
+    may extend beyond the end of the data.
+    """
+    n = len(data)
+    frac_max = 1000000000 if ns else 1000000
+
+    # candidates: complete headers whose timestamps' most significant bytes
+    # differ from the first record's one by at most one
+    top = data[3 if u32.dtype.byteorder in "<=" else 0:]
+    top = top[:max(n - PCAP_REC_HDR_LEN + 1, 0)]
+    cand = np.flatnonzero(top - np.uint8(((ts_first >> 24) - 1) & 0xFF) <= 2)
+    ts_sec = u32[cand].astype(np.int64)
+    caplen = u32[cand + 8].astype(np.int64)
+    origlen = u32[cand + 12]
+    ok = (caplen <= snaplen) & (caplen <= origlen) & \
+        (origlen <= PCAP_SNAPLEN_MAX) & (u32[cand + 4] < frac_max) & \
+        (np.abs(ts_sec - ts_first) < PCAP_TS_RANGE)
+    cand = cand[ok]
+
+    def step(pos):
+        if pos + PCAP_REC_HDR_LEN > n:
+            return n
+        return pos + PCAP_REC_HDR_LEN + int(u32[pos + 8])
+
+    return trace_reader.candidate_chain(
+        n, cand, cand + PCAP_REC_HDR_LEN + caplen[ok], step)
+
+
+def _pcapng_block_offsets(data, byteorder):
+    """Locate the complete pcapng blocks in 'data' (starting at a block)."""
+    n = len(data)
+    w = data[:n - n % 4].view(byteorder + "u4")
+
+    # candidates: complete blocks (at 32 bit aligned positions) of plausible
+    # lengths, which are repeated in the blocks' trailers
+    length = w[1:]
+    cand = np.flatnonzero((length & 3 == 0) &
+                          (length - np.uint32(12) <= PCAPNG_BLOCK_MAX - 12))
+    length = length[cand].astype(np.int64)
+    complete = 4 * cand + length <= n
+    cand, length = cand[complete], length[complete]
+    ok = w[cand + length // 4 - 1] == length
+    cand, length = 4 * cand[ok], length[ok]
+
+    def step(pos):
+        if pos + 12 > n:
+            return n
+        length = int(w[pos // 4 + 1])
+        if length < 12 or length % 4 != 0:
+            raise ValueError("invalid pcapng block length: %d" % length)
+        return pos + length
+
+    offsets = trace_reader.candidate_chain(n, cand, cand + length, step)
+    offsets = offsets[offsets + 12 <= n]
+    return offsets[offsets + w[offsets // 4 + 1] <= n]
+
+
+def _pcap_header(hdr):
+    """Parse a PCAP global header.
+
+    Returns the byte order, whether timestamps have nanosecond precision, the
+    snap length and the link type.
+    """
+    if len(hdr) < PCAP_HDR_LEN:
+        raise ValueError("file is too short to be a PCAP file")
+    for byteorder in ("<", ">"):
+        magic, = struct.unpack_from(byteorder + "I", hdr)
+        if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+            break
+    else:
+        raise ValueError("invalid PCAP magic number: 0x%08x" % magic)
+    snaplen, linktype = struct.unpack_from(byteorder + "II", hdr, 16)
+    return byteorder, magic == PCAP_MAGIC_NS, snaplen or PCAP_SNAPLEN_MAX, \
+        linktype
+
+
+def _pcapng_interface(buf, off, byteorder):
+    """Parse the interface description block at byte offset 'off'."""
+    length, linktype, _, snaplen = struct.unpack_from(byteorder + "IHHI",
+                                                      buf, off + 4)
+    iface = {'linktype': linktype, 'snaplen': snaplen,
+             'tsresol': PCAPNG_TSRESOL_DEFAULT, 'tsoffset': 0}
+    pos = off + 16
+    while pos + 4 <= off + length - 4:
+        code, opt_len = struct.unpack_from(byteorder + "HH", buf, pos)
+        value = bytes(buf[pos + 4:pos + 4 + opt_len])
+        if code == PCAPNG_OPT_ENDOFOPT:
+            break
+        if code == PCAPNG_OPT_IF_TSRESOL and opt_len >= 1:
+            iface['tsresol'] = value[0]
+        elif code == PCAPNG_OPT_IF_TSOFFSET and opt_len >= 8:
+            iface['tsoffset'], = struct.unpack(byteorder + "q", value[:8])
+        pos += 4 + opt_len + (-opt_len % 4)
+    return iface
+
+
+def _interfaces_ts_ns(interfaces, interface, ticks):
+    """Convert pcapng timestamps of packets to nanoseconds."""
+    ts_ns = np.zeros(len(interface), dtype=np.int64)
+    for i, iface in enumerate(interfaces):
+        sel = interface == i
+        ts_ns[sel] = _ticks_to_ns(ticks[sel], iface['tsresol']) + \
+            iface['tsoffset'] * 1000000000
+    return ts_ns
+
+
+def open_capture(filename):
+    """Open a PCAP or pcapng file (detected by its magic number)."""
+    with open(filename, "rb") as f:
+        magic = f.read(4)
+    if len(magic) == 4 and int.from_bytes(magic, "little") == PCAPNG_SHB:
+        return PcapngFile(filename)
+    return PcapFile(filename)
+
+
+class PcapFile(object):
+    """Memory-mapped PCAP file."""
+
+    def __init__(self, filename, writable=False):
+        """Map PCAP file into memory and parse its header."""
+        self.filename = filename
+        self.data = trace_reader.open_trace(filename, writable)
+        self.byteorder, self.ns, self.snaplen, self.linktype = \
+            _pcap_header(self.data[:PCAP_HDR_LEN].tobytes())
+        self._dtype = np.dtype(self.byteorder + "u4")
+
+        # record header fields (byte offsets of all records)
+        self.offsets = self._record_offsets()
+        hdr = self._u32(self.offsets[:, None] + np.arange(0, 16, 4))
+        self.ts_sec = hdr[:, 0].astype(np.int64)
+        self.ts_frac = hdr[:, 1].astype(np.int64)
+        self.caplen = hdr[:, 2].astype(np.int64)
+        self.origlen = hdr[:, 3].astype(np.int64)
+
+    @property
+    def n_pkts(self):
+        """Number of packets."""
+        return len(self.offsets)
+
+    @property
+    def data_offsets(self):
+        """Byte offsets of the packets' captured data."""
+        return self.offsets + PCAP_REC_HDR_LEN
+
+    @property
+    def linktypes(self):
+        """Link types of the packets' interfaces."""
+        return np.full(self.n_pkts, self.linktype, dtype=np.int64)
+
+    @property
+    def ts_ns(self):
+        """Packet timestamps in nanoseconds."""
+        return self.ts_sec * 1000000000 + \
+            (self.ts_frac if self.ns else self.ts_frac * 1000)
+
+    def set_ts_ns(self, ts_ns):
+        """Overwrite the packet timestamps (file must be writable)."""
+        ts_ns = np.asarray(ts_ns, dtype=np.int64)
+        frac = ts_ns % 1000000000
+        if not self.ns:
+            frac //= 1000
+        self._set_u32(self.offsets, ts_ns // 1000000000)
+        self._set_u32(self.offsets + 4, frac)
+        self.ts_sec = ts_ns // 1000000000
+        self.ts_frac = frac
+
+    def packet_data(self, i):
+        """Return the captured data of packet 'i'."""
+        a = int(self.offsets[i]) + PCAP_REC_HDR_LEN
+        return self.data[a:a + int(self.caplen[i])]
+
+    def _u32(self, pos):
+        """Read 32 bit values at (unaligned) byte positions."""
+        return _gather(self.data, pos, self._dtype)
+
+    def _set_u32(self, pos, values):
+        """Write 32 bit values at (unaligned) byte positions."""
+        b = np.asarray(values, dtype=self._dtype).reshape(-1, 1) \
+            .view(np.uint8)
+        self.data[np.asarray(pos)[:, None] + np.arange(4)] = b
+
+    def _record_offsets(self):
+        """Locate all packet records."""
+        data = self.data[PCAP_HDR_LEN:]
+        u32 = _view(data, self._dtype)
+        ts_first = int(u32[0]) if len(u32) > 0 else 0
+        offsets = _pcap_record_offsets(data, u32, self.ns, self.snaplen,
+                                       ts_first)
+        return offsets[offsets + PCAP_REC_HDR_LEN <= len(data)] + PCAP_HDR_LEN
+
+
+class PcapngFile(object):
+    """Memory-mapped pcapng file."""
+
+    def __init__(self, filename):
+        """Map pcapng file into memory and parse its blocks."""
+        self.filename = filename
+        self.data = trace_reader.open_trace(filename)
+        shb, bom = struct.unpack("<II", self.data[:4].tobytes() +
+                                 self.data[8:12].tobytes()) \
+            if len(self.data) >= 12 else (None, None)
+        if shb != PCAPNG_SHB:
+            raise ValueError("invalid pcapng section header block")
+        if bom == PCAPNG_BYTE_ORDER_MAGIC:
+            self.byteorder = "<"
+        elif bom == int.from_bytes(PCAPNG_BYTE_ORDER_MAGIC.to_bytes(4, "big"),
+                                   "little"):
+            self.byteorder = ">"
+        else:
+            raise ValueError("invalid pcapng byte order magic: 0x%08x" % bom)
+
+        blocks = self._block_offsets()
+        types = self._u32(blocks).astype(np.int64)
+        if np.any(types == PCAPNG_SPB):
+            raise ValueError("simple packet blocks (without timestamps) " +
+                             "are not supported")
+        shb = types == PCAPNG_SHB
+        if np.any(self._u32(blocks[shb] + 8) != PCAPNG_BYTE_ORDER_MAGIC):
+            raise ValueError("sections with different byte orders")
+
+        # interfaces are numbered per section
+        idb = types == PCAPNG_IDB
+        self.interfaces = [_pcapng_interface(self.data, int(off),
+                                              self.byteorder)
+                           for off in blocks[idb]]
+        n_idb = np.cumsum(idb) - idb
+        section_base = n_idb[shb][np.cumsum(shb) - 1]
+
+        pkt = (types == PCAPNG_EPB) | (types == PCAPNG_OPB)
+        self.offsets = blocks[pkt]
+        hdr = self._u32(self.offsets[:, None] + np.arange(8, 28, 4)) \
+            .astype(np.int64)
+        local_if = np.where(types[pkt] == PCAPNG_OPB,
+                            self._u16(self.offsets + 8), hdr[:, 0])
+        self.interface = section_base[pkt] + local_if
+        n_if = section_base[pkt] + self._section_interfaces(shb, idb)[pkt]
+        if np.any(self.interface >= n_if):
+            raise ValueError("packet block refers to an unknown interface")
+        self._ticks = (hdr[:, 1].astype(np.uint64) << np.uint64(32)) | \
+            hdr[:, 2].astype(np.uint64)
+        self.caplen = hdr[:, 3]
+        self.origlen = hdr[:, 4]
+
+    @property
+    def n_pkts(self):
+        """Number of packets."""
+        return len(self.offsets)
+
+    @property
+    def data_offsets(self):
+        """Byte offsets of the packets' captured data."""
+        return self.offsets + PCAPNG_PKT_HDR_LEN
+
+    @property
+    def linktypes(self):
+        """Link types of the packets' interfaces."""
+        linktypes = np.asarray([i['linktype'] for i in self.interfaces],
+                               dtype=np.int64)
+        return linktypes[self.interface]
+
+    @property
+    def ts_ns(self):
+        """Packet timestamps in nanoseconds."""
+        return _interfaces_ts_ns(self.interfaces, self.interface, self._ticks)
+
+    def packet_data(self, i):
+        """Return the captured data of packet 'i'."""
+        a = int(self.offsets[i]) + PCAPNG_PKT_HDR_LEN
+        return self.data[a:a + int(self.caplen[i])]
+
+    def _u16(self, pos):
+        """Read 16 bit values at (unaligned) byte positions."""
+        return _gather(self.data, pos, np.dtype(self.byteorder + "u2"))
+
+    def _u32(self, pos):
+        """Read 32 bit values at (unaligned) byte positions."""
+        return _gather(self.data, pos, np.dtype(self.byteorder + "u4"))
+
+    def _section_interfaces(self, shb, idb):
+        """Return the number of interfaces of each block's section."""
+        section = np.cumsum(shb) - 1
+        return np.bincount(section[idb], minlength=section[-1] + 1)[section]
+
+    def _block_offsets(self):
+        """Locate all blocks."""
+        return _pcapng_block_offsets(self.data, self.byteorder)
+
+
+class Window(object):
+    """Packets of a window of a capture that is read sequentially."""
+
+    def __init__(self, data, data_offsets, ts_ns, caplen, origlen,
+                 linktypes):
+        """Initialize window.
+
+        'data' is a uint8 array holding the window, 'data_offsets' are the
+        byte offsets of the packets' captured data within it.
+        """
+        self.data = data
+        self.data_offsets = data_offsets
+        self.ts_ns = ts_ns
+        self.caplen = caplen
+        self.origlen = origlen
+        self.linktypes = linktypes
+
+    @property
+    def n_pkts(self):
+        """Number of packets."""
+        return len(self.data_offsets)
+
+
+def read_windows(filename, window_size=WINDOW_SIZE):
+    """Read a PCAP or pcapng file sequentially. Yields Window objects.
+
+    Windows map about 'window_size' bytes of the file (more, if a single
+    record is larger).
+    """
+    with open(filename, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        hdr = f.read(PCAP_HDR_LEN)
+        if len(hdr) >= 4 and int.from_bytes(hdr[:4], "little") == PCAPNG_SHB:
+            stream, pos = _PcapngStream(), 0
+        else:
+            stream, pos = _PcapStream(hdr), PCAP_HDR_LEN
+
+        length = window_size
+        while pos < size:
+            data = _map(f, pos, min(length, size - pos))
+            n, win = stream.walk(data)
+            if n == 0:
+                # the window ends before the end of its first record
+                if pos + len(data) == size:
+                    raise ValueError("%s: capture is truncated" % filename)
+                length *= 2
+                continue
+            if pos + len(data) == size and n < len(data):
+                raise ValueError("%s: capture is truncated" % filename)
+            yield win
+            pos += n
+            length = window_size
+
+
+def _map(f, offset, length):
+    """Map 'length' bytes of a file at 'offset'. Returns a uint8 array."""
+    start = offset - offset % mmap.ALLOCATIONGRANULARITY
+    buf = mmap.mmap(f.fileno(), offset + length - start,
+                    access=mmap.ACCESS_READ, offset=start)
+    buf.madvise(mmap.MADV_SEQUENTIAL)
+    return np.frombuffer(buf, dtype=np.uint8)[offset - start:]
+
+
+class _PcapStream(object):
+    """Locates the records of the windows of a PCAP file."""
+
+    def __init__(self, hdr):
+        """Parse the global header of the PCAP file."""
+        self.byteorder, self.ns, self.snaplen, self.linktype = \
+            _pcap_header(hdr)
+        self._dtype = np.dtype(self.byteorder + "u4")
+        self._ts_first = None
+
+    def walk(self, data):
+        """Decode the complete records at the start of window 'data'.
+
+        Returns the number of bytes decoded and a Window.
+        """
+        u32 = _view(data, self._dtype)
+        if self._ts_first is None and len(u32) > 0:
+            self._ts_first = int(u32[0])
+        offsets = _pcap_record_offsets(data, u32, self.ns, self.snaplen,
+                                       self._ts_first)
+        offsets = offsets[offsets + PCAP_REC_HDR_LEN <= len(data)]
+        caplen = u32[offsets + 8].astype(np.int64)
+        if np.any(caplen > self.snaplen):
+            raise ValueError("captured length exceeds the snap length")
+        complete = offsets + PCAP_REC_HDR_LEN + caplen <= len(data)
+        offsets, caplen = offsets[complete], caplen[complete]
+        if len(offsets) == 0:
+            return 0, None
+
+        frac = u32[offsets + 4].astype(np.int64)
+        ts_ns = u32[offsets].astype(np.int64) * 1000000000 + \
+            (frac if self.ns else frac * 1000)
+        return int(offsets[-1] + PCAP_REC_HDR_LEN + caplen[-1]), Window(
+            data, offsets + PCAP_REC_HDR_LEN, ts_ns, caplen,
+            u32[offsets + 12].astype(np.int64),
+            np.full(len(offsets), self.linktype, dtype=np.int64))
+
+
+class _PcapngStream(object):
+    """Locates the blocks of the windows of a pcapng file."""
+
+    def __init__(self):
+        """Initialize stream."""
+        self.byteorder = None
+        self.interfaces = []
+        self._section_base = 0
+
+    def walk(self, data):
+        """Decode the complete blocks at the start of window 'data'.
+
+        Returns the number of bytes decoded and a Window.
+        """
+        if self.byteorder is None:
+            if len(data) < 12:
+                return 0, None
+            self._section(data, 0)
+        u32 = _view(data, self.byteorder + "u4")
+        offsets = _pcapng_block_offsets(data, self.byteorder)
+        if len(offsets) == 0:
+            return 0, None
+        types = u32[offsets]
+        if np.any(types == PCAPNG_SPB):
+            raise ValueError("simple packet blocks (without timestamps) " +
+                             "are not supported")
+
+        # section header and interface description blocks are parsed in
+        # order. each packet refers to the section and interfaces preceding it
+        special = np.flatnonzero((types == PCAPNG_SHB) |
+                                 (types == PCAPNG_IDB))
+        base = np.zeros(len(special) + 1, dtype=np.int64)
+        n_if = np.zeros(len(special) + 1, dtype=np.int64)
+        base[0], n_if[0] = self._section_base, len(self.interfaces)
+        for i, blk in enumerate(special):
+            if types[blk] == PCAPNG_SHB:
+                self._section(data, int(offsets[blk]))
+            else:
+                self.interfaces.append(_pcapng_interface(
+                    data, int(offsets[blk]), self.byteorder))
+            base[i + 1], n_if[i + 1] = self._section_base, len(self.interfaces)
+
+        pkt = np.flatnonzero((types == PCAPNG_EPB) | (types == PCAPNG_OPB))
+        prev = np.searchsorted(special, pkt)
+        pkt_off = offsets[pkt]
+        local_if = np.where(types[pkt] == PCAPNG_OPB,
+                            _view(data, self.byteorder + "u2")[pkt_off + 8],
+                            u32[pkt_off + 8]).astype(np.int64)
+        interface = base[prev] + local_if
+        if np.any(interface >= n_if[prev]):
+            raise ValueError("packet block refers to an unknown interface")
+
+        ticks = (u32[pkt_off + 12].astype(np.uint64) << np.uint64(32)) | \
+            u32[pkt_off + 16].astype(np.uint64)
+        linktypes = np.asarray([i['linktype'] for i in self.interfaces],
+                               dtype=np.int64)
+        return int(offsets[-1] + u32[offsets[-1] + 4]), Window(
+            data, pkt_off + PCAPNG_PKT_HDR_LEN,
+            _interfaces_ts_ns(self.interfaces, interface, ticks),
+            u32[pkt_off + 20].astype(np.int64),
+            u32[pkt_off + 24].astype(np.int64), linktypes[interface])
+
+    def _section(self, data, pos):
+        """Start a new section at the section header block at 'pos'."""
+        bom, = struct.unpack_from("<I", data, pos + 8)
+        if bom == PCAPNG_BYTE_ORDER_MAGIC:
+            byteorder = "<"
+        elif bom == int.from_bytes(PCAPNG_BYTE_ORDER_MAGIC.to_bytes(4, "big"),
+                                   "little"):
+            byteorder = ">"
+        else:
+            raise ValueError("invalid pcapng byte order magic: 0x%08x" % bom)
+        if self.byteorder not in (None, byteorder):
+            raise ValueError("sections with different byte orders")
+        self.byteorder = byteorder
+        self._section_base = len(self.interfaces)
+
+
+def _ticks_to_ns(ticks, tsresol):
+    """Convert pcapng timestamps to nanoseconds.
+
+    'tsresol' is the if_tsresol option value: a negative power of ten or, if
+    its most significant bit is set, of two.
+    """
+    ticks = np.asarray(ticks, dtype=np.uint64)
+    exp = tsresol & 0x7F
+    if tsresol & 0x80:
+        # seconds and fractional part (reduced to at most 34 bits, so that
+        # multiplying it by 10^9 does not overflow)
+        sec = ticks >> np.uint64(exp)
+        frac = ticks & np.uint64((1 << exp) - 1)
+        shift = max(exp - 34, 0)
+        frac = ((frac >> np.uint64(shift)) * np.uint64(1000000000)) >> \
+            np.uint64(exp - shift)
+        return (sec * np.uint64(1000000000) + frac).astype(np.int64)
+    if exp <= 9:
+        return (ticks * np.uint64(10 ** (9 - exp))).astype(np.int64)
+    return (ticks // np.uint64(10 ** (exp - 9))).astype(np.int64)
@@ -0,0 +1,120 @@
+"""Vectorized writer for nanosecond precision PCAP files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Writes PCAP files with nanosecond timestamp precision (as expected by
+# pcap_import) from NumPy packet arrays. The packet record headers of a whole
+# batch of packets are assembled with vectorized NumPy operations.
+
+import struct
+import numpy as np
+
+# PCAP magic number (nanosecond timestamp precision)
+PCAP_MAGIC_NUMBER = 0xa1b23c4d
+
+# PCAP link type of Ethernet captures
+LINKTYPE_ETHERNET = 1
+
+# default PCAP snap length
+PCAP_SNAPLEN = 65535
+
+
+def header(snaplen=PCAP_SNAPLEN):
+    """Return the PCAP global file header."""
+    return struct.pack("<IHHiIII", PCAP_MAGIC_NUMBER, 2, 4, 0, 0, snaplen,
+                       LINKTYPE_ETHERNET)
+
+
+def encode(ts_ns, len_wire, data, len_snap=None):
+    """Encode a batch of packets to PCAP records.
+
+    'ts_ns' are the absolute packet timestamps in nanoseconds. 'len_wire',
+    'data' and 'len_snap' are handled the same way as by trace_writer.encode().
+    The packet data of each packet is truncated to its snap length. Returns the
+    encoded records as a uint8 array.
+    """
+    ts_ns = np.asarray(ts_ns, dtype=np.uint64).reshape(-1)
+    n = ts_ns.size
+
+    data = np.asarray(data, dtype=np.uint8)
+    data_width = data.shape[-1]
+    data = np.broadcast_to(data, (n, data_width))
+
+    len_wire = np.broadcast_to(np.asarray(len_wire, dtype=np.int64), (n,))
+    if len_snap is None:
+        len_snap = np.minimum(len_wire, data_width)
+    len_snap = np.broadcast_to(np.asarray(len_snap, dtype=np.int64), (n,))
+
+    if np.any(len_snap > len_wire) or np.any(len_snap > data_width):
+        raise ValueError("invalid snap length")
+
+    # assemble 16 byte record headers
+    hdr = np.empty((n, 4), dtype='<u4')
+    hdr[:, 0] = ts_ns // np.uint64(1000000000)
+    hdr[:, 1] = ts_ns % np.uint64(1000000000)
+    hdr[:, 2] = len_snap
+    hdr[:, 3] = len_wire
+
+    # concatenate record headers and the first 'len_snap' bytes of each packet
+    rows = np.concatenate((hdr.view(np.uint8), data), axis=1)
+    cols = np.arange(16 + data_width)
+    return rows[cols < 16 + len_snap[:, None]]
+
+
+class PcapWriter(object):
+    """Writes packet batches to a nanosecond precision PCAP file."""
+
+    def __init__(self, f, snaplen=PCAP_SNAPLEN):
+        """Open PCAP file (file name or binary file object) for writing."""
+        if isinstance(f, str):
+            self._f = open(f, "wb")
+            self._close_file = True
+        else:
+            self._f = f
+            self._close_file = False
+
+        self._f.write(header(snaplen))
+        self.n_pkts = 0
+
+    def __enter__(self):
+        """Enter context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context manager and close the file."""
+        self.close()
+
+    def write(self, ts_ns, len_wire, data, len_snap=None):
+        """Encode a batch of packets and append them to the PCAP file."""
+        self._f.write(memoryview(encode(ts_ns, len_wire, data, len_snap)))
+        self.n_pkts += np.size(ts_ns)
+
+    def close(self):
+        """Close the PCAP file."""
+        if self._f is not None and self._close_file:
+            self._f.close()
+        self._f = None
@@ -0,0 +1,488 @@
+"""Header templates with vectorized per-packet field patching."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Building packets one by one with scapy is far too slow for traces containing
+# millions of packets. This library compiles a header stack (Ethernet, IPv4,
+# IPv6, UDP, TCP) once into a byte template. Per-packet header fields (e.g.
+# addresses, ports, IP ids, lengths, sequence numbers) are then patched into
+# copies of the template for whole batches of packets with NumPy operations.
+# IPv4 header checksums and UDP/TCP checksums are updated incrementally: only
+# the 16 bit words touched by patched fields are added to the checksum of the
+# template (RFC 1624). The packet payload is all zeros, so that only the
+# headers need to be stored (the replay hardware restores the wire length by
+# appending zero bytes).
+#
+# Example:
+#
+#   tmpl = PacketTemplate(Ether(src="53:00:00:00:00:01"),
+#                         IPv4(src="10.0.0.1", dst="10.0.0.2"),
+#                         UDP(dport=4321))
+#   data, len_wire = tmpl.build(n, {'udp.sport': sports, 'ipv4.id': ids},
+#                               pkt_len=sizes)
+
+import ipaddress
+import numpy as np
+
+# Ethernet types and IP protocol numbers
+ETH_TYPE_IPV4 = 0x0800
+ETH_TYPE_IPV6 = 0x86DD
+IP_PROTO_TCP = 6
+IP_PROTO_UDP = 17
+
+# minimum Ethernet frame length (excluding FCS)
+PKT_LEN_MIN = 60
+
+
+class Layer(object):
+    """Protocol header layer.
+
+    Subclasses define the header length and the header fields. Each field is
+    described by its byte offset within the header, its byte width and an
+    optional bit mask (for fields not spanning whole bytes, their values are
+    shifted to the mask's position).
+    """
+
+    name = None
+    length = 0
+
+    # key: field name, value: (offset, width, mask)
+    fields = {}
+
+    # default field values
+    defaults = {}
+
+    def __init__(self, **kwargs):
+        """Create layer, overriding default field values."""
+        for key in kwargs:
+            if key not in self.fields:
+                raise ValueError("layer '%s' has no field '%s'" %
+                                 (self.name, key))
+        self.values = dict(self.defaults)
+        self.values.update(kwargs)
+
+        # fields explicitly set by the user are not overwritten when layers
+        # are stacked
+        self._explicit = set(kwargs)
+
+    def bind(self, upper):
+        """Set fields identifying the upper layer (e.g. EtherType)."""
+        pass
+
+    def field_bytes(self, field, value):
+        """Convert a scalar field value to bytes."""
+        _, width, _ = self.fields[field]
+        if isinstance(value, (bytes, bytearray)):
+            return bytes(value)
+        return int(value).to_bytes(width, "big")
+
+
+class Ether(Layer):
+    """Ethernet header."""
+
+    name = "eth"
+    length = 14
+    fields = {
+        'dst': (0, 6, None),
+        'src': (6, 6, None),
+        'type': (12, 2, None),
+    }
+    defaults = {'dst': "53:00:00:00:00:02", 'src': "53:00:00:00:00:01",
+                'type': 0x9000}
+
+    def bind(self, upper):
+        """Set EtherType according to the upper layer."""
+        if 'type' in self._explicit:
+            return
+        if isinstance(upper, IPv4):
+            self.values['type'] = ETH_TYPE_IPV4
+        elif isinstance(upper, IPv6):
+            self.values['type'] = ETH_TYPE_IPV6
+
+    def field_bytes(self, field, value):
+        """Convert a scalar field value to bytes."""
+        if isinstance(value, str):
+            return bytes.fromhex(value.replace(":", ""))
+        return super().field_bytes(field, value)
+
+
+class IPv4(Layer):
+    """IPv4 header (without options)."""
+
+    name = "ipv4"
+    length = 20
+    fields = {
+        'version_ihl': (0, 1, None),
+        'tos': (1, 1, None),
+        'len': (2, 2, None),
+        'id': (4, 2, None),
+        'flags_frag': (6, 2, None),
+        'ttl': (8, 1, None),
+        'proto': (9, 1, None),
+        'chksum': (10, 2, None),
+        'src': (12, 4, None),
+        'dst': (16, 4, None),
+    }
+    defaults = {'version_ihl': 0x45, 'tos': 0, 'len': 20, 'id': 1,
+                'flags_frag': 0, 'ttl': 64, 'proto': 0, 'chksum': 0,
+                'src': "10.0.0.1", 'dst': "10.0.0.2"}
+
+    def bind(self, upper):
+        """Set protocol number according to the upper layer."""
+        if 'proto' in self._explicit:
+            return
+        if isinstance(upper, UDP):
+            self.values['proto'] = IP_PROTO_UDP
+        elif isinstance(upper, TCP):
+            self.values['proto'] = IP_PROTO_TCP
+
+    def field_bytes(self, field, value):
+        """Convert a scalar field value to bytes."""
+        if isinstance(value, str):
+            return ipaddress.IPv4Address(value).packed
+        return super().field_bytes(field, value)
+
+
+class IPv6(Layer):
+    """IPv6 header (without extension headers)."""
+
+    name = "ipv6"
+    length = 40
+    fields = {
+        'version': (0, 1, 0xF0),
+        'tc': (0, 2, 0x0FF0),
+        'flow': (0, 4, 0x000FFFFF),
+        'plen': (4, 2, None),
+        'nh': (6, 1, None),
+        'hlim': (7, 1, None),
+        'src': (8, 16, None),
+        'dst': (24, 16, None),
+    }
+    defaults = {'version': 6, 'tc': 0, 'flow': 0, 'plen': 0, 'nh': 59,
+                'hlim': 64, 'src': "fd00::1", 'dst': "fd00::2"}
+
+    def bind(self, upper):
+        """Set next header according to the upper layer."""
+        if 'nh' in self._explicit:
+            return
+        if isinstance(upper, UDP):
+            self.values['nh'] = IP_PROTO_UDP
+        elif isinstance(upper, TCP):
+            self.values['nh'] = IP_PROTO_TCP
+
+    def field_bytes(self, field, value):
+        """Convert a scalar field value to bytes."""
+        if isinstance(value, str):
+            return ipaddress.IPv6Address(value).packed
+        return super().field_bytes(field, value)
+
+
+class UDP(Layer):
+    """UDP header."""
+
+    name = "udp"
+    length = 8
+    fields = {
+        'sport': (0, 2, None),
+        'dport': (2, 2, None),
+        'len': (4, 2, None),
+        'chksum': (6, 2, None),
+    }
+    defaults = {'sport': 53, 'dport': 53, 'len': 8, 'chksum': 0}
+
+
+class TCP(Layer):
+    """TCP header (without options)."""
+
+    name = "tcp"
+    length = 20
+    fields = {
+        'sport': (0, 2, None),
+        'dport': (2, 2, None),
+        'seq': (4, 4, None),
+        'ack': (8, 4, None),
+        'dataofs': (12, 1, None),
+        'flags': (13, 1, None),
+        'window': (14, 2, None),
+        'chksum': (16, 2, None),
+        'urgptr': (18, 2, None),
+    }
+    defaults = {'sport': 20, 'dport': 80, 'seq': 0, 'ack': 0, 'dataofs': 0x50,
+                'flags': 0x02, 'window': 8192, 'chksum': 0, 'urgptr': 0}
+
+
+def ones_complement_sum(words):
+    """Sum 16 bit words (last axis) modulo 0xFFFF (one's complement sum)."""
+    return np.sum(np.asarray(words, dtype=np.int64), axis=-1) % 0xFFFF
+
+
+def checksum_from_sum(total):
+    """Convert a one's complement sum (modulo 0xFFFF) to an IP checksum."""
+    return (0xFFFF - np.asarray(total, dtype=np.int64)) % 0xFFFF
+
+
+class PacketTemplate(object):
+    """Compiled header stack, which packets are created from."""
+
+    def __init__(self, *layers, pkt_len=None):
+        """Compile header stack.
+
+        'pkt_len' is the default packet length (excluding FCS), which is used
+        if no per-packet lengths are provided when packets are built. It
+        defaults to the minimum Ethernet frame length (60 bytes) or the header
+        length, if the headers are longer.
+        """
+        self.layers = list(layers)
+        for lower, upper in zip(self.layers[:-1], self.layers[1:]):
+            lower.bind(upper)
+
+        # absolute byte offset of each layer and each field. fields are
+        # identified by '<layer name>.<field name>'
+        self.offsets = {}
+        self.fields = {}
+        offset = 0
+        for layer in self.layers:
+            self.offsets[layer.name] = offset
+            for field, (off, width, mask) in layer.fields.items():
+                self.fields["%s.%s" % (layer.name, field)] = \
+                    (offset + off, width, mask, layer)
+            offset += layer.length
+        self.hdr_len = offset
+
+        if pkt_len is None:
+            pkt_len = max(PKT_LEN_MIN, self.hdr_len)
+        if pkt_len < self.hdr_len:
+            raise ValueError("packet length is shorter than headers")
+        self.pkt_len = pkt_len
+
+        self._l3 = next((l for l in self.layers
+                         if isinstance(l, (IPv4, IPv6))), None)
+        self._l4 = next((l for l in self.layers
+                         if isinstance(l, (UDP, TCP))), None)
+
+        # assemble header bytes
+        hdr = np.zeros(self.hdr_len, dtype=np.uint8)
+        for layer in self.layers:
+            for field, value in layer.values.items():
+                self._set_scalar(hdr, "%s.%s" % (layer.name, field), value)
+        for field, value in self._length_fields(pkt_len).items():
+            self._set_scalar(hdr, field, value)
+
+        # calculate checksums of the template. patched packets only add the
+        # difference of modified words to these sums
+        self._chksums = []
+        if isinstance(self._l3, IPv4):
+            off = self.offsets['ipv4']
+            self._chksums.append(('ipv4.chksum', [(off, off + 20)], False))
+        if self._l4 is not None and self._l3 is not None:
+            off_l3 = self.offsets[self._l3.name]
+            off_l4 = self.offsets[self._l4.name]
+            if isinstance(self._l3, IPv4):
+                pseudo = [(off_l3 + 12, off_l3 + 20)]
+            else:
+                pseudo = [(off_l3 + 8, off_l3 + 40)]
+            self._chksums.append(('%s.chksum' % self._l4.name,
+                                  pseudo + [(off_l4, self.hdr_len)], True))
+
+        self._chksum_base = []
+        for field, regions, pseudo in self._chksums:
+            self._set_scalar(hdr, field, 0)
+            total = sum(int(ones_complement_sum(self._words(hdr, a, b)))
+                        for a, b in regions)
+            if pseudo:
+                total += int(self._pseudo_words(np.asarray([pkt_len]))[0])
+            self._chksum_base.append(total % 0xFFFF)
+            self._set_scalar(hdr, field, self._l4_chksum(
+                field, checksum_from_sum(total % 0xFFFF)))
+
+        self.header = hdr
+
+    def build(self, n, fields=None, pkt_len=None, width=None):
+        """Build a batch of 'n' packets.
+
+        'fields' maps field names (e.g. 'ipv4.src') to per-packet values: a
+        scalar, an integer array with one value per packet or a uint8 array of
+        shape (n, field width). 'pkt_len' optionally provides per-packet
+        lengths; length fields and checksums are adjusted accordingly. Returns
+        a 2D uint8 array containing the packet data (one row per packet,
+        'width' bytes wide, defaults to the header length; remaining bytes are
+        zero payload) and the array of wire lengths.
+        """
+        if fields is None:
+            fields = {}
+        if width is None:
+            width = self.hdr_len
+
+        if pkt_len is None:
+            len_wire = np.full(n, self.pkt_len, dtype=np.int64)
+        else:
+            len_wire = np.broadcast_to(np.asarray(pkt_len, dtype=np.int64),
+                                       (n,))
+            if np.any(len_wire < self.hdr_len):
+                raise ValueError("packet length is shorter than headers")
+            fields = dict(fields)
+            fields.update(self._length_fields(len_wire))
+
+        data = np.zeros((n, max(width, self.hdr_len)), dtype=np.uint8)
+        data[:, :self.hdr_len] = self.header
+
+        # patch fields and remember which bytes have been modified
+        patched = np.zeros(self.hdr_len, dtype=bool)
+        for field, value in fields.items():
+            if field not in self.fields:
+                raise ValueError("unknown field '%s'" % field)
+            if field.endswith(".chksum"):
+                raise ValueError("checksums are calculated automatically")
+            off, width_field, mask, layer = self.fields[field]
+            values = self._field_values(field, value, n)
+            if mask is not None:
+                # merge into the current bytes, which may hold other fields
+                # sharing these bytes (e.g. ipv6.tc and ipv6.flow)
+                cur = self._bytes_to_int(data[:, off:off + width_field])
+                keep = ~mask & ((1 << (8 * width_field)) - 1)
+                shift = np.uint64(self._mask_shift(mask))
+                values = self._int_to_bytes(
+                    ((cur & np.uint64(keep)) |
+                     ((self._bytes_to_int(values) << shift) &
+                      np.uint64(mask))), width_field)
+            data[:, off:off + width_field] = values
+            patched[off:off + width_field] = True
+
+        # incrementally update checksums: add the differences of all 16 bit
+        # words that contain patched bytes
+        for (field, regions, pseudo), base in zip(self._chksums,
+                                                  self._chksum_base):
+            total = np.full(n, base, dtype=np.int64)
+            for a, b in regions:
+                words = np.nonzero(patched[a:b].reshape(-1, 2).any(axis=1))[0]
+                cols = (a + 2 * words)[:, None] + np.arange(2)
+                if cols.size == 0:
+                    continue
+                new = data[:, cols.reshape(-1)].astype(np.int64) \
+                    .reshape(n, -1, 2)
+                old = self.header[cols].astype(np.int64)
+                total += ones_complement_sum((new[..., 0] << 8) | new[..., 1])
+                total -= ones_complement_sum((old[:, 0] << 8) | old[:, 1])
+            if pseudo and pkt_len is not None:
+                total += self._pseudo_words(len_wire) - \
+                    self._pseudo_words(np.asarray([self.pkt_len]))
+            off, _, _, _ = self.fields[field]
+            chksum = self._l4_chksum(field, checksum_from_sum(total % 0xFFFF))
+            data[:, off] = chksum >> 8
+            data[:, off + 1] = chksum & 0xFF
+
+        if width < self.hdr_len:
+            data = data[:, :width]
+        return data, len_wire
+
+    def _length_fields(self, pkt_len):
+        """Return the values of length fields for given packet lengths."""
+        lengths = {}
+        if isinstance(self._l3, IPv4):
+            lengths['ipv4.len'] = pkt_len - self.offsets['ipv4']
+        elif isinstance(self._l3, IPv6):
+            lengths['ipv6.plen'] = pkt_len - self.offsets['ipv6'] - 40
+        if isinstance(self._l4, UDP):
+            lengths['udp.len'] = pkt_len - self.offsets['udp']
+        return lengths
+
+    def _pseudo_words(self, pkt_len):
+        """Return sum of pseudo header words not contained in the headers.
+
+        The pseudo header of the UDP/TCP checksum contains the IP addresses
+        (part of the IP header) as well as the protocol number and the L4
+        length.
+        """
+        if self._l4 is None or self._l3 is None:
+            return np.zeros(len(pkt_len), dtype=np.int64)
+        l4_len = np.asarray(pkt_len, dtype=np.int64) - \
+            self.offsets[self._l4.name]
+        proto = IP_PROTO_UDP if isinstance(self._l4, UDP) else IP_PROTO_TCP
+        return (proto + (l4_len >> 16) + (l4_len & 0xFFFF)) % 0xFFFF
+
+    def _l4_chksum(self, field, chksum):
+        """Map a zero UDP checksum to 0xFFFF (zero means no checksum)."""
+        if field == "udp.chksum":
+            return np.where(chksum == 0, 0xFFFF, chksum)
+        return chksum
+
+    @staticmethod
+    def _words(hdr, a, b):
+        """Return big endian 16 bit words of a header byte region."""
+        region = hdr[a:b].astype(np.int64)
+        return (region[0::2] << 8) | region[1::2]
+
+    def _set_scalar(self, hdr, field, value):
+        """Set a field in a single header to a scalar value."""
+        off, width, mask, layer = self.fields[field]
+        raw = np.frombuffer(layer.field_bytes(field.split(".")[1], value),
+                            dtype=np.uint8)
+        if mask is not None:
+            tmpl = int.from_bytes(hdr[off:off + width].tobytes(), "big")
+            new = int.from_bytes(raw.tobytes(), "big") << \
+                self._mask_shift(mask)
+            raw = np.frombuffer(((tmpl & ~mask) | (new & mask))
+                                .to_bytes(width, "big"), dtype=np.uint8)
+        hdr[off:off + width] = raw
+
+    def _field_values(self, field, value, n):
+        """Convert field values to a uint8 array of shape (n, field width)."""
+        off, width, mask, layer = self.fields[field]
+        if isinstance(value, (str, bytes, bytearray, int, np.integer)):
+            raw = np.frombuffer(layer.field_bytes(field.split(".")[1], value),
+                                dtype=np.uint8)
+            return np.broadcast_to(raw, (n, width))
+        value = np.asarray(value)
+        if value.ndim == 2:
+            if value.shape != (n, width) or value.dtype != np.uint8:
+                raise ValueError("field '%s' must have shape (%d, %d)" %
+                                 (field, n, width))
+            return value
+        if width > 8:
+            raise ValueError("values of field '%s' must be provided as bytes" %
+                             field)
+        return self._int_to_bytes(np.broadcast_to(value, (n,)), width)
+
+    @staticmethod
+    def _mask_shift(mask):
+        """Return the bit position of the least significant bit of a mask."""
+        return (mask & -mask).bit_length() - 1
+
+    @staticmethod
+    def _int_to_bytes(values, width):
+        """Convert integers to big endian bytes (one row per value)."""
+        values = np.asarray(values).astype(np.uint64)
+        shifts = np.arange(8 * (width - 1), -1, -8, dtype=np.uint64)
+        return ((values[:, None] >> shifts) & np.uint64(0xFF)) \
+            .astype(np.uint8)
+
+    @staticmethod
+    def _bytes_to_int(values):
+        """Convert big endian bytes (one row per value) to integers."""
+        shifts = np.arange(8 * (values.shape[1] - 1), -1, -8, dtype=np.uint64)
+        return np.bitwise_or.reduce(values.astype(np.uint64) << shifts,
+                                    axis=1)
@@ -0,0 +1,192 @@
+"""Drift-free quantization of packet transmission times to clock cycles."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Converts absolute packet transmission times to delta_t values (clock cycles
+# until the next packet is transmitted). Absolute (not relative) times are
+# rounded to clock cycles and the delta_t values are the differences of the
+# rounded times. Thus, rounding errors do not accumulate: the quantized time of
+# each packet deviates from its target time by at most half a clock cycle and
+# the long-run packet rate is exact.
+#
+# Times are given either as (float) clock cycles or as integer nanoseconds.
+# Nanosecond timestamps are converted exactly with integer arithmetic (one
+# clock cycle is 6.4 ns, i.e. 5/32 clock cycles per nanosecond).
+#
+# In compatibility mode, nanosecond timestamps are quantized exactly like
+# pcap_import does. pcap_import converts the time difference of consecutive
+# packets to (float) clock cycles and rounds it up, if the accumulated rounding
+# error is smaller than one cycle, otherwise it rounds down. Rounding the
+# differences up and down this way is equivalent to rounding up the running sum
+# of their fractional parts (see _compat()), which is computed without a
+# sequential loop. pcap_import's accumulated error stays within (-1, 2) cycles.
+#
+# A Quantizer keeps its state between calls, so that the transmission times of
+# a trace can be quantized in batches.
+
+import numpy as np
+
+# clock cycles per nanosecond (156.25 MHz): 5/32
+CYCLES_PER_NS_NUM = 5
+CYCLES_PER_NS_DEN = 32
+
+# fractional parts of compatibility mode cycle values are fixed point numbers
+# with this number of fractional bits
+FRAC_BITS = 32
+
+
+class Quantizer(object):
+    """Converts batches of absolute transmission times to delta_t values.
+
+    The first time passed to the quantizer is the reference time. Each
+    subsequent time produces the delta_t between the previous and this time,
+    i.e. a batch of n times results in n delta_t values (n - 1 for the first
+    batch). 'err_max' holds the maximum absolute deviation (clock cycles) of
+    quantized times from their target times.
+    """
+
+    def __init__(self, compat=False):
+        """Initialize quantizer.
+
+        If 'compat' is True, nanosecond timestamps are quantized like
+        pcap_import does.
+        """
+        self.compat = compat
+        self.err_max = 0.0
+
+        # reference time, previous target time and previous quantized time
+        # (relative to the reference time)
+        self._ref = None
+        self._t_prev = None
+        self._q_prev = 0
+
+        # compatibility mode: sum of the fractional parts of all non-integer
+        # cycle differences (fixed point) and the number of rounded up ones
+        self._frac_sum = 0
+        self._n_up = 0
+
+    def cycles(self, t):
+        """Quantize absolute target times given in (float) clock cycles."""
+        if self.compat:
+            raise ValueError("compatibility mode requires nanosecond times")
+        t = np.asarray(t, dtype=np.float64).reshape(-1)
+        t, ref = self._reference(t)
+        if t.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        t_rel = t - ref
+        q = np.rint(t_rel).astype(np.int64)
+        self._update_err(np.abs(q - t_rel).max())
+        return self._deltas(q)
+
+    def ns(self, t_ns):
+        """Quantize absolute target times given in integer nanoseconds."""
+        t_ns = np.asarray(t_ns, dtype=np.int64).reshape(-1)
+        t_ns, ref = self._reference(t_ns)
+        if t_ns.size == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        if self.compat:
+            prev = np.concatenate(([self._t_prev], t_ns[:-1]))
+            delta_t, err = self._compat(t_ns - prev)
+            self._t_prev = int(t_ns[-1])
+            self._update_err(err)
+            return delta_t
+
+        # round half up: floor((5 * t + 16) / 32)
+        num = (t_ns - ref) * CYCLES_PER_NS_NUM
+        q = (num + CYCLES_PER_NS_DEN // 2) // CYCLES_PER_NS_DEN
+        self._update_err(np.abs(q * CYCLES_PER_NS_DEN - num).max() /
+                         CYCLES_PER_NS_DEN)
+        return self._deltas(q)
+
+    def _reference(self, t):
+        """Use the first time of the first batch as reference time."""
+        if self._t_prev is None:
+            if t.size == 0:
+                return t, None
+            self._ref = t[0]
+            self._t_prev = t[0]
+            t = t[1:]
+        return t, self._ref
+
+    def _deltas(self, q):
+        """Return differences of quantized times and remember the last one."""
+        delta_t = np.diff(q, prepend=self._q_prev)
+        self._q_prev = int(q[-1])
+        return delta_t
+
+    def _update_err(self, err):
+        """Update the maximum timing error."""
+        self.err_max = max(self.err_max, float(err))
+
+    def _compat(self, diff_ns):
+        """Quantize time differences like pcap_import.
+
+        pcap_import keeps the accumulated rounding error e (rounded minus exact
+        cycles) and rounds a non-integer cycle difference x up if e < 1, else
+        down. If u is the number of differences rounded up so far and F the sum
+        of the fractional parts of all preceding non-integer differences, then
+        e = u - F, so x is rounded up if u < F + 1. Since F grows by less than
+        one per difference, this greedy rule keeps u = ceil(F + 1) after every
+        non-integer difference.
+        """
+        # same floating point operations as pcap_import (exact for all
+        # practical time differences)
+        x = diff_ns.astype(np.float64) * 156.25e6 / 1e9
+        x_floor = np.floor(x)
+        frac = np.rint((x - x_floor) * (1 << FRAC_BITS)).astype(np.int64)
+        nonint = frac > 0
+
+        # sum of fractional parts before each difference
+        frac_sum = self._frac_sum + np.cumsum(frac) - frac
+        one = 1 << FRAC_BITS
+        n_up = np.where(nonint, -(-frac_sum // one) + 1, 0)
+        n_up = np.maximum.accumulate(np.maximum(n_up, self._n_up))
+
+        delta_t = x_floor.astype(np.int64) + np.diff(n_up, prepend=self._n_up)
+
+        # accumulated rounding error after each difference
+        frac_sum_after = frac_sum + frac
+        err = np.abs(n_up * one - frac_sum_after).max() / one
+
+        self._frac_sum = int(frac_sum_after[-1])
+        self._n_up = int(n_up[-1])
+        return delta_t, err
+
+
+def quantize_cycles(t):
+    """Quantize absolute times (clock cycles). Returns (delta_t, err_max)."""
+    q = Quantizer()
+    delta_t = q.cycles(t)
+    return delta_t, q.err_max
+
+
+def quantize_ns(t_ns, compat=False):
+    """Quantize absolute times (nanoseconds). Returns (delta_t, err_max)."""
+    q = Quantizer(compat)
+    delta_t = q.ns(t_ns)
+    return delta_t, q.err_max
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Plan the replay of traces: memory footprint, upload time and duration."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Calculates, before a measurement, how a trace is replayed by the hardware:
+# the size of the encoded trace, whether it fits into the DDR3 ring buffer of
+# an interface, how long it takes to upload it via PCIe and how long the
+# replay lasts. The trace is described either by generator parameters (packet
+# size distribution, snap length, data or packet rate and duration), in which
+# case all values are calculated analytically, or by an existing trace or PCAP
+# file, whose records are evaluated in a single vectorized pass.
+#
+# Each interface replays its trace from a ring buffer in DDR3 memory (the two
+# 4 GiB DDR3 memories are shared by the interfaces), which the host fills via
+# PCIe while the replay is running. A trace that fits into the ring buffer
+# (with all its repetitions) is uploaded before the replay starts. Otherwise,
+# the ring buffer is filled before the replay starts and refilled during the
+# replay. If the data rate at which the interfaces consume trace data exceeds
+# the PCIe throughput, the ring buffer runs empty after some time.
+
+import argparse
+import json
+import os
+import numpy as np
+import pcap_reader
+import trace_index
+import trace_rescale
+import trace_writer
+from traffic_models import FixedSize, ImixSize, UniformSize
+
+# DDR3 memory of the NetFPGA-SUME board (two 4 GiB SODIMMs)
+DDR3_SIZE = 2 * (4 << 30)
+
+# number of network interfaces
+N_INTERFACES = 4
+
+# maximum ring buffer size of an interface (32 bit address offsets)
+RING_SIZE_MAX = 4 << 30
+
+# ring buffer addresses and sizes must be aligned to 512 bits
+RING_ALIGNMENT = 64
+
+# PCIe Gen3 x8: 8 GT/s per lane, 128b/130b encoding
+PCIE_LANES = 8
+PCIE_THROUGHPUT = PCIE_LANES * 8e9 * 128 / 130 / 8
+
+# maximum payload size of PCIe TLPs in bytes
+PCIE_MAX_PAYLOAD = 256
+
+# per-TLP overhead in bytes (PCIe Gen3: framing, sequence number, 16 byte
+# header with 64 bit address and LCRC)
+PCIE_TLP_OVERHEAD = 24
+
+
+def pcie_bytes(size):
+    """Return the number of bytes transferred via PCIe for 'size' bytes."""
+    n_tlps = -(-size // PCIE_MAX_PAYLOAD)
+    return size + n_tlps * PCIE_TLP_OVERHEAD
+
+
+def ring_size(n_interfaces=N_INTERFACES):
+    """Return the default ring buffer size when DDR3 memory is shared."""
+    size = min(DDR3_SIZE // n_interfaces, RING_SIZE_MAX)
+    return size - size % RING_ALIGNMENT
+
+
+def record_bytes(len_snap):
+    """Return the encoded size of packet records (meta data word and data)."""
+    return 8 + 8 * ((np.asarray(len_snap, dtype=np.int64) + 7) // 8)
+
+
+class Plan(object):
+    """Replay plan of a trace.
+
+    'n_pkts' and 'size' are the number of packets and the encoded size (bytes,
+    including the trace padding) of one pass of the trace, 'duration' its
+    duration in clock cycles (n_pkts and size may be fractional when
+    calculated analytically).
+    """
+
+    def __init__(self, n_pkts, size, duration, repeat=1,
+                 n_interfaces=N_INTERFACES, ring=None):
+        """Calculate plan."""
+        if ring is None:
+            ring = ring_size(n_interfaces)
+        self.n_pkts = n_pkts
+        self.size = size
+        self.duration = duration
+        self.repeat = repeat
+        self.n_interfaces = n_interfaces
+        self.ring = ring
+
+        self.total_size = size * repeat
+        self.duration_s = duration / trace_writer.CLK_FREQ
+        self.total_duration_s = self.duration_s * repeat
+
+        # data rate at which an interface reads trace data
+        self.read_rate = size / max(self.duration_s, 1e-12)
+
+        # ring buffer usage and the number of passes fitting into it
+        self.fits = self.total_size <= ring
+        self.footprint = min(self.total_size, ring)
+        self.footprint += -self.footprint % RING_ALIGNMENT
+        self.passes_in_ring = int(ring // size) if size > 0 else 0
+
+        # upload of the initial ring buffer content and of the whole trace
+        # (all interfaces share the PCIe link)
+        self.upload_initial_s = pcie_bytes(self.footprint) * n_interfaces / \
+            PCIE_THROUGHPUT
+        self.upload_total_s = pcie_bytes(self.total_size) * n_interfaces / \
+            PCIE_THROUGHPUT
+
+        # streaming: the ring buffer drains if the interfaces read faster
+        # than the host can refill it
+        supply = PCIE_THROUGHPUT / n_interfaces * size / \
+            max(pcie_bytes(size), 1)
+        self.pcie_load = self.read_rate / supply
+        if self.fits or self.read_rate <= supply:
+            self.max_duration_s = float("inf")
+        else:
+            self.max_duration_s = ring / (self.read_rate - supply)
+        self.max_passes = float("inf") if self.max_duration_s == \
+            float("inf") else int(self.max_duration_s // self.duration_s)
+
+    def dict(self):
+        """Return the plan as dictionary."""
+        keys = ['n_pkts', 'size', 'duration_s', 'repeat', 'n_interfaces',
+                'ring', 'total_size', 'total_duration_s', 'read_rate', 'fits',
+                'footprint', 'passes_in_ring', 'upload_initial_s',
+                'upload_total_s', 'pcie_load', 'max_duration_s',
+                'max_passes']
+        # unlimited durations are represented as None
+        return {k: None if getattr(self, k) == float("inf") else
+                getattr(self, k) for k in keys}
+
+    def text(self):
+        """Return the plan as human-readable text."""
+        lines = [
+            "packets: %d" % round(self.n_pkts),
+            "encoded size: %d bytes (%.3f MiB)" % (self.size,
+                                                  self.size / 2.0**20),
+            "duration: %.6f s (%.0f clock cycles)" % (self.duration_s,
+                                                      self.duration),
+            "repetitions: %d -> %d bytes, %.6f s" % (
+                self.repeat, self.total_size, self.total_duration_s),
+            "ring buffer: %d bytes per interface (%d interfaces)" % (
+                self.ring, self.n_interfaces),
+            "DDR3 footprint: %d bytes per interface, %d bytes total" % (
+                self.footprint, self.footprint * self.n_interfaces),
+            "fits into ring buffer: %s (%d passes)" % (
+                "yes" if self.fits else "no", self.passes_in_ring),
+            "PCIe upload: %.3f s before replay, %.3f s total" % (
+                self.upload_initial_s, self.upload_total_s),
+            "trace data rate: %.3f Gbps per interface, PCIe load %.1f %%" % (
+                8 * self.read_rate / 1e9, 100.0 * self.pcie_load),
+        ]
+        if self.max_duration_s != float("inf"):
+            lines.append("WARNING: ring buffer runs empty after %.3f s "
+                         "(%d passes)" % (self.max_duration_s,
+                                          self.max_passes))
+        return "\n".join(lines)
+
+
+def _padded(size):
+    """Return the size of a trace including its padding."""
+    return size + (-size % trace_writer.TRACE_ALIGNMENT)
+
+
+def plan_params(size_model, duration=None, n_pkts=None, datarate=None,
+                pkt_rate=None, len_snap=None, **kwargs):
+    """Plan the replay of a trace described by generator parameters.
+
+    'size_model' is a packet size model (see traffic_models.py). The trace
+    length is given by its 'duration' (seconds) or number of packets
+    'n_pkts', its rate as data rate 'datarate' (bps, including Ethernet
+    overhead) or packet rate 'pkt_rate' (packets/second). Packet data is
+    truncated to 'len_snap' bytes, if given. Further keyword arguments are
+    passed on to Plan.
+    """
+    sizes, p = size_model.pmf()
+    sizes = np.clip(sizes, 0, trace_writer.PKT_SIZE_MAX)
+    snap = sizes if len_snap is None else np.minimum(sizes, len_snap)
+    bytes_mean = float(np.sum(p * record_bytes(snap)))
+    wire_mean = float(np.sum(p * sizes))
+
+    if (datarate is None) == (pkt_rate is None):
+        raise ValueError("either data rate or packet rate must be given")
+    if pkt_rate is None:
+        pkt_rate = datarate / (8.0 * (wire_mean + trace_writer.ETH_OVERHEAD))
+    if (duration is None) == (n_pkts is None):
+        raise ValueError("either duration or number of packets must be given")
+    if n_pkts is None:
+        n_pkts = duration * pkt_rate
+    duration = n_pkts / pkt_rate * trace_writer.CLK_FREQ
+    return Plan(n_pkts, _padded(int(np.ceil(n_pkts * bytes_mean))), duration,
+                **kwargs)
+
+
+def plan_file(filename, len_snap=None, **kwargs):
+    """Plan the replay of an existing trace or PCAP file.
+
+    PCAP files are planned as converted by pcap_import. If 'len_snap' is
+    given, packet data is truncated to 'len_snap' bytes. Further keyword
+    arguments are passed on to Plan.
+    """
+    if trace_rescale.is_pcap(filename):
+        pcap = pcap_reader.PcapFile(filename)
+        snap = pcap.caplen
+        ts_ns = pcap.ts_ns
+        duration = (ts_ns[-1] - ts_ns[0]) * trace_writer.CLK_FREQ / 1e9 + \
+            trace_writer.DELTA_T_LAST if pcap.n_pkts > 0 else 0
+    else:
+        idx = trace_index.load(filename)
+        duration = idx.duration(0, idx.n_pkts)
+        if len_snap is None:
+            return Plan(idx.n_pkts, os.path.getsize(filename), duration,
+                        **kwargs)
+        offsets = np.asarray(idx.offsets)
+        snap = (np.diff(offsets) - 8)
+    if len_snap is not None:
+        snap = np.minimum(snap, len_snap)
+    return Plan(len(snap), _padded(int(record_bytes(snap).sum())), duration,
+                **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calculate the replay memory footprint, PCIe upload " +
+        "time and replay duration of a trace.")
+    parser.add_argument("trace", nargs="?",
+                        help="existing trace or PCAP file (default: plan " +
+                        "from generator parameters)")
+    parser.add_argument("--pktlen", type=int,
+                        help="packet length in bytes, excluding FCS")
+    parser.add_argument("--imix", action="store_true",
+                        help="IMIX packet sizes")
+    parser.add_argument("--uniform", action="store_true",
+                        help="uniformly distributed packet sizes")
+    parser.add_argument("--snaplen", type=int,
+                        help="snap length in bytes (default: wire length)")
+    parser.add_argument("--datarate", type=float,
+                        help="data rate in bits/second, including Ethernet " +
+                        "overheads (default: 10e9)")
+    parser.add_argument("--rate", type=float,
+                        help="packet rate in packets/second")
+    parser.add_argument("--duration", type=float,
+                        help="trace duration in seconds (default: 0.1)")
+    parser.add_argument("--n-pkts", type=float, help="number of packets")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="number of repetitions (default: 1)")
+    parser.add_argument("--interfaces", type=int, default=N_INTERFACES,
+                        help="number of replaying interfaces (default: %d)" %
+                        N_INTERFACES)
+    parser.add_argument("--ring-size", type=int,
+                        help="ring buffer size per interface in bytes " +
+                        "(default: DDR3 memory shared by the interfaces)")
+    parser.add_argument("--json", action="store_true",
+                        help="print plan in JSON format")
+    args = parser.parse_args()
+
+    kwargs = {'repeat': args.repeat, 'n_interfaces': args.interfaces,
+              'ring': args.ring_size}
+    if args.trace is not None:
+        plan = plan_file(args.trace, args.snaplen, **kwargs)
+    else:
+        if args.imix:
+            size_model = ImixSize()
+        elif args.uniform:
+            size_model = UniformSize()
+        else:
+            size_model = FixedSize(60 if args.pktlen is None else
+                                   args.pktlen)
+        if args.datarate is None and args.rate is None:
+            args.datarate = trace_writer.MAX_DATARATE
+        if args.duration is None and args.n_pkts is None:
+            args.duration = 0.1
+        plan = plan_params(size_model, args.duration, args.n_pkts,
+                           args.datarate, args.rate, args.snaplen, **kwargs)
+
+    print(json.dumps(plan.dict(), indent=2) if args.json else plan.text())
+
+
+if __name__ == "__main__":
+    main()
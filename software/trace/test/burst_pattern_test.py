@@ -0,0 +1,140 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Writes burst traces and checks the quantized packet times against the exact
+# burst pattern.
+
+import numpy as np
+import pytest
+import burst_pattern
+import trace_reader
+import trace_writer
+from burst_pattern import BurstPattern, PortTrace, CYCLES_PER_BYTE
+from pkt_template import PacketTemplate, Ether, IPv4, UDP
+
+N_BURSTS = 50
+
+
+def read(filename):
+    """Return the transmission times and data of a trace's packets."""
+    data = trace_reader.open_trace(filename)
+    w = trace_reader.words(data)
+    offsets = trace_reader.record_offsets(w)
+    delta_t = trace_reader.delta_t(w[offsets])
+    return np.cumsum(delta_t) - delta_t, int(delta_t.sum()), \
+        [data[8 * off + 8:8 * off + 14].tobytes() for off in offsets]
+
+
+@pytest.fixture
+def tmpl():
+    return PacketTemplate(Ether(), IPv4(), UDP(), pkt_len=60)
+
+
+def test_times():
+    # 60 byte packets take 84 bytes (10.5 clock cycles) at 10 Gbps
+    pattern = BurstPattern(4, idle=1e-6)
+    assert pattern.spacing == 10.5
+    assert pattern.period == 4 * 10.5 + 156.25
+    t = pattern.times(1, 2, phase=2.0)
+    assert t.tolist() == [2.0 + j * pattern.period + k * 10.5
+                          for j in (1, 2) for k in range(4)]
+
+    # the interpacket gap includes the 12 byte minimum
+    assert BurstPattern(4, pkt_len=100, ipg=20).spacing == \
+        (100 + 24 + 8) * CYCLES_PER_BYTE
+
+
+@pytest.mark.parametrize("batch_size", [burst_pattern.BATCH_SIZE, 10])
+def test_write(tmp_path, tmpl, batch_size):
+    pattern = BurstPattern(16, idle=1e-6)
+    filename = str(tmp_path / "a.trace")
+    n = PortTrace(pattern, tmpl).write(filename, N_BURSTS,
+                                       np.random.default_rng(0), batch_size)
+    assert n == 16 * N_BURSTS
+
+    # quantized times deviate by at most half a clock cycle, back-to-back
+    # packets alternate between 10 and 11 clock cycles
+    t, duration, _ = read(filename)
+    exact = pattern.times(0, N_BURSTS)
+    assert np.all(np.abs(t - exact) <= 0.5)
+    assert set(np.diff(t.reshape(N_BURSTS, 16), axis=1).reshape(-1)) == \
+        {10, 11}
+    assert duration == round(N_BURSTS * pattern.period)
+
+
+def test_phase(tmp_path, tmpl):
+    pattern = BurstPattern(8, idle=1e-6)
+    filename = str(tmp_path / "a.trace")
+    port = PortTrace(pattern, tmpl, phase=0.5e-6)
+    n = port.write(filename, N_BURSTS, np.random.default_rng(0))
+    assert n == 8 * N_BURSTS + 1
+
+    # the lead-in packet delays the first burst by the phase offset
+    t, duration, dst = read(filename)
+    lead_in = bytes.fromhex(burst_pattern.LEAD_IN_DST.replace(":", ""))
+    assert dst[0] == lead_in and lead_in not in dst[1:]
+    assert np.all(np.abs(t[1:] - pattern.times(0, N_BURSTS, port.phase))
+                  <= 0.5)
+    assert duration == round(N_BURSTS * pattern.period)
+
+    with pytest.raises(ValueError):
+        PortTrace(pattern, tmpl, phase=1e-9)
+    with pytest.raises(ValueError):
+        PortTrace(pattern, tmpl, phase=pattern.period /
+                  trace_writer.CLK_FREQ - 1e-9)
+
+
+def test_jitter(tmp_path, tmpl):
+    pattern = BurstPattern(8, idle=2e-6, jitter=1e-6)
+    filename = str(tmp_path / "a.trace")
+    PortTrace(pattern, tmpl).write(filename, N_BURSTS,
+                                   np.random.default_rng(0))
+
+    # bursts start within [start, start + jitter), the trace length is not
+    # affected
+    t, duration, _ = read(filename)
+    delay = t[::8] - np.arange(N_BURSTS) * pattern.period
+    assert delay[0] == 0
+    assert np.all((delay >= -0.5) & (delay < pattern.jitter + 0.5))
+    assert len(np.unique(delay)) > N_BURSTS // 2
+    assert duration == round(N_BURSTS * pattern.period)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {'burst_size': 0}, {'burst_size': 1, 'ipg': 11},
+    {'burst_size': 1, 'idle': 1e-6, 'jitter': 2e-6}])
+def test_invalid(kwargs):
+    with pytest.raises(ValueError):
+        BurstPattern(**kwargs)
+
+
+def test_port_filename():
+    assert burst_pattern.port_filename("a.trace", 2) == "a_2.trace"
+    assert burst_pattern.port_filename("p{port}/a.trace", 1) == "p1/a.trace"
@@ -0,0 +1,130 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Builds flow workloads and checks that all packets of a flow share their
+# header fields and that the per-flow counters continue across batches.
+
+import numpy as np
+import pytest
+import trace_writer
+from flow_workload import ZipfPopularity, EmpiricalPopularity, FlowTable, \
+    FlowWorkload
+from pkt_template import PacketTemplate, Ether, IPv4, IPv6, UDP, TCP
+from traffic_models import TrafficModel, PoissonIAT, FixedSize
+
+
+def test_popularity():
+    rng = np.random.default_rng(0)
+    slot = ZipfPopularity(100).draw(100000, rng)
+    assert slot.min() >= 0 and slot.max() < 100
+    counts = np.bincount(slot, minlength=100)
+    assert counts.argmax() == 0 and counts[0] > 2 * counts[1] * 0.9
+
+    slot = EmpiricalPopularity([0, 1, 0, 3]).draw(10000, rng)
+    assert set(slot.tolist()) == {1, 3}
+
+
+def test_generations():
+    rng = np.random.default_rng(0)
+    flows = FlowTable(10, rng)
+    slot = np.arange(10)
+    assert np.all(flows.generations(slot, slot * 10 ** 9) == 0)
+
+    flows = FlowTable(10, rng, duration_mean=1e-3)
+    t = np.full(10, 10 ** 7)
+    gen = flows.generations(slot, t)
+    start = flows.phase + gen * flows.duration
+    assert np.all((start <= t) & (t < start + flows.duration))
+
+
+def test_count():
+    flows = FlowTable(2, np.random.default_rng(0))
+    slot = np.asarray([0, 1, 0, 0])
+    gen = np.zeros(4, dtype=np.int64)
+    n_pkts, n_bytes = flows.count(slot, gen, [10, 20, 30, 40])
+    assert n_pkts.tolist() == [0, 0, 1, 2]
+    assert n_bytes.tolist() == [0, 0, 10, 40]
+
+    # counters continue with the same flow and restart with a new generation
+    n_pkts, n_bytes = flows.count(np.asarray([0, 1]), np.asarray([0, 1]),
+                                  [5, 5])
+    assert n_pkts.tolist() == [3, 0]
+    assert n_bytes.tolist() == [80, 0]
+
+
+def _fields(data, ipv6, tcp):
+    """Return flow key, per-packet counter and flow label of packets."""
+    if ipv6:
+        key = data[:, 22:58]
+        label = data[:, 14:18].copy().view('>u4').reshape(-1) & 0xFFFFF
+        counter = data[:, 58:62].copy().view('>u4').reshape(-1) \
+            if tcp else None
+    else:
+        key = data[:, 26:38]
+        label = None
+        counter = data[:, 38:42].copy().view('>u4').reshape(-1) if tcp \
+            else data[:, 18:20].copy().view('>u2').reshape(-1)
+    return key, counter, label
+
+
+@pytest.mark.parametrize("ipv6", [False, True])
+@pytest.mark.parametrize("tcp", [False, True])
+def test_workload(ipv6, tcp):
+    rng = np.random.default_rng(0)
+    tmpl = PacketTemplate(Ether(), IPv6() if ipv6 else IPv4(),
+                          TCP() if tcp else UDP(),
+                          pkt_len=trace_writer.PKT_SIZE_MAX)
+    bases = ("fd00::", "fd00:1::") if ipv6 else ("10.0.0.0", "10.128.0.0")
+    flows = FlowTable(50, rng, *bases, duration_mean=20e-6)
+    workload = FlowWorkload(tmpl, flows, ZipfPopularity(50))
+    model = TrafficModel(PoissonIAT(10e6), FixedSize(100))
+    batches = workload.batches(model, rng, batch_size=1000)
+    data = np.concatenate([next(batches)[2][:, :100] for _ in range(3)])
+
+    key, counter, label = _fields(data, ipv6, tcp)
+    _, flow, inv = np.unique(key, axis=0, return_index=True,
+                             return_inverse=True)
+    inv = inv.reshape(-1)
+    # flows stop and restart with new source ports
+    assert 50 < len(flow) < len(data)
+    for i in range(len(flow)):
+        pkts = np.flatnonzero(inv == i)
+        if ipv6:
+            assert np.all(label[pkts] == label[pkts[0]])
+        if counter is not None:
+            step = 100 - tmpl.hdr_len if tcp else 1
+            assert np.all(np.diff(counter[pkts].astype(np.int64)) == step)
+
+
+def test_template():
+    rng = np.random.default_rng(0)
+    with pytest.raises(ValueError):
+        FlowWorkload(PacketTemplate(Ether(), IPv4()), FlowTable(1, rng),
+                     ZipfPopularity(1))
@@ -0,0 +1,97 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Builds probes in both timestamp modes, writes a probe trace and matches its
+# packets with the sent probes via the sidecar file.
+
+import numpy as np
+import pytest
+import latency_probe
+import trace_reader
+from latency_probe import ProbeWorkload, TimestampFormat, MODE_FIXED, \
+    MODE_HEADER
+from pkt_template import Ether, IPv4, IPv6, UDP, ETH_TYPE_IPV4
+from traffic_models import TrafficModel, ConstantIAT, FixedSize
+
+
+def test_fixed_mode():
+    fmt = TimestampFormat(MODE_FIXED, 14, 16)
+    wl = ProbeWorkload(fmt, Ether(type=latency_probe.ETH_TYPE_PROBE))
+    data, len_wire = wl.build([1, 0x12345678])
+    assert len_wire.tolist() == [60, 60]
+    assert data[0, 12:14].tolist() == [0x88, 0xB5]
+    # timestamp bytes, then the probe tag
+    assert sorted(wl.reserved) == [14, 15]
+    assert wl.tag_offset == 16
+    assert data[1, 20:24].tolist() == [0x12, 0x34, 0x56, 0x78]
+
+    with pytest.raises(ValueError, match="overlaps the eth"):
+        ProbeWorkload(TimestampFormat(MODE_FIXED, 8, 16), Ether())
+
+
+def test_raw_ethertype():
+    # an IPv4 EtherType without IPv4 header
+    fmt = TimestampFormat(MODE_FIXED, 14, 16)
+    with pytest.raises(ValueError, match="requires an IP header"):
+        ProbeWorkload(fmt, Ether(type=ETH_TYPE_IPV4))
+    ProbeWorkload(TimestampFormat(MODE_FIXED, 48, 16), Ether(), IPv4(),
+                  UDP())
+
+
+def test_header_mode():
+    fmt = TimestampFormat(MODE_HEADER)
+    wl = ProbeWorkload(fmt, Ether(), IPv6(), UDP())
+    assert sorted(wl.reserved) == [15, 16, 17]
+    with pytest.raises(ValueError, match="timestamp bytes"):
+        wl.build([0], fields={'ipv6.flow': 1})
+    wl.build([0], fields={'ipv6.tc': 1})
+    with pytest.raises(ValueError, match="requires an IPv4/IPv6 header"):
+        ProbeWorkload(fmt, Ether())
+
+
+def test_generate(tmp_path):
+    wl = ProbeWorkload(TimestampFormat(MODE_HEADER), Ether(), IPv4(), UDP(),
+                       pkt_len=128)
+    model = TrafficModel(ConstantIAT(1e6), FixedSize(128))
+    filename = str(tmp_path / "probes.trace")
+    sent = latency_probe.generate(filename, wl, model,
+                                  np.random.default_rng(0), n_pkts=1000,
+                                  first_seq=10)
+    assert sent.seq.tolist() == list(range(10, 1010))
+
+    table = latency_probe.load(filename)
+    assert np.array_equal(table.times, sent.times)
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    offsets = trace_reader.record_offsets(w)
+    offsets = offsets[w[offsets] != trace_reader.PADDING_WORD]
+    data = np.stack([w[a + 1:a + 8].view(np.uint8) for a in offsets])
+    assert table.match(data).tolist() == list(range(1000))
+
+    # packets that are no probes
+    data[:5, table.tag_offset] ^= 0xFF
+    assert table.match(data)[:6].tolist() == [-1] * 5 + [5]
@@ -0,0 +1,80 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates traces for multiple ports and checks that all of them end at the
+# same time and that no packet is transmitted after their end.
+
+import math
+import numpy as np
+import burst_pattern
+import multi_port
+import trace_reader
+import trace_rescale
+import trace_writer
+from flow_workload import FlowTable, FlowWorkload, ZipfPopularity
+from pkt_template import PacketTemplate, Ether, IPv4, UDP
+from traffic_models import TrafficModel, PoissonIAT, ImixSize
+
+
+def read_trace(filename):
+    """Return the delta_t and wire lengths of the packets of a trace."""
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    meta = w[trace_reader.record_offsets(w)]
+    meta = meta[meta != trace_reader.PADDING_WORD]
+    return trace_reader.delta_t(meta), trace_reader.len_wire(meta)
+
+
+def test_generate(tmp_path):
+    rng = np.random.default_rng(3)
+    tmpl = PacketTemplate(Ether(), IPv4(), UDP(),
+                          pkt_len=trace_writer.PKT_SIZE_MAX)
+    workload = FlowWorkload(tmpl, FlowTable(100, rng),
+                            ZipfPopularity(100, 1.2))
+    # the aggregate rate overloads some of the ports
+    model = TrafficModel(PoissonIAT(2.5e7), ImixSize(),
+                         link_rate=4 * trace_writer.MAX_DATARATE)
+    filenames = [str(tmp_path / ("p%d.trace" % i)) for i in range(4)]
+    duration = 1e-3
+    res = multi_port.generate(filenames, workload, model,
+                              multi_port.HashAssignment(tmpl, 4), rng,
+                              duration, batch_size=1000)
+    assert sum(res.n_dropped) > 0
+
+    start = math.ceil(trace_rescale.tx_time(
+        burst_pattern.lead_in_template().pkt_len))
+    t_end = round(start + duration * trace_writer.CLK_FREQ)
+    for filename, n_pkts, d in zip(filenames, res.n_pkts, res.durations):
+        delta_t, len_wire = read_trace(filename)
+        assert len(delta_t) == n_pkts
+        assert delta_t.sum() == d
+        assert d == t_end
+
+        # all packets are transmitted completely before the trace ends
+        t = np.cumsum(delta_t) - delta_t
+        assert np.all(t + trace_rescale.tx_time(len_wire) <= d + 1)
+        assert np.all(delta_t >= trace_rescale.tx_time(len_wire) - 1)
@@ -0,0 +1,162 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Converts small PCAP files and compares the resulting traces with traces
+# encoded directly from the packets and, if it has been built (see
+# software/pcap/Makefile, or set PCAP_IMPORT to its path), with the output of
+# the compiled pcap_import tool.
+
+import os
+import subprocess
+import numpy as np
+import pytest
+import pcap_import
+import pcap_writer
+import trace_writer
+from quantize import Quantizer
+
+# compiled pcap_import tool
+PCAP_IMPORT = os.environ.get("PCAP_IMPORT", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pcap",
+    "pcap_import"))
+
+
+def random_packets(n, seed=0):
+    """Return timestamps, wire lengths and data of random packets.
+
+    All timestamps are within the same second: pcap_import subtracts
+    nanosecond timestamps with timersub(), which borrows 10^6 (instead of
+    10^9) from the fractional part at second boundaries.
+    """
+    rng = np.random.default_rng(seed)
+    ts_ns = 1500000000000000000 + np.cumsum(rng.integers(0, 3000, n))
+    len_wire = rng.choice([60, 64, 127, 576, 1514, 1518], n)
+    data = rng.integers(0, 256, (n, trace_writer.PKT_SIZE_MAX),
+                        dtype=np.uint8)
+    return ts_ns, len_wire, data
+
+
+def write_pcap(filename, ts_ns, len_wire, data):
+    """Write packets to a nanosecond precision PCAP file."""
+    with pcap_writer.PcapWriter(filename) as wr:
+        wr.write(ts_ns, len_wire, data, len_wire)
+
+
+def expected_trace(ts_ns, len_wire, data):
+    """Encode packets like pcap_import does (without trace padding)."""
+    delta_t = np.append(Quantizer(compat=True).ns(ts_ns),
+                        trace_writer.DELTA_T_LAST)
+    return trace_writer.encode(delta_t, len_wire, data).tobytes()
+
+
+def read(filename):
+    """Return the contents of a file."""
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def capture(tmp_path):
+    """Write a random capture. Returns its file name and packets."""
+    pkts = random_packets(3000)
+    filename = str(tmp_path / "a.pcap")
+    write_pcap(filename, *pkts)
+    return filename, pkts
+
+
+def test_convert(capture, tmp_path):
+    filename, pkts = capture
+    expected = expected_trace(*pkts)
+    expected += bytes(trace_writer.padding(len(expected)))
+    out = str(tmp_path / "a.trace")
+
+    # windows and batches split the capture at different packets
+    for window_size in (64, 5000, 1 << 22):
+        for batch_size in (1, 1000, trace_writer.BATCH_SIZE):
+            res = pcap_import.convert(filename, out, batch_size=batch_size,
+                                      window_size=window_size)
+            assert res.n_pkts == len(pkts[0])
+            assert read(out) == expected
+
+
+@pytest.mark.skipif(not os.access(PCAP_IMPORT, os.X_OK),
+                    reason="pcap_import has not been built")
+def test_matches_pcap_import(capture, tmp_path):
+    filename, _ = capture
+    out_c = str(tmp_path / "c.trace")
+    out_py = str(tmp_path / "py.trace")
+    subprocess.run([PCAP_IMPORT, filename, out_c], check=True,
+                   stdout=subprocess.DEVNULL)
+    pcap_import.convert(filename, out_py, window_size=4096)
+    assert read(out_py) == read(out_c)
+
+
+def test_oversize(tmp_path):
+    ts_ns, len_wire, data = random_packets(100)
+    len_wire[[10, 20]] = 1600
+    data = np.pad(data, ((0, 0), (0, 100)))
+    filename = str(tmp_path / "a.pcap")
+    write_pcap(filename, ts_ns, len_wire, data)
+    out = str(tmp_path / "a.trace")
+
+    with pytest.raises(ValueError, match="packet 10 exceeds"):
+        pcap_import.convert(filename, out, window_size=64)
+
+    res = pcap_import.convert(filename, out, skip_oversize=True,
+                              window_size=64)
+    assert (res.n_pkts, res.n_skipped) == (98, 2)
+    sel = len_wire <= trace_writer.PKT_SIZE_MAX
+    expected = expected_trace(ts_ns[sel], len_wire[sel], data[sel, :1518])
+    assert read(out)[:len(expected)] == expected
+
+
+def test_order(tmp_path):
+    ts_ns, len_wire, data = random_packets(1000)
+    order = np.random.default_rng(1).permutation(len(ts_ns))
+    filename = str(tmp_path / "a.pcap")
+    write_pcap(filename, ts_ns[order], len_wire[order], data[order])
+    out = str(tmp_path / "a.trace")
+
+    with pytest.raises(ValueError, match="not ordered"):
+        pcap_import.convert(filename, out, window_size=4096)
+
+    # sorting is stable, so that packets with equal timestamps keep their
+    # order
+    pcap_import.convert(filename, out, sort=True)
+    perm = np.argsort(ts_ns[order], kind='stable')
+    expected = expected_trace(ts_ns[order][perm], len_wire[order][perm],
+                              data[order][perm])
+    assert read(out)[:len(expected)] == expected
+
+
+def test_truncated(capture, tmp_path):
+    filename, _ = capture
+    with open(filename, "r+b") as f:
+        f.truncate(os.path.getsize(filename) - 5)
+    with pytest.raises(ValueError, match="truncated"):
+        pcap_import.convert(filename, str(tmp_path / "a.trace"))
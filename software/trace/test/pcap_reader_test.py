@@ -0,0 +1,74 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Reads PCAP files whose packet data contains plausible record headers, which
+# must not be mistaken for records when searching the records of a window.
+
+import numpy as np
+import pcap_reader
+import pcap_writer
+
+
+def fake_headers(ts_ns, len_wire, data):
+    """Fill packet data with copies of record headers of other packets."""
+    hdr = np.stack([ts_ns // 10**9, ts_ns % 10**9, len_wire, len_wire],
+                   axis=1).astype('<u4').view(np.uint8)
+    data = data.copy()
+    for k in range(0, data.shape[1] - 16, 37):
+        data[:, k:k + 16] = np.roll(hdr, k + 1, axis=0)
+    return data
+
+
+def test_read_windows(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 2000
+    ts_ns = 1500000000000000000 + np.cumsum(rng.integers(0, 3000, n))
+    len_wire = rng.integers(60, 1519, n)
+    data = fake_headers(ts_ns, len_wire, rng.integers(
+        0, 256, (n, 1518), dtype=np.uint8))
+    filename = str(tmp_path / "a.pcap")
+    with pcap_writer.PcapWriter(filename) as wr:
+        wr.write(ts_ns, len_wire, data, len_wire)
+
+    pcap = pcap_reader.PcapFile(filename)
+    assert np.array_equal(pcap.ts_ns, ts_ns)
+    assert np.array_equal(pcap.origlen, len_wire)
+
+    # windows split the capture within records and within record headers
+    for window_size in (64, 1000, 4099, 1 << 20):
+        wins = list(pcap_reader.read_windows(filename, window_size))
+        assert np.array_equal(np.concatenate([w.ts_ns for w in wins]), ts_ns)
+        assert np.array_equal(np.concatenate([w.caplen for w in wins]),
+                              len_wire)
+        i = 0
+        for w in wins:
+            for j in range(w.n_pkts):
+                off = w.data_offsets[j]
+                assert np.array_equal(w.data[off:off + len_wire[i]],
+                                      data[i, :len_wire[i]])
+                i += 1
@@ -0,0 +1,84 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Builds packets from templates and compares them with packets built by scapy
+# (if installed).
+
+import numpy as np
+import pytest
+from pkt_template import PacketTemplate, Ether, IPv4, IPv6, UDP, TCP
+
+
+def test_default_pkt_len():
+    assert PacketTemplate(Ether(), IPv4(), UDP()).pkt_len == 60
+    tmpl = PacketTemplate(Ether(), IPv6(), UDP())
+    assert tmpl.pkt_len == tmpl.hdr_len == 62
+    with pytest.raises(ValueError, match="shorter than headers"):
+        PacketTemplate(Ether(), IPv6(), UDP(), pkt_len=60)
+
+
+def test_overlapping_masked_fields():
+    tmpl = PacketTemplate(Ether(), IPv6(tc=0x55, flow=0xABCDE), UDP())
+    off = tmpl.offsets['ipv6']
+    fields = {'ipv6.tc': [0x12, 0xAB], 'ipv6.flow': [0x12345, 0xFFFFF]}
+    expected = [[0x61, 0x21, 0x23, 0x45], [0x6A, 0xBF, 0xFF, 0xFF]]
+    for order in (list(fields), list(fields)[::-1]):
+        data, _ = tmpl.build(2, {k: fields[k] for k in order})
+        assert data[:, off:off + 4].tolist() == expected
+
+    # patching only one of the fields keeps the template's other one
+    data, _ = tmpl.build(1, {'ipv6.flow': 1})
+    assert data[0, off:off + 4].tolist() == [0x65, 0x50, 0x00, 0x01]
+
+
+@pytest.mark.parametrize("l3, l4", [(IPv4, UDP), (IPv4, TCP), (IPv6, UDP),
+                                    (IPv6, TCP)])
+def test_checksums(l3, l4):
+    scapy = pytest.importorskip("scapy.all")
+    tmpl = PacketTemplate(Ether(), l3(), l4())
+    rng = np.random.default_rng(0)
+    n = 20
+    pkt_len = rng.integers(tmpl.hdr_len, 1515, n)
+    fields = {'%s.sport' % tmpl._l4.name: rng.integers(0, 1 << 16, n)}
+    if l3 is IPv4:
+        fields['ipv4.id'] = rng.integers(0, 1 << 16, n)
+    else:
+        fields['ipv6.tc'] = rng.integers(0, 1 << 8, n)
+        fields['ipv6.flow'] = rng.integers(0, 1 << 20, n)
+    data, len_wire = tmpl.build(n, fields, pkt_len=pkt_len,
+                                width=pkt_len.max())
+    assert np.array_equal(len_wire, pkt_len)
+    layers = [scapy.IP] if l3 is IPv4 else []
+    layers.append(scapy.UDP if l4 is UDP else scapy.TCP)
+    for row, length in zip(data, len_wire):
+        raw = row[:length].tobytes()
+        pkt = scapy.Ether(raw)
+        for layer in layers:
+            del pkt[layer].chksum
+        # scapy recalculates the deleted checksums
+        assert bytes(pkt) == raw
@@ -0,0 +1,97 @@
+"""Tests for quantize.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Checks that the compatibility mode of the quantizer produces the same delta_t
+# values as the rounding loop of software/pcap/pcap_import.c, which is ported
+# to Python below.
+
+import math
+import numpy as np
+import pytest
+from quantize import Quantizer
+
+# clock frequency used by pcap_import
+CLK_FREQ = 156.25e6
+
+
+def pcap_import_delta_t(ts_ns):
+    """Quantize timestamp differences like pcap_import's packet handler."""
+    err = 0.0
+    delta_t = []
+    for prev, cur in zip(ts_ns[:-1], ts_ns[1:]):
+        cycles = float(cur - prev) * CLK_FREQ / 1e9
+        if err < 1.0:
+            delta_t.append(math.ceil(cycles))
+            err += math.ceil(cycles) - cycles
+        else:
+            delta_t.append(math.floor(cycles))
+            err -= cycles - math.floor(cycles)
+    return delta_t
+
+
+def timestamps(n, seed):
+    """Return random nanosecond timestamps (with equal and aligned ones)."""
+    rng = np.random.default_rng(seed)
+    gaps = rng.integers(0, 5000, n)
+    gaps[rng.random(n) < 0.1] = 0
+    gaps[rng.random(n) < 0.1] //= 32
+    gaps[rng.random(n) < 0.1] *= 32
+    gaps[rng.random(n) < 0.01] = rng.integers(1, 1 << 31, n)[:1]
+    return 1500000000123456789 + np.cumsum(gaps)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compat_matches_pcap_import(seed):
+    ts_ns = timestamps(20000, seed)
+    delta_t = Quantizer(compat=True).ns(ts_ns)
+    assert delta_t.tolist() == pcap_import_delta_t(ts_ns.tolist())
+
+
+def test_compat_batches():
+    ts_ns = timestamps(10000, 10)
+    expected = pcap_import_delta_t(ts_ns.tolist())
+
+    # splitting the timestamps into batches must not change the result
+    rng = np.random.default_rng(11)
+    cuts = np.sort(rng.integers(0, len(ts_ns), 50))
+    q = Quantizer(compat=True)
+    delta_t = np.concatenate([q.ns(b) for b in np.split(ts_ns, cuts)])
+    assert delta_t.tolist() == expected
+    assert q.err_max <= 2.0
+
+
+def test_nearest_rounding_error():
+    ts_ns = timestamps(10000, 20)
+    q = Quantizer()
+    delta_t = q.ns(ts_ns)
+
+    # quantized times deviate from the target times by at most half a cycle
+    # (a nanosecond is 5/32 clock cycles)
+    exact_32 = (ts_ns[1:] - ts_ns[0]) * 5
+    assert np.abs(32 * np.cumsum(delta_t) - exact_32).max() <= 16
+    assert q.err_max <= 0.5
@@ -0,0 +1,130 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Compares the analytically planned trace sizes with the sizes of written
+# traces and checks the ring buffer and PCIe calculations.
+
+import json
+import os
+import numpy as np
+import pytest
+import pcap_writer
+import replay_plan
+import trace_writer
+from traffic_models import FixedSize, ImixSize
+
+N = 1000
+
+
+def test_pcie_bytes():
+    assert replay_plan.pcie_bytes(0) == 0
+    assert replay_plan.pcie_bytes(256) == 256 + 24
+    assert replay_plan.pcie_bytes(257) == 257 + 2 * 24
+
+
+def test_ring_size():
+    assert replay_plan.ring_size(4) == 2 << 30
+    assert replay_plan.ring_size(1) == replay_plan.RING_SIZE_MAX
+    assert replay_plan.ring_size(3) % replay_plan.RING_ALIGNMENT == 0
+
+
+def test_plan_params():
+    # 60 byte packets take 84 bytes on the wire and 72 bytes in the trace
+    plan = replay_plan.plan_params(FixedSize(60), duration=1e-3,
+                                   datarate=10e9, repeat=3)
+    n_pkts = 1e-3 * 10e9 / (8 * 84)
+    assert plan.n_pkts == pytest.approx(n_pkts)
+    assert plan.size == pytest.approx(72 * n_pkts, abs=64)
+    assert plan.size % trace_writer.TRACE_ALIGNMENT == 0
+    assert plan.duration_s == pytest.approx(1e-3)
+    assert plan.total_size == 3 * plan.size
+    assert plan.fits and plan.max_duration_s == float("inf")
+
+    plan = replay_plan.plan_params(ImixSize(), n_pkts=N, pkt_rate=1e6,
+                                   len_snap=64)
+    assert plan.duration_s == pytest.approx(N / 1e6)
+    assert plan.size == replay_plan._padded(N * 72)
+
+    with pytest.raises(ValueError):
+        replay_plan.plan_params(FixedSize(60), duration=1.0)
+    with pytest.raises(ValueError):
+        replay_plan.plan_params(FixedSize(60), datarate=10e9)
+
+
+def test_streaming():
+    # eight interfaces read faster than PCIe can refill their ring buffers
+    plan = replay_plan.plan_params(FixedSize(1514), duration=10.0,
+                                   datarate=10e9, n_interfaces=8)
+    assert not plan.fits
+    assert plan.footprint == plan.ring == replay_plan.ring_size(8)
+    assert plan.pcie_load > 1
+    supply = replay_plan.PCIE_THROUGHPUT / 8 * plan.size / \
+        replay_plan.pcie_bytes(plan.size)
+    assert plan.max_duration_s == pytest.approx(
+        plan.ring / (plan.read_rate - supply))
+    assert plan.max_passes == int(plan.max_duration_s // plan.duration_s)
+    assert "WARNING" in plan.text()
+
+    # four interfaces are supplied fast enough
+    plan = replay_plan.plan_params(FixedSize(1514), duration=10.0,
+                                   datarate=10e9)
+    assert not plan.fits and plan.pcie_load < 1
+    assert json.loads(json.dumps(plan.dict()))['max_duration_s'] is None
+
+
+def test_plan_file(tmp_path):
+    rng = np.random.default_rng(0)
+    len_wire = rng.integers(60, trace_writer.PKT_SIZE_MAX + 1, N)
+    delta_t = rng.integers(200, 1000, N)
+    data = np.zeros(trace_writer.PKT_SIZE_MAX, dtype=np.uint8)
+    filename = str(tmp_path / "a.trace")
+    trace_writer.write_trace(filename, delta_t, len_wire, data)
+
+    plan = replay_plan.plan_file(filename)
+    assert plan.n_pkts == N
+    assert plan.size == os.path.getsize(filename)
+    assert plan.duration == np.sum(delta_t)
+
+    snap = str(tmp_path / "b.trace")
+    trace_writer.write_trace(snap, delta_t, len_wire, data,
+                             np.minimum(len_wire, 100))
+    assert replay_plan.plan_file(filename, len_snap=100).size == \
+        os.path.getsize(snap)
+
+    # PCAP files are planned as converted by pcap_import
+    ts_ns = 1500000000000000000 + 6400 * np.cumsum(delta_t)
+    pcap = str(tmp_path / "a.pcap")
+    with pcap_writer.PcapWriter(pcap) as wr:
+        wr.write(ts_ns, len_wire, data)
+    plan = replay_plan.plan_file(pcap)
+    assert plan.n_pkts == N
+    assert plan.size == os.path.getsize(filename)
+    assert plan.duration == pytest.approx(
+        np.sum(delta_t[1:]) * 1000 + trace_writer.DELTA_T_LAST)
@@ -0,0 +1,64 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Runs all available generation paths with all shapes in-process and checks
+# that the resulting traces contain full-length records.
+
+import numpy as np
+import pytest
+import trace_bench
+import trace_reader
+
+# expected wire lengths (excluding FCS) of the shapes
+LENGTHS = {
+    "cbr64": {60},
+    "imix": {60, 590, 1514},
+    "cbr1518": {1514},
+    "flows1m": {60, 590, 1514},
+}
+
+
+@pytest.mark.parametrize("path", trace_bench.PATHS)
+@pytest.mark.parametrize("shape", trace_bench.SHAPES)
+def test_run(shape, path, tmp_path):
+    reason = trace_bench.unavailable(path)
+    if reason is not None:
+        pytest.skip(reason)
+    n_pkts = 200
+    res = trace_bench._run((shape, path, n_pkts, 0, str(tmp_path)))
+    assert res["n_pkts"] == n_pkts
+
+    w = trace_reader.words(trace_reader.open_trace(
+        str(tmp_path / "bench.trace")))
+    meta = w[trace_reader.record_offsets(w)]
+    meta = meta[meta != trace_reader.PADDING_WORD]
+    assert len(meta) == n_pkts
+    assert res["bytes"] == 8 * len(w)
+    len_wire = trace_reader.len_wire(meta)
+    assert np.array_equal(trace_reader.len_snap(meta), len_wire)
+    assert set(len_wire.tolist()) <= LENGTHS[shape]
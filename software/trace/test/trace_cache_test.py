@@ -0,0 +1,132 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Places generated traces into a cache directory and takes them out again,
+# checks cache keys and the eviction of least recently used entries.
+
+import os
+import numpy as np
+import pytest
+import trace_cache
+import trace_index
+import trace_writer
+
+N = 1000
+
+
+def generate(filename, seed=0):
+    """Write a trace of N random packets."""
+    rng = np.random.default_rng(seed)
+    trace_writer.write_trace(filename, rng.integers(100, 1000, N),
+                             rng.integers(60, 1519, N),
+                             np.zeros(trace_writer.PKT_SIZE_MAX,
+                                      dtype=np.uint8))
+
+
+def read(filename):
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return trace_cache.Cache(str(tmp_path / "cache"))
+
+
+def test_cached(cache, tmp_path):
+    a, b = str(tmp_path / "a.trace"), str(tmp_path / "b.trace")
+    calls = []
+
+    def gen(filename):
+        calls.append(filename)
+        generate(filename)
+
+    meta, hit = cache.cached(a, gen, "test", {'n': N}, seed=1, version="1")
+    assert not hit and calls == [a]
+    assert meta['method'] in ("reflink", "copy")
+    assert meta['stats'] == trace_index.build(a).stats
+
+    # the index is not stored in the cache
+    entry = os.path.join(cache.directory, meta['key'])
+    assert sorted(os.listdir(entry)) == [trace_cache.DATA_NAME,
+                                         trace_cache.META_NAME]
+    assert meta['size'] == os.path.getsize(a)
+
+    meta_b, hit = cache.cached(b, gen, "test", {'n': N}, seed=1, version="1")
+    assert hit and calls == [a] and meta_b['key'] == meta['key']
+    assert read(b) == read(a)
+
+    # the user's file is writable and does not share data with the cache
+    with open(b, "r+b") as f:
+        f.write(b"\0" * 8)
+    assert read(os.path.join(entry, trace_cache.DATA_NAME)) == read(a)
+
+    # a different seed or code version is a different entry
+    cache.cached(b, gen, "test", {'n': N}, seed=2, version="1")
+    cache.cached(b, gen, "test", {'n': N}, seed=1, version="2")
+    assert len(calls) == 3 and len(cache.entries()) == 3
+
+
+def test_make_key():
+    key = trace_cache.make_key("test", {'a': 1, 'b': 2}, 0, "1")
+    assert key == trace_cache.make_key("test", {'b': 2, 'a': 1}, 0, "1")
+    assert key != trace_cache.make_key("test", {'a': 1, 'b': 2}, None, "1")
+    assert len(trace_cache.code_version()) == 64
+
+
+def test_evict(cache, tmp_path):
+    filename = str(tmp_path / "a.trace")
+    keys = []
+    for seed in range(3):
+        generate(filename, seed)
+        keys.append(cache.put("k%d" % seed, filename)['key'])
+    size = cache.size()
+
+    # the least recently used entry is evicted
+    assert cache.get("k0", filename) is not None
+    cache.evict(size - 1)
+    assert [meta['key'] for meta in cache.entries()] == ["k2", "k0"]
+    assert cache.get("k1", filename) is None
+
+    cache.evict(0)
+    assert cache.entries() == []
+
+
+def test_exceeds_max_size(tmp_path):
+    filename = str(tmp_path / "a.trace")
+    generate(filename)
+    cache = trace_cache.Cache(str(tmp_path / "cache"),
+                              os.path.getsize(filename) - 1)
+    assert cache.put("k", filename) is None
+    assert cache.entries() == []
+
+    cache.max_size += 1
+    assert cache.put("k", filename)['key'] == "k"
+    assert len(cache.entries()) == 1
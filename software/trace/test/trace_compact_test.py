@@ -0,0 +1,115 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Compacts traces with trailing zero bytes and checks that the replayed
+# packets (stored data followed by zero bytes up to the wire length) do not
+# change.
+
+import numpy as np
+import pytest
+import trace_compact
+import trace_reader
+import trace_writer
+
+N = 2000
+
+
+def replayed(filename):
+    """Return meta data fields and replayed packet data of a trace file."""
+    data = trace_reader.open_trace(filename)
+    w = trace_reader.words(data)
+    offsets = trace_reader.record_offsets(w)
+    meta = w[offsets]
+    len_snap = trace_reader.len_snap(meta)
+    len_wire = trace_reader.len_wire(meta)
+    pkts = np.zeros((len(offsets), trace_writer.PKT_SIZE_MAX), dtype=np.uint8)
+    for i, off in enumerate(offsets):
+        pkts[i, :len_snap[i]] = data[8 * off + 8:8 * off + 8 + len_snap[i]]
+    return trace_reader.delta_t(meta), len_wire, len_snap, pkts
+
+
+@pytest.fixture
+def trace(tmp_path):
+    """Write a trace whose packets end with random numbers of zero bytes."""
+    rng = np.random.default_rng(0)
+    len_wire = rng.integers(60, trace_writer.PKT_SIZE_MAX + 1, N)
+    len_snap = np.minimum(rng.integers(0, 200, N), len_wire)
+    data = rng.integers(1, 256, (N, trace_writer.PKT_SIZE_MAX),
+                        dtype=np.uint8)
+    n_data = rng.integers(0, 200, N)
+    data[np.arange(trace_writer.PKT_SIZE_MAX) >= n_data[:, None]] = 0
+    filename = str(tmp_path / "a.trace")
+    trace_writer.write_trace(filename, rng.integers(0, 1000, N), len_wire,
+                             data, len_snap)
+    return filename, np.minimum(n_data, len_snap)
+
+
+def test_last_nonzero(trace):
+    filename, n_data = trace
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    offsets = trace_reader.record_offsets(w)
+    len_snap = trace_reader.len_snap(w[offsets])
+    for a, b in ((0, N), (0, 1), (N - 1, N), (100, 1000)):
+        assert np.array_equal(trace_compact.last_nonzero(
+            w, offsets[a:b], len_snap[a:b]), n_data[a:b])
+
+
+@pytest.mark.parametrize("batch_size", [N, 7])
+def test_compact(trace, tmp_path, batch_size):
+    filename, n_data = trace
+    out = str(tmp_path / "b.trace")
+    res = trace_compact.compact(filename, out, batch_size=batch_size)
+
+    delta_t, len_wire, len_snap, pkts = replayed(filename)
+    delta_t_out, len_wire_out, len_snap_out, pkts_out = replayed(out)
+    assert np.array_equal(delta_t_out, delta_t)
+    assert np.array_equal(len_wire_out, len_wire)
+    assert np.array_equal(len_snap_out, n_data)
+    assert np.array_equal(pkts_out, pkts)
+
+    assert res.n_pkts == N
+    assert res.n_truncated == np.count_nonzero(n_data < len_snap)
+    assert res.bytes_snap_in == len_snap.sum()
+    assert res.bytes_snap_out == n_data.sum()
+    assert res.size_out == len(trace_reader.open_trace(out)) < res.size_in
+    assert "DDR3 memory" in res.text()
+
+
+def test_length(trace, tmp_path):
+    filename = trace[0]
+    out = str(tmp_path / "b.trace")
+    trace_compact.compact(filename, out, length=64)
+
+    _, len_wire, len_snap, pkts = replayed(filename)
+    _, len_wire_out, len_snap_out, pkts_out = replayed(out)
+    assert np.array_equal(len_wire_out, len_wire)
+    assert np.array_equal(len_snap_out, np.minimum(len_snap, 64))
+    assert np.array_equal(pkts_out[:, :64], pkts[:, :64])
+    assert not pkts_out[:, 64:].any()
@@ -0,0 +1,111 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Concatenates and repeats (parts of) traces and compares the records of the
+# result with the records of the input traces.
+
+import numpy as np
+import pytest
+import trace_edit
+import trace_reader
+import trace_writer
+
+
+def write_trace(filename, n, seed):
+    """Write a trace of n random packets, return its records."""
+    rng = np.random.default_rng(seed)
+    delta_t = rng.integers(100, 1000, n)
+    delta_t[-1] = trace_writer.DELTA_T_LAST
+    len_wire = rng.integers(60, trace_writer.PKT_SIZE_MAX + 1, n)
+    data = rng.integers(0, 256, (n, trace_writer.PKT_SIZE_MAX),
+                        dtype=np.uint8)
+    trace_writer.write_trace(filename, delta_t, len_wire, data)
+    return records(filename)
+
+
+def records(filename):
+    """Return the records (meta data word and data words) of a trace."""
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    offsets = trace_reader.record_offsets(w)
+    end = offsets + trace_reader.record_words(trace_reader.len_snap(
+        w[offsets]))
+    return [w[a:b].copy() for a, b in zip(offsets, end)]
+
+
+@pytest.fixture
+def traces(tmp_path):
+    a, b = str(tmp_path / "a.trace"), str(tmp_path / "b.trace")
+    return (a, write_trace(a, 100, 0)), (b, write_trace(b, 50, 1))
+
+
+def test_concat(traces, tmp_path):
+    (a, rec_a), (b, rec_b) = traces
+    out = str(tmp_path / "c.trace")
+    pieces = [trace_edit.Piece(a), trace_edit.Piece(b, 10, 20)]
+    assert trace_edit.write(out, pieces, repeat=2) == 220
+
+    # records are copied unmodified, including the original delta_t of the
+    # last packet of each piece
+    expected = (rec_a + rec_b[10:20]) * 2
+    rec = records(out)
+    assert len(rec) == len(expected)
+    assert all(np.array_equal(x, y) for x, y in zip(rec, expected))
+    assert trace_reader.delta_t(rec[99][0]) == trace_writer.DELTA_T_LAST
+    assert trace_reader.delta_t(rec[109][0]) == \
+        trace_reader.delta_t(rec_b[19][0])
+
+    data = trace_reader.open_trace(out)
+    assert len(data) % trace_writer.TRACE_ALIGNMENT == 0
+
+
+def test_gap(traces, tmp_path):
+    (a, rec_a), (b, rec_b) = traces
+    out = str(tmp_path / "c.trace")
+    pieces = [trace_edit.Piece(a, t_stop=10e-6), trace_edit.Piece(b)]
+    n = pieces[0].n_pkts
+    assert 0 < n < 100
+    trace_edit.write(out, pieces, gap=1000)
+
+    rec = records(out)
+    for i, last in ((n - 1, rec_a[n - 1]), (len(rec) - 1, rec_b[-1])):
+        len_wire = int(trace_reader.len_wire(last[0]))
+        assert trace_reader.delta_t(rec[i][0]) == \
+            trace_edit.tx_cycles(len_wire) + 1000
+        assert np.array_equal(rec[i][1:], last[1:])
+    assert all(np.array_equal(x, y) for x, y in zip(rec[:n - 1], rec_a))
+
+    with pytest.raises(ValueError):
+        trace_edit.write(out, pieces, gap=1 << 32)
+
+
+def test_tx_cycles():
+    # 1518 byte packets take 192.75 clock cycles
+    assert trace_edit.tx_cycles(trace_writer.PKT_SIZE_MAX) == 193
+    assert trace_edit.tx_cycles(40) == 8
@@ -0,0 +1,138 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Builds, loads and invalidates trace indices and extracts parts of traces.
+
+import os
+import numpy as np
+import pytest
+import trace_index
+import trace_reader
+import trace_writer
+
+N = 1000
+
+
+@pytest.fixture
+def trace(tmp_path):
+    """Write a trace of N packets with random lengths and delta_t values."""
+    rng = np.random.default_rng(0)
+    delta_t = rng.integers(0, 1000, N)
+    len_wire = rng.integers(60, trace_writer.PKT_SIZE_MAX + 1, N)
+    data = rng.integers(0, 256, (N, trace_writer.PKT_SIZE_MAX),
+                        dtype=np.uint8)
+    filename = str(tmp_path / "a.trace")
+    trace_writer.write_trace(filename, delta_t, len_wire, data)
+    return filename, delta_t, len_wire
+
+
+def test_build_load(trace):
+    filename, delta_t, len_wire = trace
+    idx = trace_index.build(filename)
+    assert idx.n_pkts == N
+    assert os.path.exists(trace_index.index_filename(filename))
+
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    assert np.array_equal(idx.offsets[:-1], 8 * trace_reader.record_offsets(w))
+    assert idx.offsets[-1] == idx.offsets[-2] + 8 * trace_reader.record_words(
+        len_wire[-1])
+    assert np.array_equal(np.diff(idx.times), delta_t)
+    assert idx.stats['n_pkts'] == N
+    assert idx.stats['bytes_wire'] == np.sum(len_wire)
+
+    loaded = trace_index.load(filename, rebuild=False)
+    assert isinstance(loaded.offsets, np.memmap)
+    assert np.array_equal(loaded.offsets, idx.offsets)
+    assert np.array_equal(loaded.times, idx.times)
+    assert loaded.stats == idx.stats
+
+
+def test_packet_range(trace):
+    filename, delta_t, _ = trace
+    idx = trace_index.build(filename)
+    t = np.cumsum(delta_t) - delta_t
+    for i in (0, 1, 500, N - 1):
+        assert t[idx.seek_time(t[i])] == t[i]
+        assert idx.seek_time(t[i] + 0.5) == np.searchsorted(t, t[i] + 0.5)
+    assert idx.seek_time(t[-1] + 1) == N
+
+    assert idx.packet_range() == (0, N)
+    assert idx.packet_range(10, -10) == (10, N - 10)
+    assert idx.packet_range(20, 10) == (20, 20)
+    t_start, t_stop = t[100] / trace_writer.CLK_FREQ, \
+        t[200] / trace_writer.CLK_FREQ
+    start, stop = idx.packet_range(t_start=t_start, t_stop=t_stop)
+    assert t[start] == t[100] and t[stop] == t[200]
+    assert idx.duration(start, stop) == t[200] - t[100]
+
+
+def test_extract(trace, tmp_path):
+    filename = trace[0]
+    idx = trace_index.build(filename)
+    out = str(tmp_path / "b.trace")
+    idx.extract(out, 100, 200)
+
+    a, b = idx.byte_range(100, 200)
+    data = trace_reader.open_trace(out)
+    assert np.array_equal(data[:b - a], trace_reader.open_trace(filename)[a:b])
+    assert np.all(data[b - a:] == 0xFF)
+    assert trace_index.build(out).n_pkts == 100
+
+
+def test_outdated(trace):
+    filename = trace[0]
+    trace_index.build(filename)
+    with open(filename, "ab") as f:
+        f.write(b"\xff" * trace_writer.TRACE_ALIGNMENT)
+    with pytest.raises(ValueError):
+        trace_index.load(filename, rebuild=False)
+
+    # the index is rebuilt and stored
+    assert trace_index.load(filename).n_pkts == N
+    assert trace_index.load(filename, rebuild=False).n_pkts == N
+
+
+def test_corrupt(trace):
+    filename = trace[0]
+    with pytest.raises(OSError):
+        trace_index.load(filename, rebuild=False)
+
+    trace_index.build(filename)
+    idx_filename = trace_index.index_filename(filename)
+    with open(idx_filename, "r+b") as f:
+        f.truncate(os.path.getsize(idx_filename) - 8)
+    with pytest.raises(ValueError):
+        trace_index.load(filename, rebuild=False)
+
+    with open(idx_filename, "r+b") as f:
+        f.write(b"FLTIDX00")
+    with pytest.raises(ValueError):
+        trace_index.load(filename, rebuild=False)
+    assert trace_index.load(filename).n_pkts == N
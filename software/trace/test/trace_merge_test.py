@@ -0,0 +1,85 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Merges a PCAP file with a trace file and checks that all packets are merged
+# in order and that the result does not depend on how the inputs are read.
+
+import numpy as np
+import pcap_writer
+import trace_merge
+import trace_reader
+import trace_writer
+
+
+def read_trace(filename):
+    """Return the meta data words and the records of a trace."""
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    offsets = trace_reader.record_offsets(w)
+    offsets = offsets[w[offsets] != trace_reader.PADDING_WORD]
+    records = [w[a:a + trace_reader.record_words(trace_reader.len_snap(m))]
+               .tobytes() for a, m in zip(offsets, w[offsets])]
+    return w[offsets], records
+
+
+def test_merge(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 3000
+    ts_ns = 1500000000000000000 + np.cumsum(rng.integers(0, 3000, n))
+    len_wire = rng.integers(60, 1519, n)
+    len_snap = np.minimum(len_wire, rng.integers(0, 200, n))
+    data = rng.integers(0, 256, (n, 1518), dtype=np.uint8)
+    pcap = str(tmp_path / "a.pcap")
+    with pcap_writer.PcapWriter(pcap) as wr:
+        wr.write(ts_ns, len_wire, data, len_snap)
+    trace = str(tmp_path / "b.trace")
+    with trace_writer.TraceWriter(trace) as wr:
+        wr.write(rng.integers(100, 2000, n), len_wire[::-1], data)
+
+    out = str(tmp_path / "out.trace")
+    res = trace_merge.merge(out, [trace_merge.PcapSource(pcap),
+                                  trace_merge.open_source(trace)])
+    assert res.n_pkts.tolist() == [n, n]
+    expected = open(out, "rb").read()
+    meta, records = read_trace(out)
+    assert len(meta) == 2 * n
+    assert trace_reader.delta_t(meta).sum() == res.duration
+
+    # the merged records are the records of both inputs (apart from delta_t,
+    # the first 4 bytes)
+    pcap_trace = str(tmp_path / "a.trace")
+    with trace_writer.TraceWriter(pcap_trace) as wr:
+        wr.write(np.zeros(n, dtype=np.int64), len_wire, data, len_snap)
+    inputs = read_trace(pcap_trace)[1] + read_trace(trace)[1]
+    assert sorted(r[4:] for r in records) == sorted(r[4:] for r in inputs)
+
+    # windows and batches split the inputs at different packets
+    for window_size, batch_size in ((64, 1), (5000, 100), (1 << 20, 1000)):
+        trace_merge.merge(out, [
+            trace_merge.PcapSource(pcap, window_size=window_size),
+            trace_merge.open_source(trace)], batch_size=batch_size)
+        assert open(out, "rb").read() == expected
@@ -0,0 +1,78 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates traces with different numbers of worker processes and checks that
+# they are identical and that the stitched shards keep the packet times.
+
+import numpy as np
+import trace_parallel
+import trace_reader
+import trace_writer
+
+
+def read_times(filename):
+    """Return the transmission times and delta_t values of a trace."""
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    meta = w[trace_reader.record_offsets(w)]
+    delta_t = trace_reader.delta_t(meta[meta != trace_reader.PADDING_WORD])
+    return np.cumsum(delta_t) - delta_t, delta_t
+
+
+def test_process_independent(tmp_path):
+    gen = trace_parallel.PoissonGenerator(128, 5e9)
+    data = []
+    for n_procs in (1, 3):
+        filename = str(tmp_path / ("%d.trace" % n_procs))
+        n = trace_parallel.generate(filename, gen, 2e-3, seed=7,
+                                    shard_duration=0.3e-3, n_procs=n_procs)
+        assert n > 0
+        data.append(open(filename, "rb").read())
+    assert data[0] == data[1]
+
+
+def test_cbr(tmp_path):
+    gen = trace_parallel.CbrGenerator(60, 1e9)
+    filename = str(tmp_path / "a.trace")
+    duration = 1e-3
+    n = trace_parallel.generate(filename, gen, duration, seed=0,
+                                shard_duration=0.1e-3, n_procs=1)
+
+    # the times of all packets (across shard boundaries) are the rounded
+    # multiples of the interpacket time, the trace is replayed seamlessly
+    t, delta_t = read_times(filename)
+    assert len(t) == n
+    assert np.array_equal(t, np.rint(np.arange(n) * gen.t_interpacket))
+    assert delta_t.sum() == round(duration * trace_writer.CLK_FREQ)
+
+
+def test_delta_t_last(tmp_path):
+    gen = trace_parallel.CbrGenerator(60, 1e9)
+    filename = str(tmp_path / "a.trace")
+    trace_parallel.generate(filename, gen, 1e-3, shard_duration=0.3e-3,
+                            n_procs=1, delta_t_last=12345)
+    assert read_times(filename)[1][-1] == 12345
@@ -0,0 +1,127 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Rescales trace and PCAP files and checks the scaled times, the achieved mean
+# rate and the clamping of packets the link cannot keep up with.
+
+import numpy as np
+import pytest
+import pcap_reader
+import pcap_writer
+import trace_reader
+import trace_rescale
+import trace_validate
+import trace_writer
+
+N = 1000
+
+# 100 byte packets take 15.5 clock cycles at 10 Gbps
+PKT_LEN = 100
+
+
+def delta_ts(filename):
+    """Return the delta_t values of a trace file."""
+    w = trace_reader.words(trace_reader.open_trace(filename))
+    return trace_reader.delta_t(w[trace_reader.record_offsets(w)])
+
+
+@pytest.fixture
+def trace(tmp_path):
+    delta_t = np.random.default_rng(0).integers(20, 100, N)
+    filename = str(tmp_path / "a.trace")
+    trace_writer.write_trace(filename, delta_t, np.full(N, PKT_LEN),
+                             np.zeros(PKT_LEN, dtype=np.uint8))
+    return filename, delta_t
+
+
+def test_rescale_times():
+    t, lateness = trace_rescale.rescale_times([10, 1, 1, 100], 5.0, 1.0)
+    assert t.tolist() == [0, 10, 15, 20, 112]
+    assert lateness.tolist() == [0, 0, 4, 8, 0]
+
+
+def test_factor(trace, tmp_path):
+    filename, delta_t = trace
+    out = str(tmp_path / "b.trace")
+    result = trace_rescale.rescale(filename, out, factor=2.0)
+    assert np.array_equal(delta_ts(out), 2 * delta_t)
+    assert np.array_equal(delta_ts(filename), delta_t)
+    assert result.n_pkts == N and len(result.clamped) == 0
+    assert result.rate_out == pytest.approx(result.rate_in / 2)
+    assert result.err_max == 0.0
+
+
+def test_rate(trace):
+    filename = trace[0]
+    result = trace_rescale.rescale(filename, rate=2e9)
+    assert result.rate_out == pytest.approx(2e9, rel=1e-3)
+    assert "clamped packets: 0" in result.text()
+
+
+def test_clamp(trace):
+    filename, delta_t = trace
+    result = trace_rescale.rescale(filename, factor=0.5)
+
+    # each packet is sent when its scaled time has come and the preceding
+    # packet has been transmitted
+    t, t_link, lateness = 0.0, 0.0, []
+    for d in delta_t:
+        lateness.append(max(t_link - t, 0.0))
+        t_link = t + lateness[-1] + 15.5
+        t += 0.5 * d
+    assert np.array_equal(result.clamped, np.flatnonzero(
+        np.asarray(lateness) > trace_validate.TOLERANCE))
+    assert len(result.clamped) > 0 and result.shift_max > 0
+
+    # the hardware can replay the trace as intended
+    assert 'delta_t_infeasible' not in trace_validate.validate(
+        filename).errors
+
+
+def test_pcap(tmp_path):
+    rng = np.random.default_rng(0)
+    ts_ns = 1500000000000000000 + np.cumsum(rng.integers(200, 1000, N))
+    filename = str(tmp_path / "a.pcap")
+    with pcap_writer.PcapWriter(filename) as wr:
+        wr.write(ts_ns, np.full(N, PKT_LEN), np.zeros(PKT_LEN,
+                                                      dtype=np.uint8))
+    out = str(tmp_path / "b.pcap")
+    result = trace_rescale.rescale(filename, out, factor=3.0)
+    assert np.array_equal(pcap_reader.PcapFile(out).ts_ns,
+                          ts_ns[0] + 3 * (ts_ns - ts_ns[0]))
+    assert len(result.clamped) == 0
+    assert result.rate_out == pytest.approx(result.rate_in / 3)
+
+
+@pytest.mark.parametrize("factor, rate", [
+    (None, None), (1.0, 1e9), (0.0, None), (None, -1e9)])
+def test_arguments(trace, factor, rate):
+    with pytest.raises(ValueError):
+        trace_rescale.rescale(trace[0], factor=factor, rate=rate)
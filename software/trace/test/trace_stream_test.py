@@ -0,0 +1,104 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Runs the generation pipeline with different chunk sizes and sinks and
+# compares the result with traces written by trace_writer.TraceWriter.
+
+import io
+import socket
+import threading
+import numpy as np
+import pytest
+import trace_stream
+import trace_writer
+from pkt_template import PacketTemplate, Ether, IPv4, UDP
+
+
+def source(seed=0, batch_size=1000):
+    """Return a packet source with random packet lengths."""
+    tmpl = PacketTemplate(Ether(), IPv4(), UDP())
+    return trace_stream.template_source(
+        tmpl, pkt_len_func=lambda n, rng: rng.integers(60, 1515, n),
+        batch_size=batch_size, seed=seed)
+
+
+def expected_trace(n_pkts, tmp_path):
+    """Write the first 'n_pkts' packets of source() with TraceWriter."""
+    batches = trace_stream.timing(source(), trace_stream.LinkRateTiming(),
+                                  n_pkts=n_pkts)
+    filename = str(tmp_path / "expected.trace")
+    with trace_writer.TraceWriter(filename) as wr:
+        for batch in batches:
+            wr.write(*batch)
+    return open(filename, "rb").read()
+
+
+@pytest.mark.parametrize("chunk_size", [64, 1000, trace_stream.CHUNK_SIZE])
+def test_generate(chunk_size, tmp_path):
+    expected = expected_trace(2500, tmp_path)
+    f = io.BytesIO()
+    n_pkts, n_bytes = trace_stream.generate(
+        f, source(), trace_stream.LinkRateTiming(), n_pkts=2500,
+        chunk_size=chunk_size, report=False)
+    assert (n_pkts, n_bytes) == (2500, len(expected))
+    assert f.getvalue() == expected
+
+
+def test_duration():
+    # 60 byte packets at line rate: 84 bytes on the wire each
+    batches = trace_stream.timing(
+        trace_stream.template_source(PacketTemplate(Ether(), IPv4(), UDP()),
+                                     batch_size=1000),
+        trace_stream.LinkRateTiming(), duration=1e-3)
+    delta_t = np.concatenate([b[0] for b in batches])
+    t = np.cumsum(delta_t) - delta_t
+    assert t[-1] < 1e-3 * trace_writer.CLK_FREQ <= t[-1] + delta_t[-1]
+    assert len(delta_t) == int(np.ceil(1e-3 * 10e9 / (8 * 84)))
+
+
+def test_socket_sink(tmp_path):
+    expected = expected_trace(1000, tmp_path)
+    a, b = socket.socketpair()
+    received = []
+
+    def receive():
+        while True:
+            data = b.recv(65536)
+            if not data:
+                break
+            received.append(data)
+
+    t = threading.Thread(target=receive)
+    t.start()
+    with a:
+        trace_stream.generate(a, source(), trace_stream.LinkRateTiming(),
+                              n_pkts=1000, report=False)
+        a.shutdown(socket.SHUT_WR)
+    t.join()
+    b.close()
+    assert b"".join(received) == expected
@@ -0,0 +1,131 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Description:
+#
+# Writes valid traces, corrupts them and checks the validation reports.
+
+import json
+import numpy as np
+import pytest
+import trace_validate
+import trace_writer
+
+N = 1000
+
+
+def write(tmp_path, delta_t, len_wire=100, len_snap=None):
+    """Write a trace of N packets with given delta_t and lengths."""
+    filename = str(tmp_path / "a.trace")
+    trace_writer.write_trace(filename, np.broadcast_to(delta_t, N),
+                             np.full(N, len_wire),
+                             np.ones(trace_writer.PKT_SIZE_MAX,
+                                     dtype=np.uint8),
+                             None if len_snap is None else
+                             np.full(N, len_snap))
+    return filename
+
+
+def corrupt(filename, offset, value):
+    """Overwrite a byte of a trace file."""
+    with open(filename, "r+b") as f:
+        f.seek(offset)
+        f.write(bytes([value]))
+
+
+def test_valid(tmp_path):
+    # 100 byte packets take 15.5 clock cycles at 10 Gbps
+    report = trace_validate.validate(write(tmp_path, 16))
+    assert report.ok() and report.n_pkts == N
+    assert report.stats['offered_rate_bps'] == pytest.approx(
+        8 * 124 / 16 * trace_writer.CLK_FREQ)
+    assert report.stats['late_pkts'] == 0
+    assert sum(p['n_pkts'] for p in report.profile) == N
+
+    out = json.loads(report.json())
+    assert out['ok'] and out['n_pkts'] == N
+    assert report.text().endswith("OK")
+
+
+def test_infeasible(tmp_path):
+    # packets are sent back-to-back, the lateness grows by 7.5 clock cycles
+    # per packet
+    report = trace_validate.validate(write(tmp_path, 8))
+    err = report.errors['delta_t_infeasible']
+    assert err['count'] == N
+    assert err['indices'] == list(range(trace_validate.MAX_INDICES))
+    assert report.stats['max_lateness_us'] == pytest.approx(
+        (N - 1) * 7.5 / trace_writer.CLK_FREQ * 1e6)
+    assert report.text().endswith("FAILED")
+
+    # within tolerance
+    assert trace_validate.validate(write(tmp_path, 15)).ok()
+    assert not trace_validate.validate(write(tmp_path, 15),
+                                       tolerance=0).ok()
+
+
+def test_record_padding(tmp_path):
+    # records consist of the meta data word and 13 data words, the last
+    # 4 bytes are padding
+    filename = write(tmp_path, 16)
+    corrupt(filename, 8 * (14 * 5 + 13) + 6, 0x01)
+    report = trace_validate.validate(filename)
+    assert list(report.errors) == ['record_padding']
+    assert report.errors['record_padding']['indices'] == [5]
+
+
+def test_meta_data(tmp_path):
+    # set a reserved bit of the second record's meta data word
+    filename = write(tmp_path, 16, len_snap=64)
+    corrupt(filename, 8 * 9 + 5, 0x08)
+    report = trace_validate.validate(filename)
+    assert report.errors['reserved_bits']['indices'] == [1]
+
+
+def test_truncated(tmp_path):
+    filename = write(tmp_path, 16)
+    size = 8 * 14 * N
+    with open(filename, "r+b") as f:
+        f.truncate(size - 8)
+    report = trace_validate.validate(filename)
+    assert report.errors['truncated']['indices'] == [N - 1]
+    assert 'file_size' in report.errors
+
+    # trace padding exceeds 64 bytes
+    with open(filename, "r+b") as f:
+        f.truncate(size)
+        f.seek(size)
+        f.write(b"\xff" * trace_writer.TRACE_ALIGNMENT)
+    report = trace_validate.validate(filename)
+    assert list(report.errors) == ['trace_padding']
+
+
+def test_empty(tmp_path):
+    filename = str(tmp_path / "a.trace")
+    open(filename, "wb").close()
+    assert list(trace_validate.validate(filename).errors) == ['empty']
@@ -0,0 +1,98 @@
+"""Tests for trace_writer.py and trace_reader.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Encodes random packets to a trace file and decodes the file again with the
+# trace reader.
+
+import numpy as np
+import pytest
+import trace_reader
+import trace_writer
+
+
+def random_packets(n, seed=0):
+    """Return delta_t values, wire/snap lengths and data of random packets."""
+    rng = np.random.default_rng(seed)
+    delta_t = rng.integers(0, 1 << 32, n, dtype=np.uint64)
+    len_wire = rng.integers(1, trace_writer.PKT_SIZE_MAX + 1, n)
+    len_snap = np.minimum(rng.integers(0, trace_writer.PKT_SIZE_MAX + 1, n),
+                          len_wire)
+    data = rng.integers(0, 256, (n, trace_writer.PKT_SIZE_MAX),
+                        dtype=np.uint8)
+    return delta_t, len_wire, len_snap, data
+
+
+def test_round_trip(tmp_path):
+    delta_t, len_wire, len_snap, data = random_packets(3000)
+    filename = str(tmp_path / "a.trace")
+    with trace_writer.TraceWriter(filename) as wr:
+        for a in range(0, len(delta_t), 1000):
+            b = a + 1000
+            wr.write(delta_t[a:b], len_wire[a:b], data[a:b], len_snap[a:b])
+    assert wr.n_pkts == len(delta_t)
+
+    raw = trace_reader.open_trace(filename)
+    assert len(raw) % trace_writer.TRACE_ALIGNMENT == 0
+    w = trace_reader.words(raw)
+    offsets = trace_reader.record_offsets(w)
+    meta = w[offsets]
+    assert np.array_equal(trace_reader.delta_t(meta), delta_t)
+    assert np.array_equal(trace_reader.len_wire(meta), len_wire)
+    assert np.array_equal(trace_reader.len_snap(meta), len_snap)
+    for i, off in enumerate(offsets):
+        pkt = raw[8 * (off + 1):8 * (off + trace_reader.record_words(
+            len_snap[i]))]
+        assert np.array_equal(pkt[:len_snap[i]], data[i, :len_snap[i]])
+        assert not pkt[len_snap[i]:].any()
+
+    # the trace is padded with 0xFF bytes after the last record
+    end = 8 * (offsets[-1] + trace_reader.record_words(len_snap[-1]))
+    assert np.all(raw[end:] == 0xFF)
+
+
+def test_record_offsets_segments():
+    delta_t, len_wire, len_snap, data = random_packets(2000, seed=1)
+    encoded = trace_writer.encode(delta_t, len_wire, data, len_snap)
+    w = trace_reader.words(np.concatenate(
+        (encoded, trace_writer.padding(len(encoded)))))
+    expected = np.cumsum(trace_reader.record_words(len_snap)) - \
+        trace_reader.record_words(len_snap)
+
+    # records must be located regardless of how the trace is segmented
+    for segment_words in (trace_reader.MAX_RECORD_WORDS + 1, 1000,
+                          trace_reader.SEGMENT_WORDS, len(w) + 1):
+        assert np.array_equal(trace_reader.record_offsets(w, segment_words),
+                              expected)
+
+
+@pytest.mark.parametrize("delta_t,len_wire,len_snap", [
+    (1 << 32, 64, 64), (0, 60, 61), (0, 1519, 64)])
+def test_encode_rejects_invalid_packets(delta_t, len_wire, len_snap):
+    with pytest.raises(ValueError):
+        trace_writer.encode([delta_t], [len_wire],
+                            np.zeros(64, dtype=np.uint8), [len_snap])
@@ -0,0 +1,103 @@
+"""Tests for pcap_import.py."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Draws from the traffic models and compares the empirical mean rates and
+# size distributions with the models' parameters.
+
+import numpy as np
+import pytest
+import trace_writer
+from traffic_models import ConstantIAT, PoissonIAT, OnOffIAT, ParetoIAT, \
+    MmppIAT, FixedSize, UniformSize, EmpiricalSize, ImixSize, TrafficModel
+
+N = 200000
+
+
+@pytest.mark.parametrize("model, rate", [
+    (ConstantIAT(1e6), 1e6),
+    (PoissonIAT(1e6), 1e6),
+    # an 'off' period (mean 30 us) follows 1 in 41 arrivals
+    (OnOffIAT(4e6, 10e-6, 30e-6), 1.0 / (0.25e-6 + 30e-6 / 41)),
+    (ParetoIAT(1e6, alpha=2.5), 1e6),
+    # equal mean sojourn times in both states
+    (MmppIAT([0.5e6, 1.5e6], 1e-4), 1e6),
+])
+def test_iat_rate(model, rate):
+    rng = np.random.default_rng(0)
+    iat = np.concatenate([model.draw(N // 4, rng) for _ in range(4)])
+    assert len(iat) == N and np.all(iat >= 0)
+    assert N / iat.sum() == pytest.approx(rate, rel=0.05)
+
+
+def test_pareto_alpha():
+    with pytest.raises(ValueError):
+        ParetoIAT(1e6, alpha=1.0)
+
+
+def test_mmpp_continues():
+    # arrivals of consecutive draws are ordered and continue the process
+    model = MmppIAT([1e6, 1e5], [1e-4, 1e-3])
+    rng = np.random.default_rng(1)
+    iat = np.concatenate([model.draw(n, rng) for n in (0, 1, 1000, 37)])
+    assert len(iat) == 1038 and np.all(iat >= 0)
+
+
+@pytest.mark.parametrize("model", [
+    FixedSize(128), UniformSize(60, 100), ImixSize(),
+    EmpiricalSize([64, 256], [1, 3]),
+    EmpiricalSize([60, 64], [1, 1], bin_edges=[60, 64, 100]),
+])
+def test_size_pmf(model):
+    sizes, p = model.pmf()
+    assert p.sum() == pytest.approx(1.0)
+    drawn = model.draw(N, np.random.default_rng(0))
+    assert set(drawn.tolist()) <= set(sizes.tolist())
+    assert drawn.mean() == pytest.approx(np.dot(sizes, p), rel=0.01)
+
+
+def test_traffic_model():
+    # offered load exceeds the link rate
+    model = TrafficModel(PoissonIAT(20e6), ImixSize())
+    rng = np.random.default_rng(0)
+    delta_t, len_wire = [np.concatenate(a) for a in zip(
+        *[model.draw(1000, rng) for _ in range(50)])]
+    assert model.n_clipped > 0
+
+    # packets do not overlap (up to rounding) and rounding errors do not
+    # accumulate
+    t_tx = 8.0 * (len_wire + trace_writer.ETH_OVERHEAD) / \
+        trace_writer.MAX_DATARATE * trace_writer.CLK_FREQ
+    assert np.all(delta_t >= t_tx - 1)
+    assert model.quantizer.err_max <= 0.5
+    assert abs(delta_t.sum() - model._t) <= 0.5
+
+    # sizes are clipped to valid frame sizes
+    model = TrafficModel(ConstantIAT(1e3), UniformSize(0, 2000), size_min=64)
+    _, len_wire = model.draw(10000, rng)
+    assert len_wire.min() == 64
+    assert len_wire.max() == trace_writer.PKT_SIZE_MAX
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""Benchmark the throughput of the trace generation paths."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates traces of standard shapes through each available generation path
+# and measures how fast they are generated:
+#
+# shapes:
+#   - cbr64:   64 byte packets (60 bytes excluding FCS) at 10 Gbps line rate
+#   - imix:    IMIX packet sizes (7:4:1) at 10 Gbps line rate
+#   - cbr1518: 1518 byte packets (1514 bytes excluding FCS) at 10 Gbps line
+#              rate
+#   - flows1m: IMIX packets of 1M concurrent flows (see flow_workload.py)
+#
+# Packets are generated with their full data (headers and zero payload), so
+# that all paths write full-length records, as traces of captured traffic
+# contain.
+#
+# paths:
+#   - trace_writer:   packet batches written with trace_writer.TraceWriter
+#   - trace_stream:   packet batches written through the trace_stream.py
+#                     pipeline (encoder, chunker, sink)
+#   - pcap_import.py: PCAP file written with pcap_writer.py, converted by
+#                     pcap_import.py
+#   - pcap_import:    PCAP file written with pcap_writer.py, converted by the
+#                     compiled software/pcap/pcap_import tool
+#   - scapy:          packets written one by one with scapy's PcapWriter (as
+#                     the examples do), converted by pcap_import.py
+#
+# Each run is executed in a fresh process. For each run, the number of
+# packets per second, the trace bytes written per second, the peak resident
+# set size (of the benchmark process and the tools it runs, including the
+# Python interpreter) and the time until the first byte of the trace is
+# written are reported. All times include the setup of the shape (e.g. the
+# flow table). Paths whose dependencies are not available are skipped.
+#
+# Results are stored as JSON, together with the current git revision. Results
+# of an earlier run (e.g. of another commit) may be passed for comparison.
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pcap_import
+import pcap_writer
+import trace_stream
+import trace_writer
+from flow_workload import FlowTable, FlowWorkload, ZipfPopularity
+from pkt_template import PacketTemplate, Ether, IPv4, UDP
+from traffic_models import TrafficModel, PoissonIAT, ImixSize, PKT_SIZE_MIN
+
+SHAPES = ["cbr64", "imix", "cbr1518", "flows1m"]
+PATHS = ["trace_writer", "trace_stream", "pcap_import.py", "pcap_import",
+         "scapy"]
+
+# default number of packets per run
+N_PKTS = 1000000
+
+# default number of packets of scapy runs, which write packets one by one
+N_PKTS_SCAPY = 100000
+
+# compiled pcap_import tool
+PCAP_IMPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "..", "pcap", "pcap_import")
+
+# size of the blocks read from the compiled pcap_import tool
+READ_SIZE = 1 << 20
+
+
+def source(shape, seed):
+    """Return an endless source of timed packet batches of a given shape.
+
+    Yields tuples (delta_t, len_wire, data, len_snap) of packets with full
+    data.
+    """
+    rng = np.random.default_rng(seed)
+    if shape == "flows1m":
+        tmpl = PacketTemplate(Ether(), IPv4(), UDP(),
+                              pkt_len=trace_writer.PKT_SIZE_MAX)
+        flows = FlowTable(1000000, rng)
+        size = ImixSize()
+        model = TrafficModel(PoissonIAT(5e6), size,
+                             size_min=max(tmpl.hdr_len, PKT_SIZE_MIN))
+        workload = FlowWorkload(tmpl, flows, ZipfPopularity(1000000))
+        return workload.batches(model, rng, width=int(size.sizes.max()))
+
+    if shape == "imix":
+        tmpl = PacketTemplate(Ether(), IPv4(), UDP(),
+                              pkt_len=trace_writer.PKT_SIZE_MAX)
+        size = ImixSize()
+        pkt_len_func = size.draw
+        width = int(size.sizes.max())
+    else:
+        # packet lengths exclude the FCS
+        width = 60 if shape == "cbr64" else 1514
+        tmpl = PacketTemplate(Ether(), IPv4(), UDP(), pkt_len=width)
+        pkt_len_func = None
+    return trace_stream.timing(
+        trace_stream.template_source(tmpl, pkt_len_func=pkt_len_func,
+                                     seed=rng.integers(1 << 32),
+                                     width=width),
+        trace_stream.LinkRateTiming())
+
+
+def timestamps(batches):
+    """Add absolute timestamps (nanoseconds) to timed packet batches.
+
+    Yields tuples (ts_ns, len_wire, data, len_snap).
+    """
+    t = 0
+    for delta_t, len_wire, data, len_snap in batches:
+        t_pkts = t + np.cumsum(delta_t, dtype=np.int64) - delta_t
+        t += int(np.sum(delta_t, dtype=np.int64))
+        yield np.rint(t_pkts * (1e9 / trace_writer.CLK_FREQ)).astype(
+            np.uint64), len_wire, data, len_snap
+
+
+class Sink(object):
+    """Binary file object recording when its first byte is written."""
+
+    def __init__(self, filename):
+        """Open file for writing."""
+        self._f = open(filename, "wb")
+        self.t_first = None
+        self.size = 0
+
+    def write(self, b):
+        """Write bytes."""
+        if self.t_first is None and len(b) > 0:
+            self.t_first = time.perf_counter()
+        self.size += len(b)
+        return self._f.write(b)
+
+    def close(self):
+        """Close file."""
+        self._f.close()
+
+
+def run_trace_writer(batches, sink, tmpdir):
+    """Write packet batches with trace_writer.TraceWriter."""
+    with trace_writer.TraceWriter(sink) as wr:
+        for delta_t, len_wire, data, len_snap in batches:
+            wr.write(delta_t, len_wire, data, len_snap)
+
+
+def run_trace_stream(batches, sink, tmpdir):
+    """Write packet batches through the trace_stream.py pipeline."""
+    trace_stream.write(trace_stream.chunker(trace_stream.encoder(batches)),
+                       sink, report=False)
+
+
+def write_pcap(batches, filename):
+    """Write packet batches to a PCAP file with pcap_writer.py."""
+    with pcap_writer.PcapWriter(filename) as wr:
+        for ts_ns, len_wire, data, len_snap in timestamps(batches):
+            wr.write(ts_ns, len_wire, data, len_snap)
+
+
+def run_pcap_import_py(batches, sink, tmpdir):
+    """Write a PCAP file and convert it with pcap_import.py."""
+    filename = os.path.join(tmpdir, "bench.pcap")
+    write_pcap(batches, filename)
+    pcap_import.convert(filename, sink)
+
+
+def run_pcap_import(batches, sink, tmpdir):
+    """Write a PCAP file and convert it with the compiled pcap_import tool.
+
+    The tool writes the trace to a named pipe, so that the time of the first
+    byte can be observed.
+    """
+    filename = os.path.join(tmpdir, "bench.pcap")
+    write_pcap(batches, filename)
+
+    fifo = os.path.join(tmpdir, "bench.fifo")
+    os.mkfifo(fifo)
+    proc = subprocess.Popen([PCAP_IMPORT, filename, fifo],
+                            stdout=subprocess.DEVNULL)
+    with open(fifo, "rb") as f:
+        while True:
+            b = f.read(READ_SIZE)
+            if not b:
+                break
+            sink.write(b)
+    if proc.wait() != 0:
+        raise RuntimeError("pcap_import failed")
+
+
+def run_scapy(batches, sink, tmpdir):
+    """Write packets one by one with scapy's PcapWriter and convert the PCAP
+    file with pcap_import.py."""
+    from scapy.all import Ether, PcapWriter
+
+    filename = os.path.join(tmpdir, "bench.pcap")
+    with PcapWriter(filename, nano=True) as wr:
+        for ts_ns, len_wire, data, len_snap in timestamps(batches):
+            data = np.broadcast_to(data, (len(ts_ns), np.shape(data)[-1]))
+            for i in range(len(ts_ns)):
+                b = data[i].tobytes()[:len_wire[i]]
+                pkt = Ether(b + bytes(int(len_wire[i]) - len(b)))
+                pkt.time = int(ts_ns[i]) / 1e9
+                wr.write(pkt)
+    pcap_import.convert(filename, sink)
+
+
+RUN_FUNCS = {
+    "trace_writer": run_trace_writer,
+    "trace_stream": run_trace_stream,
+    "pcap_import.py": run_pcap_import_py,
+    "pcap_import": run_pcap_import,
+    "scapy": run_scapy,
+}
+
+
+def unavailable(path):
+    """Return why a path cannot be benchmarked, or None if it can."""
+    if path == "pcap_import" and not os.access(PCAP_IMPORT, os.X_OK):
+        return "%s not found (run make in software/pcap)" % \
+            os.path.normpath(PCAP_IMPORT)
+    if path == "scapy":
+        try:
+            import scapy.all  # noqa: F401
+        except ImportError:
+            return "scapy is not installed"
+    return None
+
+
+def _run(job):
+    """Execute a single run (executed in a fresh process)."""
+    shape, path, n_pkts, seed, tmpdir = job
+    sink = Sink(os.path.join(tmpdir, "bench.trace"))
+    t_start = time.perf_counter()
+    try:
+        batches = trace_stream.limit(source(shape, seed), n_pkts=n_pkts)
+        RUN_FUNCS[path](batches, sink, tmpdir)
+    finally:
+        sink.close()
+    t = time.perf_counter() - t_start
+
+    # ru_maxrss is given in kilobytes
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {
+        "shape": shape,
+        "path": path,
+        "n_pkts": n_pkts,
+        "bytes": sink.size,
+        "seconds": t,
+        "pkts_per_s": n_pkts / t,
+        "mb_per_s": sink.size / t / 1e6,
+        "rss_peak_mb": rss / 1024.0,
+        "first_byte_s": None if sink.t_first is None else
+        sink.t_first - t_start,
+    }
+
+
+def run(shape, path, n_pkts, seed=0, tmpdir=None):
+    """Benchmark a path with a given shape. Returns a dict of results."""
+    reason = unavailable(path)
+    if reason is not None:
+        return {"shape": shape, "path": path, "skipped": reason}
+
+    tmpdir = tempfile.mkdtemp(dir=tmpdir)
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=ctx) as ex:
+            return ex.submit(_run, (shape, path, n_pkts, seed, tmpdir)) \
+                .result()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def revision():
+    """Return the git revision of the working tree, or None."""
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def text(results, baseline=None):
+    """Return results as a human-readable table.
+
+    If results of a 'baseline' run are given, the packet rates are compared.
+    """
+    ref = {}
+    for r in (baseline or {}).get("results", []):
+        if "skipped" not in r:
+            ref[(r["shape"], r["path"])] = r["pkts_per_s"]
+
+    lines = ["%-8s %-15s %9s %10s %9s %9s %8s%s" % (
+        "shape", "path", "packets", "pkts/s", "MB/s", "RSS (MB)", "TTFB (s)",
+        "  vs. baseline" if baseline else "")]
+    for r in results:
+        if "skipped" in r:
+            lines.append("%-8s %-15s skipped: %s" % (r["shape"], r["path"],
+                                                     r["skipped"]))
+            continue
+        line = "%-8s %-15s %9d %10.0f %9.1f %9.1f %8.3f" % (
+            r["shape"], r["path"], r["n_pkts"], r["pkts_per_s"],
+            r["mb_per_s"], r["rss_peak_mb"], r["first_byte_s"] or 0.0)
+        key = (r["shape"], r["path"])
+        if key in ref:
+            line += "  %+.1f %%" % (100.0 * (r["pkts_per_s"] / ref[key] - 1))
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the throughput of the trace generation paths.")
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES,
+                        help="trace shapes (default: all)")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS,
+                        help="generation paths (default: all)")
+    parser.add_argument("--pkts", type=int, default=N_PKTS,
+                        help="number of packets per run (default: %d)" %
+                        N_PKTS)
+    parser.add_argument("--pkts-scapy", type=int, default=N_PKTS_SCAPY,
+                        help="number of packets of scapy runs (default: " +
+                        "%d)" % N_PKTS_SCAPY)
+    parser.add_argument("--output", help="JSON file the results are " +
+                        "written to")
+    parser.add_argument("--compare", help="JSON file of an earlier run the " +
+                        "results are compared to")
+    parser.add_argument("--tmpdir", help="directory for temporary files " +
+                        "(default: system default)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    if args.pkts < 1 or args.pkts_scapy < 1:
+        parser.error("number of packets must be positive")
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = []
+    for shape in args.shapes:
+        for path in args.paths:
+            n_pkts = args.pkts_scapy if path == "scapy" else args.pkts
+            sys.stderr.write("%s/%s ...\n" % (shape, path))
+            results.append(run(shape, path, n_pkts, args.seed, args.tmpdir))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({
+                "revision": revision(),
+                "date": datetime.datetime.now().isoformat(),
+                "host": platform.node(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+
+    print(text(results, baseline))
+    if baseline is not None:
+        print("baseline: %s (%s)" % (baseline.get("revision"),
+                                     baseline.get("date")))
+
+
+if __name__ == "__main__":
+    main()
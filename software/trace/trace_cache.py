@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Cache for generated trace and PCAP files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Stores generated trace and PCAP files in a local cache directory, so that
+# traces that are generated again with the same generator, parameters and seed
+# (e.g. by nightly measurement runs) are available instantly. Cache entries are
+# identified by a SHA-256 hash of the generator name, its parameters, the seed
+# and the code version, which is a hash of the contents of the generator's
+# source files (by default all Python files of this directory).
+#
+# Files are placed into and taken from the cache as reflinks (copy-on-write
+# clones on file systems supporting them) or, if that is not possible, as
+# copies. Hard links are not used: the cached file and the user's file would
+# share an inode, so writing the user's file in place (e.g. by trace_rescale.py
+# or by generating it again) would corrupt the cache entry. Cached files are
+# read-only. Statistics of the cached files are stored alongside them.
+#
+# The total size of the cache is bounded: when an entry is added, least
+# recently used entries are removed until the cache size is below the limit.
+# The modification time of an entry's meta data file is its last use time.
+#
+# Usage from the command line (the output file name is replaced by a
+# placeholder when calculating the key):
+#
+#   trace_cache.py run out.trace -- ./flow_workload.py out.trace --seed 1
+
+import argparse
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import pcap_reader
+import trace_edit
+import trace_index
+import trace_reader
+import trace_rescale
+
+# default cache directory
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                        os.path.expanduser("~/.cache")),
+                         "fluent10g", "traces")
+
+# environment variable overriding the default cache directory
+CACHE_DIR_ENV = "FLUENT10G_TRACE_CACHE"
+
+# default maximum cache size in bytes
+MAX_SIZE = 16 << 30
+
+# ioctl cloning a file (Linux, FICLONE)
+FICLONE = 0x40049409
+
+# name of the cached file and of the meta data file in an entry's directory
+DATA_NAME = "data"
+META_NAME = "meta.json"
+
+
+def code_version(files=None):
+    """Return a hash of the contents of source files.
+
+    'files' defaults to all Python files in the directory of this module.
+    """
+    if files is None:
+        files = glob.glob(os.path.join(os.path.dirname(
+            os.path.abspath(__file__)), "*.py"))
+    h = hashlib.sha256()
+    for filename in sorted(files):
+        with open(filename, "rb") as f:
+            h.update(os.path.basename(filename).encode() + b"\0")
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def make_key(generator, params, seed=None, version=None):
+    """Return the cache key of generator parameters and seed.
+
+    'params' must be serializable to JSON. 'version' defaults to
+    code_version().
+    """
+    if version is None:
+        version = code_version()
+    desc = json.dumps({'generator': generator, 'params': params,
+                       'seed': seed, 'version': version}, sort_keys=True)
+    return hashlib.sha256(desc.encode()).hexdigest()
+
+
+def _reflink(src, dst):
+    """Clone file 'src' as 'dst'. Returns whether cloning is supported."""
+    fd_in = os.open(src, os.O_RDONLY)
+    try:
+        fd_out = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            fcntl.ioctl(fd_out, FICLONE, fd_in)
+            return True
+        except OSError:
+            return False
+        finally:
+            os.close(fd_out)
+    finally:
+        os.close(fd_in)
+
+
+def copy_file(src, dst):
+    """Copy file 'src' to a new, writable file 'dst' (reflink if possible).
+
+    Returns the method used ("reflink" or "copy").
+    """
+    tmp = "%s.tmp%d" % (dst, os.getpid())
+    try:
+        if _reflink(src, tmp):
+            method = "reflink"
+        else:
+            with open(src, "rb") as f_in, open(tmp, "wb") as f_out:
+                trace_edit.copy(f_in.fileno(), f_out.fileno(), 0,
+                                os.fstat(f_in.fileno()).st_size)
+            method = "copy"
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return method
+
+
+def file_stats(filename):
+    """Return statistics of a trace or PCAP file."""
+    if not trace_rescale.is_pcap(filename):
+        # the index itself is not stored, it would count against the cache
+        # size
+        w = trace_reader.words(trace_reader.open_trace(filename))
+        meta = w[trace_reader.record_offsets(w)]
+        return trace_index.trace_stats(trace_reader.delta_t(meta),
+                                       trace_reader.len_wire(meta),
+                                       trace_reader.len_snap(meta))
+    pcap = pcap_reader.PcapFile(filename)
+    ts_ns = pcap.ts_ns
+    return {
+        'n_pkts': pcap.n_pkts,
+        'bytes_wire': int(pcap.origlen.sum()),
+        'bytes_snap': int(pcap.caplen.sum()),
+        'duration': float(ts_ns[-1] - ts_ns[0]) / 1e9
+        if pcap.n_pkts > 0 else 0.0,
+    }
+
+
+class Cache(object):
+    """Directory of cached trace and PCAP files."""
+
+    def __init__(self, directory=None, max_size=MAX_SIZE):
+        """Open cache directory (created if it does not exist)."""
+        if directory is None:
+            directory = os.environ.get(CACHE_DIR_ENV, CACHE_DIR)
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, name=""):
+        """Return the path of an entry (or of a file within an entry)."""
+        return os.path.join(self.directory, key, name)
+
+    def get(self, key, filename):
+        """Place a cached file at 'filename'.
+
+        Returns the entry's meta data (including the file's statistics) or
+        None, if the key is not cached.
+        """
+        try:
+            with open(self._path(key, META_NAME)) as f:
+                meta = json.load(f)
+            copy_file(self._path(key, DATA_NAME), filename)
+        except (OSError, ValueError):
+            return None
+
+        os.utime(self._path(key, META_NAME))
+        return meta
+
+    def put(self, key, filename, info=None):
+        """Add a file to the cache.
+
+        'info' is additional meta data (e.g. the generator parameters).
+        Returns the entry's meta data or None, if the file exceeds the
+        maximum cache size.
+        """
+        # the entry would be evicted right away
+        if os.path.getsize(filename) > self.max_size:
+            return None
+
+        # the entry is assembled in a temporary directory and renamed, so that
+        # concurrent readers never see incomplete entries
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix=".tmp")
+        try:
+            data = os.path.join(tmp, DATA_NAME)
+            meta = {'key': key, 'method': copy_file(filename, data),
+                    'created': time.time()}
+            os.chmod(data, 0o444)
+            meta['stats'] = file_stats(data)
+            meta['size'] = sum(os.path.getsize(os.path.join(tmp, name))
+                               for name in os.listdir(tmp))
+            meta.update(info or {})
+            with open(os.path.join(tmp, META_NAME), "w") as f:
+                json.dump(meta, f, indent=2)
+            try:
+                os.rename(tmp, self._path(key))
+            except OSError:
+                # entry has been added concurrently
+                pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+        return meta
+
+    def entries(self):
+        """Return the meta data of all entries, least recently used first."""
+        entries = []
+        for key in os.listdir(self.directory):
+            try:
+                path = self._path(key, META_NAME)
+                with open(path) as f:
+                    meta = json.load(f)
+                meta['last_used'] = os.path.getmtime(path)
+            except (OSError, ValueError):
+                continue
+            entries.append(meta)
+        return sorted(entries, key=lambda meta: meta['last_used'])
+
+    def size(self):
+        """Return the total size of all entries in bytes."""
+        return sum(meta['size'] for meta in self.entries())
+
+    def remove(self, key):
+        """Remove an entry."""
+        shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def evict(self, max_size=None):
+        """Remove least recently used entries until the size limit is met."""
+        if max_size is None:
+            max_size = self.max_size
+        entries = self.entries()
+        size = sum(meta['size'] for meta in entries)
+        for meta in entries:
+            if size <= max_size:
+                break
+            self.remove(meta['key'])
+            size -= meta['size']
+
+    def cached(self, filename, generate, generator, params, seed=None,
+               version=None):
+        """Place a cached file at 'filename' or generate and cache it.
+
+        'generate(filename)' creates the file. Returns the entry's meta data
+        (None, if the generated file could not be cached) and whether it has
+        been taken from the cache.
+        """
+        key = make_key(generator, params, seed, version)
+        meta = self.get(key, filename)
+        if meta is not None:
+            return meta, True
+        generate(filename)
+        return self.put(key, filename, {'generator': generator,
+                                        'params': params, 'seed': seed}), False
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cache generated trace and PCAP files.")
+    parser.add_argument("--cache-dir",
+                        help="cache directory (default: $%s or %s)" %
+                        (CACHE_DIR_ENV, CACHE_DIR))
+    parser.add_argument("--max-size", type=float,
+                        default=MAX_SIZE / float(1 << 30),
+                        help="maximum cache size in GiB (default: %g)" %
+                        (MAX_SIZE / float(1 << 30)))
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+
+    parser_run = subparsers.add_parser(
+        "run", help="run a generator command, unless its output is cached")
+    parser_run.add_argument("output", help="output file of the command")
+    parser_run.add_argument("command", nargs=argparse.REMAINDER,
+                            help="generator command (after '--')")
+
+    subparsers.add_parser("list", help="list cache entries")
+    subparsers.add_parser("clear", help="remove all cache entries")
+    args = parser.parse_args()
+
+    cache = Cache(args.cache_dir, int(args.max_size * (1 << 30)))
+
+    if args.cmd == "run":
+        cmd = args.command[1:] if args.command[:1] == ["--"] else \
+            args.command
+        if not cmd:
+            parser.error("no generator command given")
+
+        # the code version includes Python files passed to the command
+        files = [a for a in cmd if a.endswith(".py") and os.path.isfile(a)]
+        version = code_version(None) + code_version(files)
+        params = [a if a != args.output else "{output}" for a in cmd]
+
+        def generate(filename):
+            subprocess.check_call(cmd)
+
+        meta, hit = cache.cached(args.output, generate, "command", params,
+                                 version=version)
+        if meta is None:
+            print("%s: generated, exceeds maximum cache size" % args.output)
+            stats = file_stats(args.output)
+        else:
+            print("%s: %s (%s)" % (args.output, "cache hit" if hit else
+                                   "generated and cached", meta['key'][:16]))
+            stats = meta['stats']
+        for name, value in stats.items():
+            print("%s: %s" % (name, value))
+    elif args.cmd == "list":
+        for meta in cache.entries():
+            print("%s %12d %s %s" % (
+                meta['key'][:16], meta['size'],
+                time.strftime("%Y-%m-%d %H:%M:%S",
+                              time.localtime(meta['last_used'])),
+                " ".join(str(p) for p in meta.get('params', []))))
+        print("total: %d bytes" % cache.size())
+    else:
+        cache.evict(0)
+
+
+if __name__ == "__main__":
+    main()
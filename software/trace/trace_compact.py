@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Truncate the stored packet data of trace files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Reduces the snap length of the packets of a trace file, while keeping their
+# wire length. The hardware appends zero bytes to packets whose snap length is
+# smaller than their wire length, so trailing zero bytes of the packet data do
+# not need to be stored in the trace. The snap length is either truncated to a
+# fixed length or to the last non-zero byte of each packet's data. Smaller
+# traces require less space in the DDR3 replay memory and less data to be
+# transferred via PCIe.
+#
+# The PCIe transfer volume is estimated from the number of transaction layer
+# packets (TLPs) the host-to-card DMA needs to transfer the trace (see
+# replay_plan.py).
+
+import argparse
+import numpy as np
+import replay_plan
+import trace_merge
+import trace_reader
+import trace_writer
+
+
+def last_nonzero(w, offsets, len_snap):
+    """Return the number of bytes up to the last non-zero data byte.
+
+    'offsets' are the word offsets of consecutive records in the words 'w'.
+    """
+    data_words = trace_reader.record_words(len_snap) - 1
+    base = int(offsets[0]) + 1
+    region = w[base:int(offsets[-1]) + 1 + int(data_words[-1])]
+
+    # position of the last non-zero word of each record's data (meta data
+    # words excluded). a sentinel is appended for records without data at the
+    # end of the region
+    nz = np.append(np.where(region != 0, np.arange(len(region)), -1), -1)
+    nz[offsets[1:] - base] = -1
+    start = offsets - base + 1
+    last_word = np.maximum.reduceat(nz, start)
+
+    # position of the last non-zero byte within the word
+    found = last_word >= 0
+    b = region[last_word[found]].view(np.uint8).reshape(-1, 8)
+    last_byte = 7 - np.argmax(b[:, ::-1] != 0, axis=1)
+
+    n = np.zeros(len(offsets), dtype=np.int64)
+    n[found] = 8 * (last_word[found] - start[found]) + last_byte + 1
+    return np.minimum(n, len_snap)
+
+
+class Result(object):
+    """Result of a compaction."""
+
+    def __init__(self):
+        """Initialize result."""
+        self.n_pkts = 0
+        self.n_truncated = 0
+        self.bytes_snap_in = 0
+        self.bytes_snap_out = 0
+        self.size_in = 0
+        self.size_out = 0
+
+    def text(self):
+        """Return the result as human-readable text."""
+        def saved(a, b):
+            return "%d -> %d bytes (saved %d bytes, %.1f %%)" % (
+                a, b, a - b, 100.0 * (a - b) / max(a, 1))
+
+        return "\n".join([
+            "packets: %d (%d truncated)" % (self.n_pkts, self.n_truncated),
+            "snap data: " + saved(self.bytes_snap_in, self.bytes_snap_out),
+            "DDR3 memory: " + saved(self.size_in, self.size_out),
+            "PCIe transfer: " + saved(replay_plan.pcie_bytes(self.size_in),
+                                      replay_plan.pcie_bytes(self.size_out)),
+        ])
+
+
+def compact(filename_in, filename_out, length=None,
+            batch_size=trace_writer.BATCH_SIZE):
+    """Truncate the snap length of all packets of a trace file.
+
+    The snap length is truncated to 'length' bytes or, if 'length' is None, to
+    the last non-zero byte of each packet's data. Returns a Result.
+    """
+    data = trace_reader.open_trace(filename_in)
+    w = trace_reader.words(data)
+    offsets = trace_reader.record_offsets(w)
+
+    res = Result()
+    res.size_in = len(data)
+    with trace_writer.TraceWriter(filename_out) as wr:
+        for a in range(0, len(offsets), batch_size):
+            off = offsets[a:a + batch_size]
+            meta = w[off]
+            len_snap = trace_reader.len_snap(meta)
+            if length is None:
+                snap = last_nonzero(w, off, len_snap)
+            else:
+                snap = np.minimum(len_snap, length)
+
+            rec_bytes = 8 * trace_reader.record_words(snap)
+            pos = np.cumsum(rec_bytes) - rec_bytes
+            out = np.zeros(int(rec_bytes.sum()), dtype=np.uint8)
+            out.view('<u8')[pos // 8] = trace_writer.meta(
+                trace_reader.delta_t(meta), snap, trace_reader.len_wire(meta))
+            trace_merge.copy_ranges(out, pos + 8, data, 8 * off + 8, snap)
+            wr.write_encoded(out, len(off))
+
+            res.n_truncated += int(np.count_nonzero(snap < len_snap))
+            res.bytes_snap_in += int(len_snap.sum())
+            res.bytes_snap_out += int(snap.sum())
+        res.n_pkts = wr.n_pkts
+    res.size_out = wr.size
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Truncate the stored packet data of a trace file.")
+    parser.add_argument("input", help="input trace file")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("--length", type=int,
+                        help="snap length in bytes (default: truncate at " +
+                        "the last non-zero byte of each packet)")
+    args = parser.parse_args()
+
+    if args.length is not None and args.length < 0:
+        parser.error("snap length must not be negative")
+    res = compact(args.input, args.output, args.length)
+    print(res.text())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Concatenate, repeat and slice trace files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Builds a trace file from pieces of other trace files: traces (or packet/time
+# ranges of them, located via their index, see trace_index.py) are
+# concatenated and the result may be repeated multiple times. Records are
+# copied in bulk from file to file in the kernel (copy_file_range(), with
+# sendfile() and read()/write() as fallbacks).
+#
+# By default, records are copied unmodified: the delta_t of the last packet of
+# each piece remains the time until the packet that followed it in its
+# original trace (for whole traces: the time until the trace is replayed
+# again), so that the timing of repeated pieces is preserved. Note that for
+# traces converted by pcap_import, the delta_t of the last packet is a fixed
+# approximation (DELTA_T_LAST, the transmission time of a maximum size
+# packet), which is kept as well. If a gap between the pieces is given, the
+# delta_t of the last packet of each piece is set to the transmission time of
+# the packet itself (at 10 Gbps, including Ethernet protocol overhead) plus the
+# gap.
+
+import argparse
+import math
+import os
+import struct
+import trace_index
+import trace_reader
+import trace_writer
+
+# maximum number of bytes copied by a single system call
+COPY_SIZE = 1 << 30
+
+
+class Piece(object):
+    """Packet range [start, stop) of a trace file."""
+
+    def __init__(self, trace_filename, start=None, stop=None, t_start=None,
+                 t_stop=None):
+        """Initialize piece by packet numbers or times (seconds)."""
+        self.index = trace_index.load(trace_filename)
+        self.start, self.stop = self.index.packet_range(start, stop, t_start,
+                                                        t_stop)
+
+    @property
+    def n_pkts(self):
+        """Number of packets of the piece."""
+        return self.stop - self.start
+
+
+def tx_cycles(len_wire):
+    """Return the transmission time (clock cycles) of a packet at 10 Gbps."""
+    return int(math.ceil(8.0 * (len_wire + trace_writer.ETH_OVERHEAD) /
+                         trace_writer.MAX_DATARATE * trace_writer.CLK_FREQ))
+
+
+def copy(fd_in, fd_out, offset, count):
+    """Append 'count' bytes at 'offset' of one file to another file."""
+    while count > 0:
+        n = min(count, COPY_SIZE)
+        try:
+            n = os.copy_file_range(fd_in, fd_out, n, offset)
+        except (AttributeError, OSError):
+            try:
+                n = os.sendfile(fd_out, fd_in, offset, n)
+            except OSError:
+                n = os.write(fd_out, os.pread(fd_in, n, offset))
+        if n == 0:
+            raise IOError("unexpected end of file")
+        offset += n
+        count -= n
+
+
+def write(filename, pieces, repeat=1, gap=None):
+    """Write pieces to a trace file, repeat them 'repeat' times.
+
+    If 'gap' is given, it is the time (clock cycles) between the end of the
+    last packet of a piece and the first packet of the next one. Otherwise,
+    the delta_t of the last packet of each piece is not modified. Returns the
+    number of packets written.
+    """
+    pieces = [p for p in pieces if p.n_pkts > 0]
+    fds = {}
+    fd_out = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    size = 0
+    n_pkts = 0
+    try:
+        for _ in range(repeat):
+            for piece in pieces:
+                idx = piece.index
+                if idx.trace_filename not in fds:
+                    fds[idx.trace_filename] = os.open(idx.trace_filename,
+                                                      os.O_RDONLY)
+                fd_in = fds[idx.trace_filename]
+                a, b = idx.byte_range(piece.start, piece.stop)
+                last = idx.seek_packet(piece.stop - 1)
+
+                # records preceding the last one are copied unmodified
+                copy(fd_in, fd_out, a, last - a)
+
+                # rewrite meta data word of the last record
+                meta, = struct.unpack("<Q", os.pread(fd_in, 8, last))
+                if gap is not None:
+                    delta_t = tx_cycles(int(trace_reader.len_wire(meta))) + \
+                        gap
+                    if delta_t > 0xFFFFFFFF:
+                        raise ValueError("gap exceeds maximum delta_t")
+                    meta = (meta & 0xFFFFFFFF00000000) | delta_t
+                os.write(fd_out, struct.pack("<Q", meta))
+                copy(fd_in, fd_out, last + 8, b - last - 8)
+
+                size += b - a
+                n_pkts += piece.n_pkts
+
+        os.write(fd_out, trace_writer.padding(size).tobytes())
+    finally:
+        os.close(fd_out)
+        for fd in fds.values():
+            os.close(fd)
+    return n_pkts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Concatenate, repeat and slice trace files.")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("inputs", nargs="+", help="input trace files")
+    parser.add_argument("--start", type=int,
+                        help="first packet of each input trace")
+    parser.add_argument("--stop", type=int,
+                        help="packet following the last packet of each " +
+                        "input trace")
+    parser.add_argument("--t-start", type=float,
+                        help="start time in seconds of each input trace")
+    parser.add_argument("--t-stop", type=float,
+                        help="end time in seconds of each input trace")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="number of repetitions (default: 1)")
+    parser.add_argument("--gap", type=float, default=None,
+                        help="idle time in seconds between the end of a " +
+                        "trace and the start of the next one (default: " +
+                        "keep the original delta_t of the last packet of " +
+                        "each trace, e.g. the fixed %d clock cycles set "
+                        "by pcap_import)" % trace_writer.DELTA_T_LAST)
+    args = parser.parse_args()
+
+    pieces = [Piece(filename, args.start, args.stop, args.t_start,
+                    args.t_stop) for filename in args.inputs]
+    gap = None
+    if args.gap is not None:
+        gap = int(round(args.gap * trace_writer.CLK_FREQ))
+    n_pkts = write(args.output, pieces, args.repeat, gap)
+    print("Successfully wrote %d packets to trace file!" % n_pkts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Random-access offset index for trace files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Builds an index of a trace file, which is stored in a sidecar file next to
+# the trace ('<trace>.idx'). The index contains the byte offset and the
+# transmission time (clock cycles since the first packet) of each packet, so
+# that packets can be located by number or time with a binary search instead
+# of scanning the whole trace. Trace statistics are cached in the index as
+# well.
+#
+# Index file format:
+#
+# - bytes 0-7:   magic number "FLTIDX01"
+# - bytes 8-15:  length of the JSON header in bytes (uint64, little endian)
+# - JSON header: trace file size and modification time (to detect outdated
+#                indices), number of packets and trace statistics. the header
+#                is padded with spaces, so that the arrays are 64 byte aligned
+# - offsets:     n + 1 int64 values, byte offset of each packet's record. the
+#                last value is the end of the last record
+# - times:       n + 1 int64 values, transmission time of each packet. the last
+#                value is the total trace duration
+#
+# The arrays are mapped into memory when the index is loaded.
+
+import argparse
+import json
+import os
+import struct
+import numpy as np
+import trace_reader
+import trace_writer
+
+# magic number of index files
+INDEX_MAGIC = b"FLTIDX01"
+
+# file name extension of index files
+INDEX_EXTENSION = ".idx"
+
+
+def index_filename(trace_filename):
+    """Return the file name of a trace's index."""
+    return trace_filename + INDEX_EXTENSION
+
+
+class TraceIndex(object):
+    """Index of a trace file."""
+
+    def __init__(self, trace_filename, offsets, times, stats):
+        """Initialize index (use build() or load() to create indices)."""
+        self.trace_filename = trace_filename
+        self.offsets = offsets
+        self.times = times
+        self.stats = stats
+        self.n_pkts = len(offsets) - 1
+
+    def seek_packet(self, i):
+        """Return the byte offset of packet 'i'."""
+        return int(self.offsets[i])
+
+    def seek_time(self, t):
+        """Return the number of the first packet transmitted at or after 't'.
+
+        't' is given in clock cycles since the first packet.
+        """
+        return int(np.searchsorted(self.times[:-1], t, side='left'))
+
+    def packet_range(self, start=None, stop=None, t_start=None, t_stop=None):
+        """Return the packet range [start, stop) given packet numbers or times.
+
+        Times are given in seconds since the first packet.
+        """
+        if t_start is not None:
+            start = self.seek_time(t_start * trace_writer.CLK_FREQ)
+        if t_stop is not None:
+            stop = self.seek_time(t_stop * trace_writer.CLK_FREQ)
+        start, stop, _ = slice(start, stop).indices(self.n_pkts)
+        return start, max(start, stop)
+
+    def byte_range(self, start, stop):
+        """Return the byte range of the records of packets [start, stop)."""
+        return int(self.offsets[start]), int(self.offsets[stop])
+
+    def duration(self, start, stop):
+        """Return the duration (clock cycles) of packets [start, stop)."""
+        return int(self.times[stop] - self.times[start])
+
+    def extract(self, filename, start, stop):
+        """Write the packets [start, stop) to a new trace file.
+
+        The records are copied unmodified. In particular, the last packet's
+        delta_t still is the time until the packet following it in the
+        original trace.
+        """
+        data = trace_reader.open_trace(self.trace_filename)
+        a, b = self.byte_range(start, stop)
+        with trace_writer.TraceWriter(filename) as wr:
+            wr.write_encoded(data[a:b], stop - start)
+
+
+def _trace_id(trace_filename):
+    """Return size and modification time of a trace file."""
+    st = os.stat(trace_filename)
+    return st.st_size, st.st_mtime_ns
+
+
+def trace_stats(delta_t, len_wire, len_snap):
+    """Return statistics of the packets of a trace."""
+    n_pkts = len(delta_t)
+    duration = int(np.sum(delta_t))
+    bytes_wire = int(np.sum(len_wire))
+    return {
+        'n_pkts': n_pkts,
+        'bytes_wire': bytes_wire,
+        'bytes_snap': int(np.sum(len_snap)),
+        'duration': duration / trace_writer.CLK_FREQ,
+        'mean_rate_bps': 8.0 * (bytes_wire + trace_writer.ETH_OVERHEAD *
+                                n_pkts) /
+        max(duration, 1) * trace_writer.CLK_FREQ,
+        'mean_rate_pps': n_pkts / max(duration, 1) * trace_writer.CLK_FREQ,
+    }
+
+
+def build(trace_filename, filename=None):
+    """Build the index of a trace and store it. Returns a TraceIndex."""
+    if filename is None:
+        filename = index_filename(trace_filename)
+
+    size, mtime = _trace_id(trace_filename)
+    w = trace_reader.words(trace_reader.open_trace(trace_filename))
+    offsets_w = trace_reader.record_offsets(w)
+
+    meta = w[offsets_w]
+    delta_t = trace_reader.delta_t(meta)
+    len_snap = trace_reader.len_snap(meta)
+    len_wire = trace_reader.len_wire(meta)
+
+    offsets = np.empty(len(offsets_w) + 1, dtype='<i8')
+    offsets[:-1] = 8 * offsets_w
+    offsets[-1] = 8 * (offsets_w[-1] + trace_reader.record_words(
+        len_snap[-1])) if len(offsets_w) else 0
+    times = np.zeros(len(offsets_w) + 1, dtype='<i8')
+    np.cumsum(delta_t, out=times[1:])
+
+    stats = trace_stats(delta_t, len_wire, len_snap)
+
+    hdr = json.dumps({'trace_size': size, 'trace_mtime_ns': mtime,
+                      'n_pkts': len(offsets_w), 'stats': stats}).encode()
+    hdr += b" " * (-(len(hdr) + 16) % 64)
+
+    # the index is written to a temporary file and renamed, so that concurrent
+    # readers never see an incomplete index
+    tmp = "%s.tmp%d" % (filename, os.getpid())
+    try:
+        with open(tmp, "wb") as f:
+            f.write(INDEX_MAGIC + struct.pack("<Q", len(hdr)) + hdr)
+            offsets.tofile(f)
+            times.tofile(f)
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    return TraceIndex(trace_filename, offsets, times, stats)
+
+
+def load(trace_filename, filename=None, rebuild=True):
+    """Load the index of a trace.
+
+    If the index does not exist, is outdated or corrupt, it is built (if
+    'rebuild' is True), otherwise a ValueError (OSError, if it does not exist)
+    is raised.
+    """
+    if filename is None:
+        filename = index_filename(trace_filename)
+
+    try:
+        return _load(trace_filename, filename)
+    except (OSError, ValueError):
+        if not rebuild:
+            raise
+        return build(trace_filename, filename)
+
+
+def _load(trace_filename, filename):
+    """Load an index file. Returns a TraceIndex."""
+    with open(filename, "rb") as f:
+        magic = f.read(8)
+        if magic != INDEX_MAGIC:
+            raise ValueError("invalid index file")
+        try:
+            hdr_len, = struct.unpack("<Q", f.read(8))
+            hdr = json.loads(f.read(hdr_len))
+            trace_id = (hdr['trace_size'], hdr['trace_mtime_ns'])
+            n = int(hdr['n_pkts']) + 1
+            stats = hdr['stats']
+        except (KeyError, TypeError, struct.error) as e:
+            raise ValueError("corrupt index file (%s)" % e)
+        if os.fstat(f.fileno()).st_size != 16 + hdr_len + 16 * n:
+            raise ValueError("corrupt index file (truncated)")
+    if trace_id != _trace_id(trace_filename):
+        raise ValueError("index is outdated")
+
+    offsets = np.memmap(filename, dtype='<i8', mode='r', offset=16 + hdr_len,
+                        shape=(n,))
+    times = np.memmap(filename, dtype='<i8', mode='r',
+                      offset=16 + hdr_len + 8 * n, shape=(n,))
+    return TraceIndex(trace_filename, offsets, times, stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build trace indices, print trace statistics and " +
+        "extract parts of traces.")
+    subparsers = parser.add_subparsers(dest="cmd", required=True)
+
+    parser_build = subparsers.add_parser("build", help="build index")
+    parser_build.add_argument("trace", help="trace file")
+
+    parser_info = subparsers.add_parser("info", help="print statistics")
+    parser_info.add_argument("trace", help="trace file")
+
+    parser_slice = subparsers.add_parser(
+        "slice", help="extract packets by number or time")
+    parser_slice.add_argument("trace", help="trace file")
+    parser_slice.add_argument("output", help="output trace file")
+    parser_slice.add_argument("--start", type=int, help="first packet")
+    parser_slice.add_argument("--stop", type=int,
+                              help="packet following the last packet")
+    parser_slice.add_argument("--t-start", type=float,
+                              help="start time in seconds")
+    parser_slice.add_argument("--t-stop", type=float,
+                              help="end time in seconds")
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        idx = build(args.trace)
+        print("Successfully indexed %d packets!" % idx.n_pkts)
+    elif args.cmd == "info":
+        idx = load(args.trace)
+        for name, value in idx.stats.items():
+            print("%s: %s" % (name, value))
+    else:
+        idx = load(args.trace)
+        start, stop = idx.packet_range(args.start, args.stop, args.t_start,
+                                       args.t_stop)
+        idx.extract(args.output, start, stop)
+        print("Successfully wrote %d packets to trace file!" %
+              (stop - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""Merge trace and PCAP files into a single trace file."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Merges the packets of multiple trace and/or PCAP files by their transmission
+# time, e.g. to combine background traffic with a latency probe trace. The
+# packet times of each input are converted to clock cycles since its first
+# packet (all inputs start at time zero). The inputs are mapped into memory
+# (PCAP files window by window, see pcap_reader.read_windows()) and merged in
+# batches, so that memory consumption does not depend on the trace sizes. The
+# packet data of each batch is copied into the output records right away, so
+# that only the current window of each input has to stay mapped. A heap yields
+# the input whose buffered packets end first, all buffered packets up to that
+# time are merged with a stable sort and the input's buffer is refilled.
+# Packets of different inputs scheduled at the same time are ordered by input.
+#
+# Packets that would overlap on the wire are shifted back by the remaining
+# transmission time of the preceding packet (at 10 Gbps, including Ethernet
+# protocol overhead; Lindley's recursion, see trace_validate.py). The shifted
+# absolute times are quantized to delta_t values (see quantize.py). The output
+# trace ends when the last input ends (the last packet's delta_t).
+
+import argparse
+import heapq
+import numpy as np
+import pcap_reader
+import quantize
+import trace_index
+import trace_reader
+import trace_rescale
+import trace_validate
+import trace_writer
+
+# number of packets read from an input at once
+BATCH_SIZE = 1 << 16
+
+
+class TraceSource(object):
+    """Packets of a trace file (located via the trace's index)."""
+
+    def __init__(self, filename):
+        """Open trace file."""
+        self.filename = filename
+        self.index = trace_index.load(filename)
+        self.data = trace_reader.open_trace(filename)
+        self.n_pkts = self.index.n_pkts
+        self.n_read = 0
+        self.end = float(self.index.times[-1])
+
+    @property
+    def done(self):
+        """Whether all packets have been read."""
+        return self.n_read == self.n_pkts
+
+    def read(self, n):
+        """Read up to 'n' packets.
+
+        Returns their times, wire/snap lengths, data offsets and the uint8
+        array the offsets refer to.
+        """
+        start, stop = self.n_read, min(self.n_read + n, self.n_pkts)
+        self.n_read = stop
+        offsets = np.asarray(self.index.offsets[start:stop])
+        meta = trace_reader.words(self.data)[offsets // 8]
+        return (np.asarray(self.index.times[start:stop], dtype=np.float64),
+                trace_reader.len_wire(meta), trace_reader.len_snap(meta),
+                offsets + 8, self.data)
+
+
+class PcapSource(object):
+    """Packets of a PCAP file (read sequentially in windows)."""
+
+    def __init__(self, filename, window_size=pcap_reader.WINDOW_SIZE):
+        """Open PCAP file."""
+        self.filename = filename
+        self.windows = pcap_reader.read_windows(filename, window_size)
+        self.win = None
+        self.pos = 0
+        self.ts_first = None
+        self.t_last = None
+        self.done = False
+        self._next_window()
+
+    @property
+    def end(self):
+        """End time of the packets read so far."""
+        # the time until the trace is repeated is not known (see
+        # trace_writer.DELTA_T_LAST)
+        if self.t_last is None:
+            return 0.0
+        return self.t_last + trace_writer.DELTA_T_LAST
+
+    def read(self, n):
+        """Read up to 'n' packets (see TraceSource.read())."""
+        win = self.win
+        sl = slice(self.pos, min(self.pos + n, win.n_pkts))
+        # nanoseconds since the first packet to clock cycles (5/32 per ns)
+        times = (win.ts_ns[sl] - self.ts_first) * \
+            (quantize.CYCLES_PER_NS_NUM / quantize.CYCLES_PER_NS_DEN)
+        self.t_last = float(times[-1])
+        pkts = (times, win.origlen[sl], win.caplen[sl], win.data_offsets[sl],
+                win.data)
+        self.pos = sl.stop
+        if self.pos == win.n_pkts:
+            self._next_window()
+        return pkts
+
+    def _next_window(self):
+        """Move on to the next window containing packets."""
+        for win in self.windows:
+            if win.n_pkts == 0:
+                continue
+            if np.any(win.origlen > trace_writer.PKT_SIZE_MAX):
+                raise ValueError("%s: wire length exceeds %d bytes" %
+                                 (self.filename, trace_writer.PKT_SIZE_MAX))
+            if self.ts_first is None:
+                self.ts_first = int(win.ts_ns[0])
+            self.win, self.pos = win, 0
+            return
+        self.win, self.done = None, True
+
+
+def open_source(filename):
+    """Open a trace or PCAP file as packet source."""
+    if trace_rescale.is_pcap(filename):
+        return PcapSource(filename)
+    return TraceSource(filename)
+
+
+def copy_ranges(dst, dst_offsets, src, src_offsets, lengths):
+    """Copy byte ranges from array 'src' to array 'dst'."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return
+    starts = np.cumsum(lengths) - lengths
+    rel = np.arange(total) - np.repeat(starts, lengths)
+    dst[np.repeat(dst_offsets, lengths) + rel] = \
+        src[np.repeat(src_offsets, lengths) + rel]
+
+
+def copy_words(dst, dst_offsets, src, src_offsets, lengths):
+    """Copy byte ranges from uint8 array 'src' to 64 bit word array 'dst'.
+
+    The ranges are copied to the words at 'dst_offsets' and padded with zero
+    bytes to the next word boundary. The data is gathered word-wise from
+    (unaligned) views of 'src', which is much faster than copy_ranges().
+    """
+    src_offsets = np.asarray(src_offsets, dtype=np.int64)
+    dst_offsets = np.asarray(dst_offsets, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n_words = (lengths + 7) // 8
+
+    # the last words of ranges at the end of 'src' may not be complete
+    tail = src_offsets + 8 * n_words > len(src)
+    if np.any(tail):
+        for a, b, n in zip(dst_offsets[tail], src_offsets[tail],
+                           lengths[tail]):
+            dst[a:a + (n + 7) // 8] = 0
+            dst[a:].view(np.uint8)[:n] = src[b:b + n]
+    # gather the words of ranges of equal alignment and length at once
+    key = np.where(tail, -1, 8 * n_words + src_offsets % 8)
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    bounds = np.flatnonzero(np.diff(key)) + 1
+    for lo, hi in zip(np.append(0, bounds), np.append(bounds, len(key))):
+        if lo == hi or key[lo] < 8:
+            continue
+        n, k = divmod(int(key[lo]), 8)
+        sel = order[lo:hi]
+        w = src[k:k + 8 * ((len(src) - k) // 8)].view('<u8')
+        rel = np.arange(n)
+        dst[dst_offsets[sel, None] + rel] = \
+            w[src_offsets[sel, None] // 8 + rel]
+
+    # clear the bytes following the ranges in their last words
+    rem = lengths % 8
+    last = (rem != 0) & (lengths > 0)
+    dst[dst_offsets[last] + n_words[last] - 1] &= \
+        (np.uint64(1) << (8 * rem[last]).astype(np.uint64)) - np.uint64(1)
+
+
+class Result(object):
+    """Result of a merge."""
+
+    def __init__(self, n_inputs):
+        """Initialize result."""
+        self.n_pkts = np.zeros(n_inputs, dtype=np.int64)
+        self.n_shifted = 0
+        self.shift_total = 0.0
+        self.shift_max = 0.0
+        self.err_max = 0.0
+        self.duration = 0
+
+    def text(self):
+        """Return the result as human-readable text."""
+        us = 1e6 / trace_writer.CLK_FREQ
+        lines = ["packets: %d (%s)" % (self.n_pkts.sum(), ", ".join(
+            str(n) for n in self.n_pkts))]
+        lines.append("duration: %.6f s" % (self.duration /
+                                           trace_writer.CLK_FREQ))
+        lines.append("shifted packets: %d" % self.n_shifted)
+        lines.append("total shift: %.3f us" % (self.shift_total * us))
+        lines.append("maximum shift: %.3f us" % (self.shift_max * us))
+        lines.append("maximum timing error: %.3f clock cycles" % self.err_max)
+        return "\n".join(lines)
+
+
+class _Merger(object):
+    """Shifts merged packets and writes them to the output trace."""
+
+    def __init__(self, sources, wr, tolerance):
+        """Initialize merger."""
+        self.sources = sources
+        self.wr = wr
+        self.tolerance = tolerance
+        self.result = Result(len(sources))
+        self.quantizer = quantize.Quantizer()
+
+        # time at which the link becomes idle
+        self.t_free = -np.inf
+
+        # last packet, which is written when its delta_t is known
+        self.pending = None
+
+    def add(self, t, len_wire, len_snap, offsets, src, data):
+        """Add packets (ordered by time).
+
+        The packets' data is copied from 'data[src]' at 'offsets'.
+        """
+        # shift packets: a_i = c_i + max(t_free, max_{j <= i}(t_j - c_j)),
+        # where c_i is the sum of the transmission times of preceding packets
+        t_tx = trace_rescale.tx_time(len_wire)
+        c = np.cumsum(t_tx) - t_tx
+        a = c + np.maximum.accumulate(np.maximum(t - c, self.t_free))
+        self.t_free = float(a[-1] + t_tx[-1])
+
+        shift = a - t
+        res = self.result
+        res.n_shifted += int(np.count_nonzero(shift > self.tolerance))
+        res.shift_total += float(shift.sum())
+        res.shift_max = max(res.shift_max, float(shift.max()))
+        res.n_pkts += np.bincount(src, minlength=len(self.sources))
+
+        # encode the records (without meta data) after the pending one
+        if self.pending is not None:
+            p_len_wire, p_len_snap, p_out = self.pending
+            len_wire = np.concatenate((p_len_wire, len_wire))
+            len_snap = np.concatenate((p_len_snap, len_snap))
+        else:
+            p_out = np.zeros(0, dtype=np.uint8)
+        rec_bytes = 8 * trace_reader.record_words(len_snap)
+        pos = np.cumsum(rec_bytes) - rec_bytes
+        out = np.zeros(int(rec_bytes.sum()), dtype=np.uint8)
+        out[:len(p_out)] = p_out
+        words = out.view('<u8')
+        k = len(len_snap) - len(src)
+        for i, d in enumerate(data):
+            sel = np.flatnonzero(src == i)
+            if len(sel) > 0:
+                copy_words(words, pos[k + sel] // 8 + 1, d, offsets[sel],
+                           len_snap[k + sel])
+
+        # all but the last record can be written
+        delta_t = self.quantizer.cycles(a)
+        n = len(delta_t)
+        self._write(delta_t, len_wire[:n], len_snap[:n], pos[:n],
+                    out[:pos[-1]])
+        self.pending = (len_wire[n:], len_snap[n:], out[pos[-1]:])
+
+    def close(self, t_end):
+        """Write the last packet, whose transmission ends at 't_end'."""
+        if self.pending is None:
+            return self.result
+        delta_t = self.quantizer.cycles(max(t_end, self.t_free))
+        self._write(delta_t, self.pending[0], self.pending[1], np.zeros(1),
+                    self.pending[2])
+        self.result.err_max = self.quantizer.err_max
+        return self.result
+
+    def _write(self, delta_t, len_wire, len_snap, pos, out):
+        """Add meta data words to encoded records at byte positions 'pos'
+        and append them to the output trace."""
+        if len(delta_t) == 0:
+            return
+        if delta_t.max() > 0xFFFFFFFF:
+            raise ValueError("delta_t exceeds 32 bits")
+        self.result.duration += int(delta_t.sum())
+        out.view('<u8')[np.asarray(pos, dtype=np.int64) // 8] = \
+            trace_writer.meta(delta_t, len_snap, len_wire)
+        self.wr.write_encoded(out, len(delta_t))
+
+
+def merge(filename, sources, tolerance=trace_validate.TOLERANCE,
+          batch_size=BATCH_SIZE):
+    """Merge packet sources into a trace file. Returns a Result.
+
+    Packets shifted by more than 'tolerance' clock cycles are counted as
+    shifted.
+    """
+    # per input: buffered packets and the array holding their data. an
+    # input is only read again once all its buffered packets have been
+    # merged
+    buffers = [None] * len(sources)
+    data = [None] * len(sources)
+
+    def fill(i):
+        pkts = sources[i].read(batch_size)
+        buffers[i] = pkts[:4] + (np.full(len(pkts[0]), i),)
+        data[i] = pkts[4]
+        # inputs without further packets do not limit the merge
+        t_last = np.inf if sources[i].done else buffers[i][0][-1]
+        heapq.heappush(heap, (t_last, i))
+
+    heap = []
+    for i in range(len(sources)):
+        if not sources[i].done:
+            fill(i)
+
+    with trace_writer.TraceWriter(filename) as wr:
+        merger = _Merger(sources, wr, tolerance)
+        while heap:
+            # all buffered packets up to the end of the buffer that ends
+            # first can be merged
+            t_limit, i = heapq.heappop(heap)
+            parts = []
+            for j, buf in enumerate(buffers):
+                if buf is None:
+                    continue
+                n = np.searchsorted(buf[0], t_limit, side='right')
+                parts.append(tuple(p[:n] for p in buf))
+                buffers[j] = tuple(p[n:] for p in buf)
+            pkts = [np.concatenate(p) for p in zip(*parts)]
+            order = np.lexsort((pkts[4], pkts[0]))
+            if len(order) > 0:
+                merger.add(*(p[order] for p in pkts), data)
+            if not sources[i].done:
+                fill(i)
+            else:
+                buffers[i] = None
+        return merger.close(max([s.end for s in sources] + [0.0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge trace and PCAP files into a trace file.")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("inputs", nargs="+",
+                        help="input trace or PCAP files")
+    parser.add_argument("--tolerance", type=float,
+                        default=trace_validate.TOLERANCE,
+                        help="packets shifted by more than this number of " +
+                        "clock cycles are reported as shifted (default: %d)"
+                        % trace_validate.TOLERANCE)
+    args = parser.parse_args()
+
+    sources = [open_source(filename) for filename in args.inputs]
+    result = merge(args.output, sources, args.tolerance)
+    print(result.text())
+
+
+if __name__ == "__main__":
+    main()
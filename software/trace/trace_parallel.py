@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Parallel sharded trace generation."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates trace files in parallel on multiple CPU cores. The requested trace
+# duration is partitioned into shards of fixed duration, which are generated
+# independently in a process pool. Each shard gets its own random number
+# generator, derived deterministically from the seed and the shard number.
+# Thus, the generated trace only depends on the seed and the shard duration,
+# but not on the number of worker processes: generating a trace with a single
+# process results in a byte-identical trace file.
+#
+# A generator is a (picklable) callable, which is called as
+#
+#   generator(t_start, t_end, rng)
+#
+# and returns the packets that shall be transmitted in the time interval
+# [t_start, t_end) (clock cycles, absolute) as a tuple (t, len_wire, data)
+# or (t, len_wire, data, len_snap). 't' are the absolute transmission times of
+# the packets (integer clock cycles, ascending), the other arrays are passed on
+# to trace_writer.encode(). Each shard is encoded in its worker process. When
+# shards are stitched together, the delta_t of each shard's last packet is set
+# to the time until the first packet of the next shard and the trace is padded
+# at its end only.
+
+import argparse
+import math
+import multiprocessing
+import time
+import numpy as np
+import trace_writer
+from pkt_template import PacketTemplate, Ether, IPv4, UDP
+
+# default shard duration in seconds
+SHARD_DURATION = 10e-3
+
+
+def _generate_shard(job):
+    """Generate and encode a single shard (executed by worker processes)."""
+    generator, t_start, t_end, seed_seq = job
+    pkts = generator(t_start, t_end, np.random.default_rng(seed_seq))
+    t = np.asarray(pkts[0], dtype=np.int64)
+    if t.size == 0:
+        return None
+
+    # delta_t of the last packet is fixed when the shards are stitched
+    # together
+    delta_t = np.diff(t, append=t[-1])
+    encoded = trace_writer.encode(delta_t, *pkts[1:])
+
+    # word offset of the last packet's meta data word. the last packet consists
+    # of the meta data word and ceil(len_snap / 8) data words
+    if len(pkts) > 3 and pkts[3] is not None:
+        len_snap = np.broadcast_to(pkts[3], t.shape)
+    else:
+        len_snap = np.minimum(np.broadcast_to(pkts[1], t.shape),
+                              np.shape(pkts[2])[-1])
+    offset_last = encoded.size // 8 - 1 - (int(len_snap[-1]) + 7) // 8
+
+    return encoded, t.size, int(t[0]), int(t[-1]), offset_last
+
+
+def generate(filename, generator, duration, seed=None,
+             shard_duration=SHARD_DURATION, n_procs=None, delta_t_last=None):
+    """Generate a trace file of given duration (seconds) in parallel.
+
+    The trace is partitioned into shards of 'shard_duration' seconds, which are
+    generated by 'n_procs' worker processes (defaults to the number of CPUs).
+    The delta_t of the trace's last packet defaults to the time until the
+    first packet would be transmitted again when the trace is replayed in a
+    loop. Returns the number of packets written.
+    """
+    t_total = int(round(duration * trace_writer.CLK_FREQ))
+    t_shard = max(int(round(shard_duration * trace_writer.CLK_FREQ)), 1)
+    n_shards = int(math.ceil(t_total / t_shard))
+
+    # one independent random number generator seed per shard
+    seeds = np.random.SeedSequence(seed).spawn(n_shards)
+    jobs = [(generator, i * t_shard, min((i + 1) * t_shard, t_total),
+             seeds[i]) for i in range(n_shards)]
+
+    if n_procs == 1:
+        pool = None
+        results = map(_generate_shard, jobs)
+    else:
+        pool = multiprocessing.Pool(n_procs)
+        results = pool.imap(_generate_shard, jobs)
+
+    try:
+        return _write(filename, results, t_total, delta_t_last)
+    finally:
+        # all results have been consumed (or an error occurred), worker
+        # processes can be stopped right away
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def _write(filename, results, t_total, delta_t_last):
+    """Stitch shards together and write them to a trace file."""
+    t_first = None
+    prev = None
+    with trace_writer.TraceWriter(filename) as wr:
+        for result in results:
+            if result is None:
+                continue
+            encoded, n, t_start, t_end, offset_last = result
+            if t_first is None:
+                t_first = t_start
+
+            # the previous shard's last packet is followed by the first packet
+            # of this shard
+            if prev is not None:
+                _set_delta_t(prev, t_start)
+                wr.write_encoded(prev[0], prev[1])
+            prev = result
+
+        if prev is not None:
+            if delta_t_last is None:
+                delta_t_last = t_total + t_first - prev[3]
+            _set_delta_t(prev, prev[3] + delta_t_last)
+            wr.write_encoded(prev[0], prev[1])
+
+    return wr.n_pkts
+
+
+def _set_delta_t(shard, t_next):
+    """Set the delta_t of the last packet of a shard."""
+    encoded, _, _, t_end, offset_last = shard
+    words = encoded.view('<u8')
+    words[offset_last] &= np.uint64(0xFFFFFFFF00000000)
+    words[offset_last] |= np.uint64(t_next - t_end)
+
+
+class CbrGenerator(object):
+    """Constant-bit-rate traffic generator."""
+
+    def __init__(self, pkt_len, datarate):
+        """Initialize generator."""
+        self.pkt_len = pkt_len
+        self.t_interpacket = 8 * (pkt_len + trace_writer.ETH_OVERHEAD) / \
+            datarate * trace_writer.CLK_FREQ
+        self.tmpl = PacketTemplate(Ether(), IPv4(), UDP(), pkt_len=pkt_len)
+
+    def __call__(self, t_start, t_end, rng):
+        """Generate packets transmitted in the interval [t_start, t_end)."""
+        # indices of the packets whose (rounded) transmission times are within
+        # the interval
+        i_start = int(math.ceil((t_start - 0.5) / self.t_interpacket))
+        i_end = int(math.ceil((t_end - 0.5) / self.t_interpacket))
+        t = np.rint(np.arange(i_start, i_end) * self.t_interpacket)
+        data, len_wire = self.tmpl.build(len(t))
+        return t.astype(np.int64), len_wire, data
+
+
+class PoissonGenerator(object):
+    """Poisson traffic generator with random IPv4 ids and UDP ports.
+
+    Packets arriving while the previous packet is still being transmitted are
+    delayed until its transmission (at 10 Gbps) has completed. Packets whose
+    transmission would not complete within the shard are dropped, so that
+    packets of consecutive shards do not overlap either.
+    """
+
+    def __init__(self, pkt_len, datarate):
+        """Initialize generator."""
+        self.pkt_len = pkt_len
+        self.pkt_rate = datarate / (8 * (pkt_len + trace_writer.ETH_OVERHEAD))
+        self.tmpl = PacketTemplate(Ether(), IPv4(), UDP(), pkt_len=pkt_len)
+
+        # transmission time of a packet in clock cycles (rounded up)
+        self.t_tx = int(math.ceil(8 * (pkt_len + trace_writer.ETH_OVERHEAD) /
+                                  trace_writer.MAX_DATARATE *
+                                  trace_writer.CLK_FREQ))
+
+    def __call__(self, t_start, t_end, rng):
+        """Generate packets transmitted in the interval [t_start, t_end)."""
+        # the number of arrivals in the interval is Poisson distributed, the
+        # arrival times are uniformly distributed within the interval
+        n = rng.poisson(self.pkt_rate * (t_end - t_start) /
+                        trace_writer.CLK_FREQ)
+        t = np.sort(rng.integers(t_start, t_end, n))
+
+        # delay packets until the previous packet has been transmitted
+        # (Lindley's recursion, see trace_merge.py)
+        c = np.arange(n, dtype=np.int64) * self.t_tx
+        t = c + np.maximum.accumulate(t - c) if n else t
+        t = t[t + self.t_tx <= t_end]
+        n = len(t)
+
+        data, len_wire = self.tmpl.build(n, {
+            'ipv4.id': rng.integers(0, 1 << 16, n),
+            'udp.sport': rng.integers(1024, 1 << 16, n),
+        })
+        return t, len_wire, data
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a trace file in parallel.")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("--model", choices=["cbr", "poisson"], default="cbr",
+                        help="traffic model (default: cbr)")
+    parser.add_argument("--pktlen", type=int, default=60,
+                        help="packet length in bytes, excluding FCS " +
+                        "(default: 60)")
+    parser.add_argument("--datarate", type=float,
+                        default=trace_writer.MAX_DATARATE,
+                        help="raw data rate in bits/second (default: 10e9)")
+    parser.add_argument("--duration", type=float, default=100e-3,
+                        help="trace duration in seconds (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default: 0)")
+    parser.add_argument("--shard-duration", type=float,
+                        default=SHARD_DURATION,
+                        help="shard duration in seconds (default: 0.01)")
+    parser.add_argument("--procs", type=int, default=None,
+                        help="number of worker processes (default: #cpus)")
+    args = parser.parse_args()
+
+    if args.model == "cbr":
+        generator = CbrGenerator(args.pktlen, args.datarate)
+    else:
+        generator = PoissonGenerator(args.pktlen, args.datarate)
+
+    t_start = time.time()
+    n_pkts = generate(args.output, generator, args.duration, args.seed,
+                      args.shard_duration, args.procs)
+    print("Successfully wrote %d packets to trace file in %.2f seconds!" %
+          (n_pkts, time.time() - t_start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Vectorized reader for the FlueNT10G trace replay format."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Reads trace files (see trace_writer.py for a description of the format) via
+# mmap. Since packet records have variable lengths, the position of a record is
+# only known once all preceding records have been parsed. To locate all records
+# without a per-record Python loop, the file is split into segments of
+# SEGMENT_WORDS 64 bit words:
+#
+# 1. For each segment, the record chain is followed from every word a record
+#    may start at (the first MAX_RECORD_WORDS words of the segment) until it
+#    leaves the segment. All chains of all segments are advanced together with
+#    vectorized NumPy operations. Chains that arrive at the same word are
+#    merged and chains that arrive at a word that is not a plausible meta data
+#    word (i.e. the chain started in the middle of packet data) are dropped,
+#    so that the number of chains quickly drops to about one per segment.
+# 2. Starting with the first segment, the position at which the true record
+#    chain leaves a segment selects the chain of the next segment. If the true
+#    chain has been dropped (malformed trace), it is followed record by record
+#    within its segment.
+# 3. The true chains of all segments are followed once more (again in
+#    parallel) to mark the positions of all records.
+#
+# A meta data word with all bits set marks the padding at the end of the trace.
+#
+# If the plausible record positions can be found cheaply (as for PCAP files,
+# see pcap_reader.py), candidate_chain() locates the records without stepping
+# through the data: the chain follows runs of candidates each of which points
+# to the next one, and only where it does not (candidates in the middle of
+# records, implausible records), it is followed record by record.
+
+import mmap
+import numpy as np
+
+# meta data word of the padding at the end of a trace
+PADDING_WORD = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# maximum length of a record (meta data word and data words) in words. the
+# snap length field is 11 bits wide
+MAX_RECORD_WORDS = 1 + (0x7FF + 7) // 8
+
+# number of words per segment when locating records (must be larger than
+# MAX_RECORD_WORDS)
+SEGMENT_WORDS = 4096
+
+# number of steps after which chains arriving at the same word are merged
+MERGE_INTERVAL = 8
+
+# meta data word bits that must be zero
+META_RESERVED = np.uint64(0xF800F80000000000)
+
+# maximum wire length of a plausible meta data word
+PKT_SIZE_MAX = 1518
+
+
+def open_trace(filename, writable=False):
+    """Map a trace file into memory. Returns a uint8 array."""
+    with open(filename, "r+b" if writable else "rb") as f:
+        f.seek(0, 2)
+        if f.tell() == 0:
+            return np.zeros(0, dtype=np.uint8)
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable
+                        else mmap.ACCESS_READ)
+    buf.madvise(mmap.MADV_SEQUENTIAL)
+    return np.frombuffer(buf, dtype=np.uint8)
+
+
+def words(data):
+    """Return the (complete) 64 bit words of trace data."""
+    n = len(data) // 8
+    return data[:8 * n].view('<u8')
+
+
+def delta_t(meta):
+    """Return the delta_t field of meta data words."""
+    return (meta & np.uint64(0xFFFFFFFF)).astype(np.int64)
+
+
+def len_snap(meta):
+    """Return the snap length field of meta data words."""
+    return ((meta >> np.uint64(32)) & np.uint64(0x7FF)).astype(np.int64)
+
+
+def len_wire(meta):
+    """Return the wire length field of meta data words."""
+    return ((meta >> np.uint64(48)) & np.uint64(0x7FF)).astype(np.int64)
+
+
+def record_words(len_snap):
+    """Return the number of words of records with given snap lengths."""
+    return 1 + (np.asarray(len_snap, dtype=np.int64) + 7) // 8
+
+
+def plausible(meta):
+    """Check which words may be meta data words of a valid trace."""
+    snap = len_snap(meta)
+    wire = len_wire(meta)
+    return ((meta & META_RESERVED) == 0) & (snap <= wire) & (wire > 0) & \
+        (wire <= PKT_SIZE_MAX) | (meta == PADDING_WORD)
+
+
+def _step(w, pos, end):
+    """Advance record chains by one record.
+
+    Returns the positions of the next records, whether the current words are
+    plausible meta data words and whether they are records (chains arriving at
+    a padding word are moved to 'end').
+    """
+    meta = w[pos]
+    snap_words = ((meta >> np.uint64(32)) & np.uint64(0x7FF)) + np.uint64(7)
+    pos_next = pos + 1 + (snap_words >> np.uint64(3)).astype(np.int64)
+    is_record = meta != PADDING_WORD
+    pos_next[~is_record] = end
+    return pos_next, plausible(meta), is_record
+
+
+def record_offsets(w, segment_words=SEGMENT_WORDS):
+    """Return the word offsets of all records in an array of trace words.
+
+    The scan stops at the first padding word or at the end of the data. The
+    last record may extend beyond the end of the data, if the trace is
+    truncated.
+    """
+    return chain_offsets(len(w), lambda pos, end: _step(w, pos, end),
+                         MAX_RECORD_WORDS, segment_words)
+
+
+def chain_offsets(n, step, max_record, segment_size, max_chains=1 << 22):
+    """Locate a chain of variable-length records in data of length 'n'.
+
+    'step(pos, end)' returns the positions of the records following the
+    records at 'pos' (or 'end', if the chain ends at a record), whether the
+    records at 'pos' are plausible and whether they are records at all.
+    'max_record' is the maximum record length, 'segment_size' (larger than
+    'max_record') the size of the segments the data is split into. At most
+    'max_chains' candidate chains are followed at once. Returns the positions
+    of all records of the chain starting at position zero.
+    """
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    n_segments = -(-n // segment_size)
+    n_cand = min(max_record, segment_size)
+
+    # positions beyond all valid positions (end of the chain and dropped
+    # chains)
+    end = n + max_record
+    dead = end + 1
+
+    # step 1: determine where the chains starting at all candidate positions
+    # leave their segments. segments are processed in groups
+    group_size = max(max_chains // n_cand, 1)
+    chain_exit = np.concatenate([
+        _chain_exits(n, step, n_cand, segment_size, k,
+                     min(k + group_size, n_segments), end, dead)
+        for k in range(0, n_segments, group_size)])
+
+    # step 2: select the true chain of each segment. dropped chains are
+    # followed record by record
+    entries = []
+    entry = 0
+    for k in range(n_segments):
+        if entry >= n:
+            break
+        entries.append(entry)
+        entry = int(chain_exit[k, entry - k * segment_size])
+        if entry == dead:
+            entry = entries[-1]
+            seg_end = min((k + 1) * segment_size, n)
+            while entry < seg_end:
+                entry = int(step(np.asarray([entry]), end)[0][0])
+
+    # step 3: mark the records of the true chains
+    seg_end = np.minimum((np.arange(len(entries)) + 1) * segment_size, n)
+    pos = np.asarray(entries, dtype=np.int64)
+    records = [np.zeros(0, dtype=np.int64)]
+    while True:
+        active = pos < seg_end
+        if not active.any():
+            break
+        pos, seg_end = pos[active], seg_end[active]
+        pos_next, _, rec = step(pos, end)
+        records.append(pos[rec])
+        pos = pos_next
+    return np.unique(np.concatenate(records))
+
+
+def candidate_chain(n, cand, cand_next, step):
+    """Locate a chain of records via candidate positions.
+
+    'cand' are the sorted positions of all plausible records and 'cand_next'
+    the positions of the records following them. The chain starts at position
+    zero and usually continues with the next candidate. It skips candidates
+    that are not records and is followed with 'step(pos)' (returns the
+    position of the next record) where it arrives at a position that is not a
+    candidate. Returns the positions of all records of the chain that start
+    before 'n'.
+    """
+    breaks = np.append(np.flatnonzero(cand_next[:-1] != cand[1:]),
+                       len(cand) - 1)
+    records = []
+    pos = 0
+    while pos < n:
+        i = int(np.searchsorted(cand, pos))
+        if i < len(cand) and cand[i] == pos:
+            # follow the run of consecutive candidates
+            j = int(breaks[np.searchsorted(breaks, i)])
+            records.append(cand[i:j + 1])
+            pos = int(cand_next[j])
+        else:
+            records.append(np.asarray([pos], dtype=np.int64))
+            pos = int(step(pos))
+    if len(records) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(records)
+
+
+def _chain_exits(n, step, n_cand, segment_size, seg_first, seg_last, end,
+                 dead):
+    """Follow the candidate chains of segments [seg_first, seg_last).
+
+    Only the chains that have not left their segment yet are advanced. Chains
+    are dropped when they arrive at an implausible record. They are merged
+    when they arrive at another candidate's start position or at the same
+    position as another chain: 'parent' points from a merged chain to the
+    chain it has been merged into. Returns the positions at which the chains
+    leave their segments (one row per segment, one column per candidate).
+    """
+    n_segments = seg_last - seg_first
+    seg_start = np.repeat(np.arange(seg_first, seg_last, dtype=np.int64) *
+                          segment_size, n_cand)
+    pos = seg_start + np.tile(np.arange(n_cand, dtype=np.int64), n_segments)
+    pos = np.where(pos < n, pos, end)
+    seg_end = np.minimum(seg_start + segment_size, n)
+    parent = np.arange(len(pos))
+    act = np.flatnonzero(pos < seg_end)
+    i = 0
+    while len(act) > 0:
+        p, ok, _ = step(pos[act], end)
+        p[~ok] = dead
+        pos[act] = p
+
+        cand = p - seg_start[act]
+        merge = cand < n_cand
+        parent[act[merge]] = act[merge] - (act[merge] % n_cand) + cand[merge]
+        act = act[~merge & (p < seg_end[act])]
+
+        i += 1
+        if i % MERGE_INTERVAL == 0:
+            _, idx, inv = np.unique(pos[act], return_index=True,
+                                    return_inverse=True)
+            parent[act] = act[idx][inv.reshape(-1)]
+            act = act[idx]
+
+    # follow the parent pointers to the chains that have not been merged
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            break
+        parent = grandparent
+    return pos[parent].reshape(n_segments, n_cand)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Rescale the packet timing of trace and PCAP files."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Scales the inter-packet times of an existing trace file (or PCAP file) by a
+# constant factor or to a target mean data rate, e.g. to sweep the offered load
+# without generating the trace again. The file is copied (in the kernel, see
+# trace_edit.py) or modified in place. It is mapped into memory and only the
+# timing fields are rewritten: the delta_t field of the trace meta data words
+# or the timestamps of the PCAP record headers. Packet data is not touched.
+#
+# Scaled times that the link cannot keep up with (the packets are closer than
+# their transmission time at 10 Gbps, including Ethernet protocol overhead) are
+# delayed to the earliest time the link is idle, like the hardware would do
+# (Lindley's recursion, see trace_validate.py). Subsequent packets return to
+# their scaled times as soon as the backlog has been cleared, so the timing of
+# the remaining trace is not shifted. Absolute times are quantized to clock
+# cycles (see quantize.py), PCAP timestamps to the file's timestamp resolution.
+
+import argparse
+import os
+import numpy as np
+import pcap_reader
+import quantize
+import trace_edit
+import trace_reader
+import trace_validate
+import trace_writer
+
+
+class Result(object):
+    """Result of a rescaling operation."""
+
+    def __init__(self, n_pkts, factor, rate_in, rate_out, lateness,
+                 tolerance, err_max):
+        """Initialize result. Times are given in clock cycles."""
+        self.n_pkts = n_pkts
+        self.factor = factor
+        self.rate_in = rate_in
+        self.rate_out = rate_out
+        self.clamped = np.flatnonzero(lateness > tolerance)
+        self.shift_max = float(lateness.max()) if len(lateness) else 0.0
+        self.err_max = err_max
+
+    def text(self):
+        """Return the result as human-readable text."""
+        lines = [
+            "packets: %d" % self.n_pkts,
+            "factor: %g" % self.factor,
+            "mean rate: %.6f Gbps -> %.6f Gbps" % (self.rate_in / 1e9,
+                                                   self.rate_out / 1e9),
+            "clamped packets: %d" % len(self.clamped),
+        ]
+        if len(self.clamped) > 0:
+            idx = self.clamped[:trace_validate.MAX_INDICES]
+            lines.append("  packets: %s%s" % (
+                " ".join(str(i) for i in idx),
+                " ..." if len(self.clamped) > len(idx) else ""))
+        lines.append("maximum shift: %.3f us" % (
+            self.shift_max / trace_writer.CLK_FREQ * 1e6))
+        lines.append("maximum timing error: %.3f clock cycles" % self.err_max)
+        return "\n".join(lines)
+
+
+def tx_time(len_wire):
+    """Return the transmission times (clock cycles) of packets at 10 Gbps."""
+    return 8.0 * (np.asarray(len_wire) + trace_writer.ETH_OVERHEAD) / \
+        trace_writer.MAX_DATARATE * trace_writer.CLK_FREQ
+
+
+def mean_rate(len_wire, duration):
+    """Return the mean data rate (bps) of packets sent within 'duration'."""
+    bits = 8.0 * np.sum(np.asarray(len_wire) + trace_writer.ETH_OVERHEAD)
+    return bits / max(duration, 1) * trace_writer.CLK_FREQ
+
+
+def rescale_times(gaps, t_tx, factor):
+    """Scale inter-packet times and delay packets the link cannot keep up with.
+
+    'gaps' are the times between consecutive packets, 't_tx' the transmission
+    times of the packets preceding each gap. Returns the times of all packets
+    relative to the first one and their delay caused by clamping.
+    """
+    gaps = np.asarray(gaps, dtype=np.float64) * factor
+    t_target = np.concatenate(([0.0], np.cumsum(gaps)))
+    x = np.concatenate(([0.0], np.cumsum(t_tx - gaps)))
+    lateness = x - np.minimum.accumulate(x)
+    return t_target + lateness, lateness
+
+
+def rescale_trace(filename, factor=None, rate=None,
+                  tolerance=trace_validate.TOLERANCE):
+    """Rescale the delta_t values of a trace file in place.
+
+    Either the scaling 'factor' or the target mean data 'rate' (bps) must be
+    given. Returns a Result.
+    """
+    w = trace_reader.words(trace_reader.open_trace(filename, writable=True))
+    offsets = trace_reader.record_offsets(w)
+    meta = w[offsets]
+    delta_t = trace_reader.delta_t(meta)
+    len_wire = trace_reader.len_wire(meta)
+
+    rate_in = mean_rate(len_wire, np.sum(delta_t))
+    if factor is None:
+        factor = rate_in / rate
+
+    # the delta_t of the last packet is the time until the trace is repeated
+    t, lateness = rescale_times(delta_t, tx_time(len_wire), factor)
+    q = quantize.Quantizer()
+    q.cycles(0.0)
+    delta_t = q.cycles(t[1:])
+    if len(delta_t) > 0 and delta_t.max() > 0xFFFFFFFF:
+        raise ValueError("scaled delta_t exceeds the maximum value")
+
+    w[offsets] = (meta & np.uint64(0xFFFFFFFF00000000)) | \
+        delta_t.astype(np.uint64)
+    return Result(len(offsets), factor, rate_in,
+                  mean_rate(len_wire, np.sum(delta_t)), lateness[:-1],
+                  tolerance, q.err_max)
+
+
+def rescale_pcap(filename, factor=None, rate=None,
+                 tolerance=trace_validate.TOLERANCE):
+    """Rescale the timestamps of a PCAP file in place.
+
+    Either the scaling 'factor' or the target mean data 'rate' (bps) must be
+    given. Returns a Result.
+    """
+    pcap = pcap_reader.PcapFile(filename, writable=True)
+    ts_ns = pcap.ts_ns
+    if len(ts_ns) < 2:
+        return Result(len(ts_ns), factor or 1.0, 0.0, 0.0, np.zeros(0),
+                      tolerance, 0.0)
+
+    # times in clock cycles relative to the first packet
+    cycles_per_ns = trace_writer.CLK_FREQ / 1e9
+    gaps = np.diff(ts_ns) * cycles_per_ns
+    len_wire = pcap.origlen[:-1]
+    rate_in = mean_rate(len_wire, np.sum(gaps))
+    if factor is None:
+        factor = rate_in / rate
+
+    t, lateness = rescale_times(gaps, tx_time(len_wire), factor)
+    resolution = 1 if pcap.ns else 1000
+    t_ns = np.rint(t / cycles_per_ns / resolution).astype(np.int64) * \
+        resolution
+    err_max = float(np.abs(t_ns * cycles_per_ns - t).max())
+    pcap.set_ts_ns(ts_ns[0] + t_ns)
+    return Result(len(ts_ns), factor, rate_in,
+                  mean_rate(len_wire, t_ns[-1] * cycles_per_ns),
+                  lateness, tolerance, err_max)
+
+
+def is_pcap(filename):
+    """Check whether a file is a PCAP file (by its magic number)."""
+    with open(filename, "rb") as f:
+        magic = f.read(4)
+    magics = (pcap_reader.PCAP_MAGIC_US, pcap_reader.PCAP_MAGIC_NS)
+    return len(magic) == 4 and (int.from_bytes(magic, "little") in magics or
+                                int.from_bytes(magic, "big") in magics)
+
+
+def rescale(filename_in, filename_out=None, factor=None, rate=None,
+            tolerance=trace_validate.TOLERANCE):
+    """Rescale a trace or PCAP file.
+
+    The input file is copied to 'filename_out' first, if given, otherwise it
+    is modified in place. Returns a Result.
+    """
+    if (factor is None) == (rate is None):
+        raise ValueError("either factor or rate must be specified")
+    if factor is not None and factor <= 0 or rate is not None and rate <= 0:
+        raise ValueError("factor and rate must be positive")
+
+    if filename_out is not None:
+        fd_in = os.open(filename_in, os.O_RDONLY)
+        try:
+            fd_out = os.open(filename_out, os.O_WRONLY | os.O_CREAT |
+                             os.O_TRUNC, 0o644)
+            try:
+                trace_edit.copy(fd_in, fd_out, 0, os.fstat(fd_in).st_size)
+            finally:
+                os.close(fd_out)
+        finally:
+            os.close(fd_in)
+        filename_in = filename_out
+
+    if is_pcap(filename_in):
+        return rescale_pcap(filename_in, factor, rate, tolerance)
+    return rescale_trace(filename_in, factor, rate, tolerance)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scale the inter-packet times of a trace or PCAP file.")
+    parser.add_argument("input", help="input trace or PCAP file")
+    parser.add_argument("output", nargs="?",
+                        help="output file (default: modify input in place)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--factor", type=float,
+                       help="factor the inter-packet times are multiplied by")
+    group.add_argument("--rate", type=float,
+                       help="target mean data rate in bps")
+    parser.add_argument("--tolerance", type=float,
+                        default=trace_validate.TOLERANCE,
+                        help="packets delayed by more than this number of " +
+                        "clock cycles are reported as clamped (default: %d)"
+                        % trace_validate.TOLERANCE)
+    args = parser.parse_args()
+
+    result = rescale(args.input, args.output, args.factor, args.rate,
+                     args.tolerance)
+    print(result.text())
+
+
+if __name__ == "__main__":
+    main()
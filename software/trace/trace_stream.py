@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Constant-memory streaming trace generation."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Generates traces of arbitrary length (e.g. filling the whole replay memory)
+# with constant memory consumption. Trace generation is organized as a pipeline
+# of Python generators, each stage consuming the batches produced by the
+# previous one:
+#
+#   packet source -> timing model -> encoder -> chunker -> sink
+#
+# - packet source: yields batches of packets (len_wire, data, len_snap)
+# - timing model:  assigns a delta_t to each packet and stops the pipeline
+#                  once the requested trace duration is reached (sources that
+#                  time packets themselves are passed to limit() instead)
+# - encoder:       encodes packet batches to the trace format
+# - chunker:       re-assembles encoded data into chunks of fixed size and
+#                  appends the trace padding at the end
+# - sink:          writes chunks to a file, a pipe or a socket and reports the
+#                  generation throughput live
+#
+# At any time, only a single packet batch and a single output chunk are held in
+# memory.
+
+import argparse
+import socket
+import sys
+import time
+import numpy as np
+import trace_writer
+from quantize import Quantizer
+from pkt_template import PacketTemplate, Ether, IPv4, UDP
+
+# number of packets per batch
+BATCH_SIZE = 1 << 16
+
+# size of the chunks written to the sink in bytes
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# interval (in seconds) in which the generation throughput is reported
+REPORT_INTERVAL = 1.0
+
+
+def template_source(tmpl, fields_func=None, pkt_len_func=None,
+                    batch_size=BATCH_SIZE, seed=None, width=None):
+    """Packet source creating endless packet batches from a header template.
+
+    'fields_func(n, rng)' and 'pkt_len_func(n, rng)' may be provided to create
+    per-packet field values and packet lengths for batches of 'n' packets.
+    'width' is the width of the packet data (see PacketTemplate.build()).
+    Yields tuples (len_wire, data, len_snap).
+    """
+    rng = np.random.default_rng(seed)
+    while True:
+        fields = fields_func(batch_size, rng) if fields_func else None
+        pkt_len = pkt_len_func(batch_size, rng) if pkt_len_func else None
+        data, len_wire = tmpl.build(batch_size, fields, pkt_len, width)
+        yield len_wire, data, None
+
+
+class LinkRateTiming(object):
+    """Timing model transmitting packets back-to-back at a given data rate.
+
+    The transmission time of each packet (including the Ethernet protocol
+    overhead) at the given data rate determines the time until the next packet
+    is transmitted. Absolute transmission times are rounded to clock cycles, so
+    that rounding errors do not accumulate.
+    """
+
+    def __init__(self, datarate=trace_writer.MAX_DATARATE):
+        """Initialize timing model."""
+        self.cycles_per_byte = 8 / datarate * trace_writer.CLK_FREQ
+        self._bytes = 0
+        self.quantizer = Quantizer()
+        self.quantizer.cycles(0.0)
+
+    def __call__(self, len_wire):
+        """Return the delta_t of the next batch of packets."""
+        n_bytes = self._bytes + np.cumsum(len_wire + trace_writer.ETH_OVERHEAD,
+                                          dtype=np.int64)
+        if len(n_bytes):
+            self._bytes = int(n_bytes[-1])
+        return self.quantizer.cycles(n_bytes * self.cycles_per_byte)
+
+
+def timing(batches, model, duration=None, n_pkts=None):
+    """Assign delta_t values to packet batches.
+
+    'model(len_wire)' returns the delta_t of each packet of a batch. The
+    pipeline stops once 'duration' seconds or 'n_pkts' packets are reached.
+    Yields tuples (delta_t, len_wire, data, len_snap).
+    """
+    timed = ((model(len_wire), len_wire, data, len_snap)
+             for len_wire, data, len_snap in batches)
+    return limit(timed, duration, n_pkts)
+
+
+def limit(batches, duration=None, n_pkts=None):
+    """Stop a stream of timed packet batches.
+
+    Consumes tuples (delta_t, len_wire, data, len_snap) and passes them on
+    until 'duration' seconds or 'n_pkts' packets are reached. The last batch is
+    truncated accordingly.
+    """
+    t_max = None if duration is None else duration * trace_writer.CLK_FREQ
+    t = 0
+    n = 0
+    for delta_t, len_wire, data, len_snap in batches:
+        # number of packets of this batch that still fit in the trace
+        n_batch = len(delta_t)
+        if n_pkts is not None:
+            n_batch = min(n_batch, n_pkts - n)
+        if t_max is not None:
+            t_batch = t + np.cumsum(delta_t, dtype=np.int64) - delta_t
+            n_batch = min(n_batch, int(np.searchsorted(t_batch, t_max)))
+        if n_batch <= 0:
+            return
+
+        truncated = n_batch < len(delta_t)
+        if truncated:
+            delta_t = delta_t[:n_batch]
+            len_wire = len_wire[:n_batch]
+            if np.ndim(data) == 2:
+                data = data[:n_batch]
+            if len_snap is not None and np.ndim(len_snap) > 0:
+                len_snap = len_snap[:n_batch]
+
+        yield delta_t, len_wire, data, len_snap
+
+        t += int(np.sum(delta_t, dtype=np.int64))
+        n += n_batch
+        if truncated or n == n_pkts:
+            return
+
+
+def encoder(batches):
+    """Encode packet batches. Yields tuples (encoded data, number of pkts)."""
+    for delta_t, len_wire, data, len_snap in batches:
+        yield trace_writer.encode(delta_t, len_wire, data, len_snap), \
+            len(delta_t)
+
+
+def chunker(encoded, chunk_size=CHUNK_SIZE):
+    """Re-assemble encoded data into fixed-size chunks.
+
+    All chunks except the last one are 'chunk_size' bytes long. The trace
+    padding is appended to the last chunk. Yields tuples (chunk, number of
+    packets completed in this chunk).
+    """
+    buf = np.empty(chunk_size, dtype=np.uint8)
+    fill = 0
+    size = 0
+    n_pkts = 0
+    for data, n in encoded:
+        size += len(data)
+        n_pkts += n
+        pos = 0
+        while pos < len(data):
+            n_copy = min(chunk_size - fill, len(data) - pos)
+            buf[fill:fill + n_copy] = data[pos:pos + n_copy]
+            fill += n_copy
+            pos += n_copy
+            if fill == chunk_size:
+                yield buf, n_pkts
+                n_pkts = 0
+                fill = 0
+
+    pad = trace_writer.padding(size)
+    yield np.concatenate((buf[:fill], pad)), n_pkts
+
+
+def write(chunks, sink, report=True):
+    """Write chunks to a sink and report the generation throughput.
+
+    'sink' may be a file name, a binary file object (e.g. a pipe) or a
+    connected socket. Returns a tuple (number of packets, number of bytes).
+    """
+    if isinstance(sink, str):
+        f = open(sink, "wb")
+        write_func = f.write
+    elif isinstance(sink, socket.socket):
+        f = None
+        write_func = sink.sendall
+    else:
+        f = None
+        write_func = sink.write
+
+    n_pkts = 0
+    n_bytes = 0
+    t_start = time.time()
+    t_report = t_start + REPORT_INTERVAL
+    try:
+        for chunk, n in chunks:
+            write_func(memoryview(chunk))
+            n_pkts += n
+            n_bytes += len(chunk)
+
+            if report and time.time() >= t_report:
+                _report(n_pkts, n_bytes, time.time() - t_start)
+                t_report += REPORT_INTERVAL
+    finally:
+        if f is not None:
+            f.close()
+
+    if report:
+        _report(n_pkts, n_bytes, time.time() - t_start)
+        sys.stderr.write("\n")
+
+    return n_pkts, n_bytes
+
+
+def _report(n_pkts, n_bytes, t_elapsed):
+    """Print generation throughput to stderr."""
+    t_elapsed = max(t_elapsed, 1e-9)
+    sys.stderr.write("\r%d packets, %.1f MB written (%.2f Mpps, %.1f MB/s)" %
+                     (n_pkts, n_bytes / 1e6, n_pkts / t_elapsed / 1e6,
+                      n_bytes / t_elapsed / 1e6))
+    sys.stderr.flush()
+
+
+def generate(sink, source, model, duration=None, n_pkts=None,
+             chunk_size=CHUNK_SIZE, report=True):
+    """Run the complete generation pipeline."""
+    return write(chunker(encoder(timing(source, model, duration, n_pkts)),
+                         chunk_size), sink, report)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a trace of arbitrary length with constant " +
+        "memory consumption.")
+    parser.add_argument("output", help="output trace file ('-' for stdout, " +
+                        "'tcp:<host>:<port>' for a TCP connection)")
+    parser.add_argument("--pktlen", type=int, default=60,
+                        help="packet length in bytes, excluding FCS " +
+                        "(default: 60)")
+    parser.add_argument("--datarate", type=float,
+                        default=trace_writer.MAX_DATARATE,
+                        help="raw data rate in bits/second (default: 10e9)")
+    parser.add_argument("--duration", type=float, default=1.0,
+                        help="trace duration in seconds (default: 1.0)")
+    args = parser.parse_args()
+
+    tmpl = PacketTemplate(Ether(), IPv4(), UDP(), pkt_len=args.pktlen)
+
+    # increment IPv4 id and UDP source port for each packet
+    pkt_idx = 0
+
+    def fields(n, rng):
+        nonlocal pkt_idx
+        idx = pkt_idx + np.arange(n)
+        pkt_idx += n
+        return {'ipv4.id': idx & 0xFFFF, 'udp.sport': idx & 0xFFFF}
+
+    source = template_source(tmpl, fields)
+    model = LinkRateTiming(args.datarate)
+
+    if args.output == "-":
+        sink = sys.stdout.buffer
+    elif args.output.startswith("tcp:"):
+        _, host, port = args.output.split(":")
+        sink = socket.create_connection((host, int(port)))
+    else:
+        sink = args.output
+
+    generate(sink, source, model, duration=args.duration)
+
+    if isinstance(sink, socket.socket):
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""Trace file validator and feasibility linter."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Checks that a trace file can be replayed by the FlueNT10G network tester as
+# intended. The trace is mapped into memory and all records are checked with
+# vectorized NumPy operations:
+#
+# - the file size is a multiple of 64 bytes
+# - snap length <= wire length <= 1518 bytes, reserved meta data bits are zero
+# - packet data is padded with zero bytes to 8 byte alignment
+# - the trace is padded with less than 64 bytes of 0xFF at its end
+# - the last record is complete
+# - each delta_t is at least the transmission time of the packet at 10 Gbps
+#   (including 24 bytes of Ethernet protocol overhead)
+#
+# Packets whose delta_t is too short are transmitted later than intended by
+# the hardware. The delay accumulates as long as the offered rate exceeds the
+# link rate. The validator calculates the actual transmission times (Lindley's
+# recursion for a single server queue, evaluated with cumulative sums) and
+# reports the offered and achieved data rate in time windows.
+
+import argparse
+import json
+import sys
+import numpy as np
+import trace_reader
+import trace_writer
+
+# default tolerance (clock cycles) of the delta_t feasibility check. absolute
+# transmission times are rounded to clock cycles, so the delta_t of a packet
+# sent back-to-back may be up to one cycle shorter than its transmission time
+TOLERANCE = 1
+
+# default duration (seconds) of the time windows of the rate profile
+WINDOW = 1e-3
+
+# maximum number of offending packet indices listed per check
+MAX_INDICES = 20
+
+
+class Report(object):
+    """Validation report."""
+
+    def __init__(self, filename, size):
+        """Initialize report."""
+        self.filename = filename
+        self.size = size
+        self.n_pkts = 0
+        self.errors = {}
+        self.stats = {}
+        self.profile = []
+
+    def check(self, name, failed, description):
+        """Record packets failing a check ('failed' is a boolean array)."""
+        idx = np.flatnonzero(failed)
+        if len(idx) > 0:
+            self.errors[name] = {
+                'description': description,
+                'count': len(idx),
+                'indices': idx[:MAX_INDICES].tolist(),
+            }
+
+    def error(self, name, description):
+        """Record an error that is not related to individual packets."""
+        self.errors[name] = {'description': description, 'count': 1,
+                             'indices': []}
+
+    def ok(self):
+        """Return whether the trace passed all checks."""
+        return len(self.errors) == 0
+
+    def json(self):
+        """Return the report as JSON string."""
+        return json.dumps({
+            'file': self.filename,
+            'size': self.size,
+            'n_pkts': self.n_pkts,
+            'ok': self.ok(),
+            'errors': self.errors,
+            'stats': self.stats,
+            'profile': self.profile,
+        }, indent=2)
+
+    def text(self):
+        """Return the report as human-readable text."""
+        lines = ["%s: %d bytes, %d packets" % (self.filename, self.size,
+                                               self.n_pkts)]
+        for name, err in self.errors.items():
+            lines.append("ERROR %s: %s (%d)" % (name, err['description'],
+                                                err['count']))
+            if err['indices']:
+                lines.append("  packets: %s%s" % (
+                    " ".join(str(i) for i in err['indices']),
+                    " ..." if err['count'] > len(err['indices']) else ""))
+        for name, value in self.stats.items():
+            lines.append("%s: %s" % (name, value))
+        if self.profile:
+            lines.append("%12s %14s %14s %12s" % ("t [ms]", "offered [Gbps]",
+                                                  "achieved [Gbps]",
+                                                  "pkts"))
+            for p in self.profile:
+                lines.append("%12.3f %14.3f %14.3f %12d" % (
+                    p['t'] * 1e3, p['offered'] / 1e9, p['achieved'] / 1e9,
+                    p['n_pkts']))
+        lines.append("OK" if self.ok() else "FAILED")
+        return "\n".join(lines)
+
+
+def validate(filename, tolerance=TOLERANCE, window=WINDOW):
+    """Validate a trace file. Returns a Report."""
+    data = trace_reader.open_trace(filename)
+    report = Report(filename, len(data))
+    if len(data) % trace_writer.TRACE_ALIGNMENT != 0:
+        report.error('file_size', "file size is not a multiple of %d bytes" %
+                     trace_writer.TRACE_ALIGNMENT)
+
+    w = trace_reader.words(data)
+    offsets = trace_reader.record_offsets(w)
+    report.n_pkts = len(offsets)
+    if len(offsets) == 0:
+        report.error('empty', "trace does not contain any packets")
+        return report
+
+    meta = w[offsets]
+    delta_t = trace_reader.delta_t(meta)
+    len_snap = trace_reader.len_snap(meta)
+    len_wire = trace_reader.len_wire(meta)
+    rec_words = trace_reader.record_words(len_snap)
+    rec_end = offsets + rec_words
+
+    # meta data fields
+    report.check('snap_gt_wire', len_snap > len_wire,
+                 "snap length exceeds wire length")
+    report.check('wire_gt_max', len_wire > trace_writer.PKT_SIZE_MAX,
+                 "wire length exceeds %d bytes" % trace_writer.PKT_SIZE_MAX)
+    report.check('wire_zero', len_wire == 0, "wire length is zero")
+    report.check('reserved_bits', (meta & trace_reader.META_RESERVED) != 0,
+                 "reserved meta data bits are set")
+
+    # the last record must be complete
+    truncated = rec_end > len(w)
+    report.check('truncated', truncated, "record exceeds end of file")
+
+    # bytes between snap length and 8 byte boundary must be zero
+    rem = len_snap % 8
+    padded = (rem != 0) & ~truncated
+    last_word = w[(rec_end - 1)[padded]]
+    pad_bits = np.uint64(8) * rem[padded].astype(np.uint64)
+    report.check('record_padding',
+                 _scatter(padded, (last_word >> pad_bits) != 0),
+                 "packet data padding bytes are not zero")
+
+    # trace padding: less than 64 bytes of 0xFF following the last record
+    end = 8 * int(rec_end[-1])
+    if end <= len(data):
+        pad = data[end:]
+        if len(pad) >= trace_writer.TRACE_ALIGNMENT or np.any(pad != 0xFF):
+            report.error('trace_padding', "trace is not padded with less " +
+                         "than %d bytes of 0xFF" %
+                         trace_writer.TRACE_ALIGNMENT)
+
+    # feasibility: delta_t must cover the transmission time at 10 Gbps. all
+    # times are calculated in units of the transmission time of one byte
+    bytes_per_cycle = trace_writer.MAX_DATARATE / 8 / trace_writer.CLK_FREQ
+    t_tx = len_wire + trace_writer.ETH_OVERHEAD
+    t_delta = np.rint(delta_t * bytes_per_cycle).astype(np.int64)
+    report.check('delta_t_infeasible',
+                 t_delta + int(round(tolerance * bytes_per_cycle)) < t_tx,
+                 "delta_t is shorter than the transmission time at %g Gbps" %
+                 (trace_writer.MAX_DATARATE / 1e9))
+
+    # actual transmission times: each packet is delayed by the backlog the
+    # preceding packets left behind (w_i = x_i - min(x_0, ..., x_i), x_0 = 0)
+    x = np.concatenate(([0], np.cumsum(t_tx - t_delta)[:-1]))
+    lateness = x - np.minimum.accumulate(x)
+    t_target = np.concatenate(([0], np.cumsum(t_delta)[:-1]))
+    t_actual = t_target + lateness
+
+    duration = int(np.sum(delta_t))
+    report.stats = {
+        'duration_s': duration / trace_writer.CLK_FREQ,
+        'bytes_wire': int(np.sum(len_wire)),
+        'bytes_snap': int(np.sum(len_snap)),
+        'offered_rate_bps': float(8 * np.sum(t_tx) / max(duration, 1) *
+                                  trace_writer.CLK_FREQ),
+        'max_lateness_us': float(lateness.max() / bytes_per_cycle /
+                                 trace_writer.CLK_FREQ * 1e6),
+        'late_pkts': int(np.count_nonzero(lateness > bytes_per_cycle)),
+    }
+    report.profile = _profile(t_target / bytes_per_cycle,
+                              t_actual / bytes_per_cycle, t_tx, window)
+    return report
+
+
+def _scatter(mask, values):
+    """Return a boolean array with 'values' at the positions set in 'mask'."""
+    out = np.zeros(len(mask), dtype=bool)
+    out[mask] = values
+    return out
+
+
+def _profile(t_target, t_actual, t_tx, window):
+    """Calculate offered and achieved data rates in time windows."""
+    cycles = window * trace_writer.CLK_FREQ
+    n_windows = int(max(t_target[-1], t_actual[-1]) // cycles) + 1
+    bits = 8.0 * t_tx
+    offered = np.bincount((t_target // cycles).astype(np.int64), bits,
+                          n_windows)
+    achieved = np.bincount((t_actual // cycles).astype(np.int64), bits,
+                           n_windows)
+    n_pkts = np.bincount((t_target // cycles).astype(np.int64),
+                         minlength=n_windows)
+    return [{'t': i * window, 'offered': offered[i] / window,
+             'achieved': achieved[i] / window, 'n_pkts': int(n_pkts[i])}
+            for i in range(n_windows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate a trace file and check whether it can be " +
+        "replayed at the intended rate.")
+    parser.add_argument("trace", help="trace file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="tolerance of the delta_t feasibility check " +
+                        "in clock cycles (default: %d)" % TOLERANCE)
+    parser.add_argument("--window", type=float, default=WINDOW,
+                        help="time window of the rate profile in seconds " +
+                        "(default: %g)" % WINDOW)
+    parser.add_argument("--json", action="store_true",
+                        help="print report in JSON format")
+    args = parser.parse_args()
+
+    report = validate(args.trace, args.tolerance, args.window)
+    print(report.json() if args.json else report.text())
+    sys.exit(0 if report.ok() else 1)
+
+
+if __name__ == "__main__":
+    main()
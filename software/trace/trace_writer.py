@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Vectorized writer for the FlueNT10G trace replay format."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Writes trace files that can be replayed by the FlueNT10G network tester
+# directly from NumPy packet arrays (no PCAP file and no pcap_import conversion
+# step required). Each packet in the trace consists of 8 bytes of meta data
+# followed by the packet data:
+#
+# - Meta bits [31:0]:  number of clock cycles (156.25 MHz) that shall pass
+#                      until the next packet is transmitted (delta_t)
+# - Meta bits [42:32]: packet's snap length (number of stored data bytes)
+# - Meta bits [58:48]: packet's wire length (the hardware appends zero bytes to
+#                      restore the wire length, if the snap length is smaller)
+#
+# Packet data is padded with zero bytes to be 8 byte aligned. The total trace
+# file size is padded with 0xFF bytes to be 64 byte aligned. Packets are
+# encoded in batches: all meta data words and packet data words of a batch are
+# assembled with vectorized NumPy operations.
+#
+# When executed as a script, a constant-bit-rate trace is generated (same
+# traffic as examples/latency/generate_pcap_trace.py, but written directly in
+# the trace format).
+
+import argparse
+import math
+import time
+import numpy as np
+from pkt_template import PacketTemplate, Ether, IPv4
+from quantize import Quantizer
+
+# clock frequency of the hardware replay logic
+CLK_FREQ = 156.25e6
+
+# maximum interface data rate
+MAX_DATARATE = 10e9
+
+# maximum packet size (excluding frame check sequence)
+PKT_SIZE_MAX = 1518
+
+# per-packet Ethernet protocol overhead (preamble, start-of-frame delimiter,
+# frame check sequence and interpacket gap) in bytes
+ETH_OVERHEAD = 24
+
+# the total trace file size must be a multiple of this size
+TRACE_ALIGNMENT = 64
+
+# value of the meta data words padding the trace to TRACE_ALIGNMENT
+TRACE_PADDING_WORD = 0xFFFFFFFFFFFFFFFF
+
+# delta_t of the last packet of a trace, if the time until the trace is
+# replayed again is unknown: the transmission time of a maximum sized packet at
+# full data rate (same value as used by pcap_import)
+DELTA_T_LAST = int(math.ceil(8.0 * PKT_SIZE_MAX / MAX_DATARATE * CLK_FREQ))
+
+# number of packets encoded per batch when generating traces
+BATCH_SIZE = 1 << 20
+
+
+def meta(delta_t, len_snap, len_wire):
+    """Assemble the 64 bit meta data words of packets."""
+    return np.asarray(delta_t, dtype=np.uint64) | \
+        (np.asarray(len_snap, dtype=np.uint64) << np.uint64(32)) | \
+        (np.asarray(len_wire, dtype=np.uint64) << np.uint64(48))
+
+
+def encode(delta_t, len_wire, data, len_snap=None):
+    """Encode a batch of packets to the trace format.
+
+    'delta_t' and 'len_wire' are arrays (or scalars) containing the number of
+    clock cycles until the next packet transmission and the wire length of each
+    packet. 'data' is either a 2D uint8 array with one row of packet data per
+    packet or a 1D uint8 array, which is used as packet data of all packets.
+    The snap length 'len_snap' defaults to the wire length (or the data width,
+    if rows are shorter than the wire length). Returns the encoded packets as a
+    uint8 array (without the trailing trace padding).
+    """
+    delta_t = np.asarray(delta_t, dtype=np.uint64)
+    n = delta_t.size
+    delta_t = delta_t.reshape(n)
+
+    data = np.asarray(data, dtype=np.uint8)
+    if data.ndim == 1:
+        data_width = data.size
+    elif data.ndim == 2 and data.shape[0] == n:
+        data_width = data.shape[1]
+    else:
+        raise ValueError("packet data must be 1D or have one row per packet")
+
+    len_wire = np.broadcast_to(np.asarray(len_wire, dtype=np.int64), (n,))
+    if len_snap is None:
+        len_snap = np.minimum(len_wire, data_width)
+    len_snap = np.broadcast_to(np.asarray(len_snap, dtype=np.int64), (n,))
+
+    if n == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    # check that packets can be represented in the trace format
+    if np.any(delta_t > np.uint64(0xFFFFFFFF)):
+        raise ValueError("delta_t exceeds 32 bits")
+    if np.any(len_snap > len_wire) or np.any(len_snap < 0):
+        raise ValueError("snap length must be between zero and wire length")
+    if np.any(len_wire > PKT_SIZE_MAX):
+        raise ValueError("wire length exceeds %d bytes" % PKT_SIZE_MAX)
+    if np.any(len_snap > data_width):
+        raise ValueError("snap length exceeds packet data width")
+
+    # pad packet data to 8 byte aligned width
+    data_width8 = 8 * ((data_width + 7) // 8)
+    if data_width8 != data_width:
+        pad_width = [(0, data_width8 - data_width)]
+        if data.ndim == 2:
+            pad_width.insert(0, (0, 0))
+        data = np.pad(data, pad_width)
+
+    snap_min, snap_max = len_snap.min(), len_snap.max()
+    words_meta = meta(delta_t, len_snap, len_wire)
+
+    if snap_min == snap_max:
+        # fast path: all packets have the same snap length. the encoded trace
+        # is a 2D array with one row per packet
+        snap_words = (int(snap_max) + 7) // 8
+        words = np.empty((n, 1 + snap_words), dtype=np.uint64)
+        words[:, 0] = words_meta
+        if snap_words > 0:
+            payload = data[..., :8 * snap_words]
+            if int(snap_max) % 8 != 0:
+                # zero bytes between snap length and 8 byte boundary
+                payload = payload.copy()
+                payload[..., int(snap_max):] = 0
+            words[:, 1:] = np.ascontiguousarray(payload) \
+                .view('<u8').reshape(-1, snap_words)
+        return words.reshape(-1).view(np.uint8)
+
+    # general case: variable snap lengths. select the 8 byte aligned prefix of
+    # each packet's data (row-major boolean indexing concatenates them)
+    data = np.broadcast_to(data, (n, data_width8))
+    cols = np.arange(data_width8)
+    snap_words = (len_snap + 7) // 8
+    payload = np.where(cols < len_snap[:, None], data, 0).astype(np.uint8)
+    payload = payload[cols < 8 * snap_words[:, None]].view('<u8')
+
+    # position of each packet's meta data word in the output
+    rec_words = 1 + snap_words
+    pos_meta = np.cumsum(rec_words) - rec_words
+
+    words = np.empty(int(rec_words.sum()), dtype=np.uint64)
+    is_payload = np.ones(words.size, dtype=bool)
+    is_payload[pos_meta] = False
+    words[pos_meta] = words_meta
+    words[is_payload] = payload
+    return words.view(np.uint8)
+
+
+def padding(size):
+    """Return the padding that must be appended to a trace of given size."""
+    n_bytes = -size % TRACE_ALIGNMENT
+    return np.full(n_bytes, 0xFF, dtype=np.uint8)
+
+
+class TraceWriter(object):
+    """Writes packet batches to a trace file."""
+
+    def __init__(self, f):
+        """Open trace file (file name or binary file object) for writing."""
+        if isinstance(f, str):
+            self._f = open(f, "wb")
+            self._close_file = True
+        else:
+            self._f = f
+            self._close_file = False
+
+        # number of packets and bytes written so far
+        self.n_pkts = 0
+        self.size = 0
+
+    def __enter__(self):
+        """Enter context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context manager and close the trace."""
+        self.close()
+
+    def write(self, delta_t, len_wire, data, len_snap=None):
+        """Encode a batch of packets and append them to the trace.
+
+        See encode() for a description of the arguments.
+        """
+        encoded = encode(delta_t, len_wire, data, len_snap)
+        self.write_encoded(encoded, np.size(delta_t))
+
+    def write_encoded(self, encoded, n_pkts):
+        """Append already encoded packets to the trace."""
+        self._f.write(memoryview(encoded))
+        self.n_pkts += n_pkts
+        self.size += len(encoded)
+
+    def close(self):
+        """Pad trace to 64 byte alignment and close it."""
+        if self._f is None:
+            return
+        pad = padding(self.size)
+        self._f.write(pad.tobytes())
+        self.size += pad.size
+        if self._close_file:
+            self._f.close()
+        self._f = None
+
+
+def write_trace(filename, delta_t, len_wire, data, len_snap=None):
+    """Write a complete trace file from a single batch of packets."""
+    with TraceWriter(filename) as wr:
+        wr.write(delta_t, len_wire, data, len_snap)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a constant-bit-rate trace file.")
+    parser.add_argument("output", help="output trace file")
+    parser.add_argument("--pktlen", type=int, default=60,
+                        help="packet length in bytes, excluding FCS " +
+                        "(default: 60)")
+    parser.add_argument("--datarate", type=float, default=MAX_DATARATE,
+                        help="raw data rate in bits/second, including " +
+                        "Ethernet overheads (default: 10e9)")
+    parser.add_argument("--duration", type=float, default=100e-3,
+                        help="trace duration in seconds (default: 0.1)")
+    args = parser.parse_args()
+
+    # time between two packet transmissions in clock cycles. the Ethernet
+    # protocol overhead is 24 bytes per packet
+    t_interpacket = 8 * (args.pktlen + ETH_OVERHEAD) / args.datarate * CLK_FREQ
+    n_pkts = int(math.floor(args.duration * CLK_FREQ / t_interpacket))
+
+    # same packet as generated by examples/latency/generate_pcap_trace.py
+    tmpl = PacketTemplate(Ether(), IPv4(proto=0), pkt_len=args.pktlen)
+    pkt = tmpl.build(1, width=args.pktlen)[0][0]
+
+    # quantize absolute (not relative) transmission times to clock cycles, so
+    # that rounding errors do not accumulate. the last packet's delta_t is the
+    # regular inter-packet time, so that the trace can be replayed multiple
+    # times without pauses
+    q = Quantizer()
+    q.cycles(0.0)
+
+    t_start = time.time()
+    with TraceWriter(args.output) as wr:
+        for i in range(0, n_pkts, BATCH_SIZE):
+            n = min(BATCH_SIZE, n_pkts - i)
+            delta_t = q.cycles(np.arange(i + 1, i + n + 1) * t_interpacket)
+            wr.write(delta_t, args.pktlen, pkt)
+
+    print("Successfully wrote %d packets to trace file in %.2f seconds!" %
+          (n_pkts, time.time() - t_start))
+    print("Maximum timing error: %.3f clock cycles" % q.err_max)
+
+
+if __name__ == "__main__":
+    main()
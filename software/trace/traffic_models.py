@@ -0,0 +1,329 @@
+"""Vectorized stochastic traffic models."""
+# The MIT License
+#
+# Copyright (c) 2017-2019 by the author(s)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author(s):
+#   - Andreas Oeldemann <andreas.oeldemann@tum.de>
+#
+# Description:
+#
+# Library of stochastic traffic models. Inter-arrival time models (constant,
+# Poisson, on/off bursty, Pareto heavy-tailed, MMPP) and packet size models
+# (fixed, uniform, IMIX, empirical histogram) draw whole NumPy arrays at once
+# via their draw(n, rng) function. Inter-arrival times are given in seconds,
+# packet sizes in bytes (excluding FCS, like the PKTLEN parameter of the
+# example scripts). Packet size models also provide their distribution via
+# pmf().
+#
+# Models describe the offered traffic, which may exceed what a 10 Gbps link can
+# physically carry. TrafficModel combines an inter-arrival time model and a
+# packet size model and clips the drawn values: packet sizes are limited to
+# valid Ethernet frame sizes and the time until the next packet is at least the
+# transmission time of the current packet, including the 24 bytes of Ethernet
+# protocol overhead (preamble, start-of-frame delimiter, FCS and interpacket
+# gap). The drawn times are converted to delta_t clock cycles, so that the
+# result can be passed on to any trace writer.
+#
+# Example:
+#
+#   model = TrafficModel(PoissonIAT(1e6), ImixSize())
+#   delta_t, len_wire = model.draw(n, rng)
+
+import numpy as np
+import trace_writer
+from quantize import Quantizer
+
+# minimum packet size (excluding FCS)
+PKT_SIZE_MIN = 60
+
+
+class ConstantIAT(object):
+    """Periodic arrivals (constant inter-arrival time)."""
+
+    def __init__(self, rate):
+        """Initialize model with the packet rate (packets/second)."""
+        self.rate = rate
+
+    def draw(self, n, rng):
+        """Draw 'n' inter-arrival times."""
+        return np.full(n, 1.0 / self.rate)
+
+
+class PoissonIAT(object):
+    """Poisson arrivals (exponentially distributed inter-arrival times)."""
+
+    def __init__(self, rate):
+        """Initialize model with the mean packet rate (packets/second)."""
+        self.rate = rate
+
+    def draw(self, n, rng):
+        """Draw 'n' inter-arrival times."""
+        return rng.exponential(1.0 / self.rate, n)
+
+
+class OnOffIAT(object):
+    """Bursty on/off arrivals.
+
+    During exponentially distributed 'on' periods, packets arrive as a Poisson
+    process with rate 'rate_on'. During exponentially distributed 'off'
+    periods, no packets arrive (interrupted Poisson process). Since both period
+    lengths are memoryless, the 'on' period ends between two arrivals with a
+    fixed probability, in which case an 'off' period is added to the
+    inter-arrival time.
+    """
+
+    def __init__(self, rate_on, mean_on, mean_off):
+        """Initialize model.
+
+        'rate_on' is the packet rate (packets/second) during 'on' periods,
+        'mean_on' and 'mean_off' are the mean period lengths in seconds.
+        """
+        self.rate_on = rate_on
+        self.mean_on = mean_on
+        self.mean_off = mean_off
+
+    def draw(self, n, rng):
+        """Draw 'n' inter-arrival times."""
+        iat = rng.exponential(1.0 / self.rate_on, n)
+        p_off = (1.0 / self.mean_on) / (self.rate_on + 1.0 / self.mean_on)
+        off = rng.random(n) < p_off
+        iat[off] += rng.exponential(self.mean_off, np.count_nonzero(off))
+        return iat
+
+
+class ParetoIAT(object):
+    """Heavy-tailed arrivals (Pareto distributed inter-arrival times)."""
+
+    def __init__(self, rate, alpha=1.5):
+        """Initialize model with mean packet rate and shape 'alpha' (> 1)."""
+        if alpha <= 1.0:
+            raise ValueError("shape parameter alpha must be larger than 1")
+        self.rate = rate
+        self.alpha = alpha
+
+        # scale parameter resulting in the requested mean inter-arrival time
+        self.scale = (alpha - 1.0) / (alpha * rate)
+
+    def draw(self, n, rng):
+        """Draw 'n' inter-arrival times."""
+        return self.scale * (1.0 + rng.pareto(self.alpha, n))
+
+
+class MmppIAT(object):
+    """Markov-modulated Poisson process arrivals.
+
+    An underlying continuous-time Markov chain switches between states. In
+    each state, packets arrive as a Poisson process with a state-specific rate.
+    The model keeps its state between draw() calls, so that consecutive draws
+    continue the same arrival process.
+    """
+
+    def __init__(self, rates, mean_sojourn, transitions=None):
+        """Initialize model.
+
+        'rates' are the packet rates of the states, 'mean_sojourn' the mean
+        time (seconds) spent in each state. 'transitions' is the matrix of
+        state transition probabilities (defaults to cycling through the states
+        in order).
+        """
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self.mean_sojourn = np.broadcast_to(
+            np.asarray(mean_sojourn, dtype=np.float64), self.rates.shape)
+        n_states = len(self.rates)
+        if transitions is None:
+            transitions = np.roll(np.eye(n_states), 1, axis=1)
+        self.transitions_cum = np.cumsum(transitions, axis=1)
+
+        self._state = 0
+        self._t_last = 0.0
+        self._t_now = 0.0
+        self._pending = np.zeros(0)
+
+    def draw(self, n, rng):
+        """Draw 'n' inter-arrival times."""
+        arrivals = [self._pending]
+        n_arrivals = len(self._pending)
+        while n_arrivals < n + 1:
+            # simulate a block of state visits
+            n_visits = 64
+            states = np.empty(n_visits, dtype=np.int64)
+            for i in range(n_visits):
+                states[i] = self._state
+                self._state = int(np.searchsorted(
+                    self.transitions_cum[self._state], rng.random(),
+                    side='right'))
+            sojourn = rng.exponential(self.mean_sojourn[states])
+            t_visit = self._t_now + np.cumsum(sojourn) - sojourn
+            self._t_now += sojourn.sum()
+
+            # the number of arrivals during a visit is Poisson distributed,
+            # arrival times are uniformly distributed within the visit. visits
+            # do not overlap, so sorting all arrivals of the block at once
+            # keeps them ordered by visit
+            counts = rng.poisson(self.rates[states] * sojourn)
+            t_sorted = np.sort(np.repeat(t_visit, counts) +
+                               rng.random(counts.sum()) *
+                               np.repeat(sojourn, counts))
+            arrivals.append(t_sorted)
+            n_arrivals += len(t_sorted)
+
+        t = np.concatenate(arrivals)
+        iat = np.diff(np.concatenate(([self._t_last], t[:n])))
+        self._t_last = t[n - 1] if n > 0 else self._t_last
+        self._pending = t[n:]
+        return iat
+
+
+class FixedSize(object):
+    """Fixed packet size."""
+
+    def __init__(self, size):
+        """Initialize model."""
+        self.size = size
+
+    def draw(self, n, rng):
+        """Draw 'n' packet sizes."""
+        return np.full(n, self.size, dtype=np.int64)
+
+    def pmf(self):
+        """Return the possible packet sizes and their probabilities."""
+        return np.asarray([self.size], dtype=np.int64), np.ones(1)
+
+
+class UniformSize(object):
+    """Uniformly distributed packet sizes."""
+
+    def __init__(self, size_min=PKT_SIZE_MIN,
+                 size_max=trace_writer.PKT_SIZE_MAX):
+        """Initialize model with minimum and maximum size (both inclusive)."""
+        self.size_min = size_min
+        self.size_max = size_max
+
+    def draw(self, n, rng):
+        """Draw 'n' packet sizes."""
+        return rng.integers(self.size_min, self.size_max + 1, n)
+
+    def pmf(self):
+        """Return the possible packet sizes and their probabilities."""
+        sizes = np.arange(self.size_min, self.size_max + 1)
+        return sizes, np.full(len(sizes), 1.0 / len(sizes))
+
+
+class EmpiricalSize(object):
+    """Packet sizes drawn from an empirical histogram.
+
+    The histogram is either given as discrete sizes and their weights or, if
+    'bin_edges' is provided, as bins (sizes are drawn uniformly within the
+    selected bin).
+    """
+
+    def __init__(self, sizes, weights, bin_edges=None):
+        """Initialize model."""
+        weights = np.asarray(weights, dtype=np.float64)
+        self.p = weights / weights.sum()
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.bin_edges = None if bin_edges is None else \
+            np.asarray(bin_edges, dtype=np.int64)
+
+    def draw(self, n, rng):
+        """Draw 'n' packet sizes."""
+        idx = rng.choice(len(self.p), n, p=self.p)
+        if self.bin_edges is None:
+            return self.sizes[idx]
+        return rng.integers(self.bin_edges[idx], self.bin_edges[idx + 1])
+
+    def pmf(self):
+        """Return the possible packet sizes and their probabilities."""
+        if self.bin_edges is None:
+            return self.sizes, self.p
+        width = np.diff(self.bin_edges)
+        sizes = np.concatenate([np.arange(a, b) for a, b in
+                                zip(self.bin_edges[:-1], self.bin_edges[1:])])
+        return sizes, np.repeat(self.p / width, width)
+
+
+class ImixSize(EmpiricalSize):
+    """Simple IMIX packet size distribution.
+
+    Frame sizes 64, 594 and 1518 bytes (including FCS) with ratio 7:4:1.
+    """
+
+    def __init__(self, sizes=(60, 590, 1514), weights=(7, 4, 1)):
+        """Initialize model."""
+        super().__init__(sizes, weights)
+
+
+class TrafficModel(object):
+    """Combination of an inter-arrival time and a packet size model.
+
+    Drawn packet sizes and inter-arrival times are clipped to what a link with
+    the given data rate can physically carry. Absolute transmission times are
+    rounded to clock cycles without accumulating rounding errors across draw()
+    calls ('quantizer.err_max' holds the maximum timing error).
+    """
+
+    def __init__(self, iat, size, link_rate=trace_writer.MAX_DATARATE,
+                 size_min=PKT_SIZE_MIN):
+        """Initialize model.
+
+        'size_min' may be raised to the header length of the generated packets.
+        """
+        self.iat = iat
+        self.size = size
+        self.link_rate = link_rate
+        self.size_min = size_min
+
+        # absolute time (in clock cycles, not rounded) of the next packet. the
+        # quantizer's reference time is zero
+        self._t = 0.0
+        self.quantizer = Quantizer()
+        self.quantizer.cycles(0.0)
+
+        # number of inter-arrival times that have been clipped
+        self.n_clipped = 0
+
+    def draw(self, n, rng):
+        """Draw 'n' packets. Returns arrays of delta_t and wire lengths."""
+        len_wire = np.clip(self.size.draw(n, rng), self.size_min,
+                           trace_writer.PKT_SIZE_MAX)
+        return self.timing(len_wire, rng), len_wire
+
+    def timing(self, len_wire, rng):
+        """Draw delta_t values for packets with given wire lengths."""
+        iat = self.iat.draw(len(len_wire), rng)
+
+        # the next packet cannot be transmitted before the current one has
+        # been transmitted completely
+        iat_min = 8.0 * (len_wire + trace_writer.ETH_OVERHEAD) / self.link_rate
+        clipped = iat < iat_min
+        self.n_clipped += int(np.count_nonzero(clipped))
+        iat = np.where(clipped, iat_min, iat)
+
+        # round absolute times to clock cycles
+        t = self._t + np.cumsum(iat * trace_writer.CLK_FREQ)
+        if len(t):
+            self._t = t[-1]
+        return self.quantizer.cycles(t)
+
+    def timing_model(self, rng):
+        """Return a timing model function usable by trace_stream.timing()."""
+        return lambda len_wire: self.timing(len_wire, rng)